@@ -1,7 +1,8 @@
 from flask import Flask, send_from_directory, Response, render_template, redirect, jsonify, request
 from dotenv import load_dotenv
 import os
-from decilo import decilo_bp
+from decilo import decilo_bp, catalog_warm_up_status, start_catalog_warm_up
+from odoo_rpc import hedge_stats
 from ear_impressions import ear_impressions_bp
 
 # Load environment variables from .env file
@@ -25,5 +26,18 @@ def decilo():
 def ear_impressions():
     return render_template('ear_impressions.html')
 
+@app.route('/healthz/live')
+def healthz_live():
+    return jsonify({'status': 'ok'})
+
+@app.route('/healthz/ready')
+def healthz_ready():
+    # Not ready while the catalog warm-up runs, so traffic only reaches warm workers
+    status = catalog_warm_up_status()
+    # How often hedged Odoo reads fired and won in this worker (None with hedging off)
+    status['odoo_hedging'] = hedge_stats()
+    return jsonify(status), 200 if status['ready'] else 503
+
 if __name__ == '__main__':
+    start_catalog_warm_up()
     app.run(debug=True, use_reloader=False, host='0.0.0.0', port=8000)
@@ -0,0 +1,137 @@
+"""
+Benchmark XML-RPC vs JSON-RPC for the Odoo payloads the portal moves.
+
+Runs two suites:
+  - decode: offline, times unmarshalling of synthetic responses shaped like a
+    product.template image_1920 read and a 1,000-record search_read.
+  - live:   times the same calls against the configured Odoo instance
+    (DECILO_ODOO_* environment variables) through both protocols.
+
+Usage:
+    python benchmark_odoo_clients.py [--suite decode|live|all] [--rounds 5]
+"""
+
+import argparse
+import base64
+import json
+import os
+import statistics
+import time
+import xmlrpc.client
+
+from dotenv import load_dotenv
+
+import odoo_rpc
+
+load_dotenv()
+
+ODOO_URL = os.getenv('DECILO_ODOO_URL')
+ODOO_DB = os.getenv('DECILO_ODOO_DB')
+ODOO_USERNAME = os.getenv('DECILO_ODOO_USERNAME')
+ODOO_API_KEY = os.getenv('DECILO_ODOO_API_KEY')
+
+SEARCH_READ_FIELDS = ['id', 'name', 'default_code', 'list_price', 'product_tmpl_id', 'product_template_attribute_value_ids']
+
+
+def timed(fn, rounds):
+    """Run fn `rounds` times and return (median seconds, last result)."""
+    samples = []
+    result = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def report(label, xml_seconds, json_seconds, size_bytes=None):
+    size = f" ({size_bytes / 1024:.0f} KiB)" if size_bytes else ''
+    speedup = xml_seconds / json_seconds if json_seconds else float('inf')
+    print(f"{label}{size}: xmlrpc {xml_seconds * 1000:.1f} ms | jsonrpc {json_seconds * 1000:.1f} ms | x{speedup:.1f}")
+
+
+def run_decode_suite(rounds):
+    """Compare decoding cost of equivalent XML-RPC and JSON-RPC responses."""
+    image_b64 = base64.b64encode(os.urandom(3 * 1024 * 1024)).decode('ascii')
+    image_result = [{'id': 1, 'image_1920': image_b64}]
+
+    records = [{
+        'id': i,
+        'name': f'Ear tip {i}',
+        'default_code': f'ET-{i:05d}',
+        'list_price': 12.5,
+        'product_tmpl_id': [i // 10, f'Template {i // 10}'],
+        'product_template_attribute_value_ids': [i, i + 1, i + 2],
+    } for i in range(1000)]
+
+    for label, result in (('read image_1920', image_result), ('search_read 1000 records', records)):
+        xml_body = xmlrpc.client.dumps((result,), methodresponse=True, allow_none=True)
+        json_body = json.dumps({'jsonrpc': '2.0', 'id': 1, 'result': result})
+        xml_seconds, _ = timed(lambda: xmlrpc.client.loads(xml_body), rounds)
+        json_seconds, _ = timed(lambda: json.loads(json_body), rounds)
+        report(f"decode {label}", xml_seconds, json_seconds, len(xml_body))
+
+
+def run_live_suite(rounds):
+    """Compare both protocols end-to-end against the configured Odoo instance."""
+    if not all([ODOO_URL, ODOO_DB, ODOO_USERNAME, ODOO_API_KEY]):
+        print("live: skipped (DECILO_ODOO_* environment variables are not set)")
+        return
+
+    account = odoo_rpc.get_service_account(ODOO_URL, ODOO_DB, ODOO_USERNAME, ODOO_API_KEY)
+    uid = account.get_uid()
+    proxies = {
+        'xmlrpc': odoo_rpc.service_models_proxy(account, 'xmlrpc'),
+        'jsonrpc': odoo_rpc.service_models_proxy(account, 'jsonrpc'),
+    }
+
+    template_ids = proxies['xmlrpc'].execute_kw(
+        ODOO_DB, uid, ODOO_API_KEY,
+        'product.template', 'search',
+        [[('image_1920', '!=', False)]],
+        {'limit': 1}
+    )
+    if not template_ids:
+        print("live: skipped (no product.template with an image)")
+        return
+
+    def read_image(protocol):
+        return proxies[protocol].execute_kw(
+            ODOO_DB, uid, ODOO_API_KEY,
+            'product.template', 'read',
+            [template_ids],
+            {'fields': ['image_1920']}
+        )
+
+    def search_read(protocol):
+        return proxies[protocol].execute_kw(
+            ODOO_DB, uid, ODOO_API_KEY,
+            'product.product', 'search_read',
+            [[]],
+            {'fields': SEARCH_READ_FIELDS, 'limit': 1000}
+        )
+
+    for label, call in (('read image_1920', read_image), ('search_read 1000 records', search_read)):
+        # Warm the pooled connections so handshakes don't skew the first protocol
+        call('xmlrpc')
+        call('jsonrpc')
+        xml_seconds, result = timed(lambda: call('xmlrpc'), rounds)
+        json_seconds, _ = timed(lambda: call('jsonrpc'), rounds)
+        size = len(json.dumps(result))
+        report(f"live {label}", xml_seconds, json_seconds, size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--suite', choices=['decode', 'live', 'all'], default='all')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.suite in ('decode', 'all'):
+        run_decode_suite(args.rounds)
+    if args.suite in ('live', 'all'):
+        run_live_suite(args.rounds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,663 @@
+"""
+Caches for catalog data (variant metadata, default variants, images).
+Entries carry a TTL and a size in bytes; each cache evicts old entries to stay
+under its budget and reaps expired ones.
+
+Two backends share the same get/set/pop/clear/stats interface, selected with
+DECILO_CACHE_BACKEND:
+  - memory: per-process LRU (SizedLRUCache)
+  - sqlite: one SQLite database (WAL mode) under DECILO_CACHE_DIR on local
+    disk, shared by every worker on the host (SQLiteCache)
+
+Entries have a soft TTL (default_ttl) and optionally a longer hard TTL
+(hard_ttl): get() only returns fresh entries, while lookup() also returns
+entries past their soft TTL, flagged as stale, until the hard TTL passes, so
+callers can serve them while refreshing in the background
+(stale-while-revalidate).
+
+Images are cached as CachedImage: decoded bytes plus the MIME type sniffed from
+their magic bytes and a content hash, all computed once when cached.
+
+Memory caches can be saved to and restored from a snapshot file
+(save_snapshot/load_snapshot), so restarts do not start cold. The file is a
+fixed header, a table of fixed-size entry records (offsets, lengths and
+wall-clock expiry) and the pickled keys and values; it is read through mmap,
+so expired or unwanted entries are skipped without reading their values.
+"""
+
+import base64
+import collections
+import hashlib
+import logging
+import math
+import mmap
+import os
+import pickle
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds between full sweeps for expired entries (expired entries are also dropped on access)
+REAP_INTERVAL = 60
+
+# Cache backend: 'memory' (per worker) or 'sqlite' (shared by the workers on this host)
+CACHE_BACKEND = os.getenv('DECILO_CACHE_BACKEND', 'memory').strip().lower()
+# Keep this on local disk: SQLite locking is unreliable on network shares such as /home on App Service
+CACHE_DIR = os.getenv('DECILO_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'decilo-cache'))
+SQLITE_CACHE_FILENAME = 'catalog-cache.sqlite3'
+SQLITE_BUSY_TIMEOUT = 2.0  # seconds to wait for another worker's write lock
+
+try:
+    import fcntl
+except ImportError:  # Windows dev server: no host-wide coordination needed
+    fcntl = None
+
+# Cache snapshot files: magic, format version, entry count, saved_at (wall clock), metadata length
+SNAPSHOT_MAGIC = b'DCCACHE\0'
+SNAPSHOT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct('<8sHxxIdQ')
+# Per entry: offset of the key blob (the value blob follows it), key length, value length,
+# fresh_until and expires_at (wall clock, NaN for none)
+_SNAPSHOT_ENTRY = struct.Struct('<QIIdd')
+
+
+# (offset, magic bytes, MIME type); first match wins
+IMAGE_SIGNATURES = (
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (0, b'\xff\xd8\xff', 'image/jpeg'),
+    (0, b'GIF87a', 'image/gif'),
+    (0, b'GIF89a', 'image/gif'),
+    (8, b'WEBP', 'image/webp'),  # after the 'RIFF' + size header
+    (4, b'ftypavif', 'image/avif'),
+    (0, b'BM', 'image/bmp'),
+    (0, b'\x00\x00\x01\x00', 'image/x-icon'),
+)
+DEFAULT_IMAGE_MIMETYPE = 'image/png'
+
+
+def sniff_image_mimetype(data):
+    """Detect an image's MIME type from its leading bytes (PNG when unknown)."""
+    head = bytes(data[:64])
+    for offset, magic, mimetype in IMAGE_SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            if mimetype == 'image/webp' and not head.startswith(b'RIFF'):
+                continue
+            return mimetype
+    stripped = head.lstrip()
+    if stripped.startswith(b'<svg') or (stripped.startswith(b'<?xml') and b'<svg' in bytes(data[:1024])):
+        return 'image/svg+xml'
+    return DEFAULT_IMAGE_MIMETYPE
+
+
+class CachedImage(collections.namedtuple('CachedImage', ['data', 'mimetype', 'sha256', 'write_date'], defaults=(None,))):
+    """Decoded image bytes with their sniffed MIME type, SHA-256 hex digest and Odoo write_date."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_bytes(cls, data, write_date=None):
+        data = bytes(data)
+        return cls(data, sniff_image_mimetype(data), hashlib.sha256(data).hexdigest(), write_date)
+
+    def data_url(self):
+        return f"data:{self.mimetype};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+
+def estimate_size(value, _seen=None):
+    """Approximate memory held by a value, following containers (each object counted once)."""
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += estimate_size(k, _seen) + estimate_size(v, _seen)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += estimate_size(item, _seen)
+    return size
+
+
+def _expiry(now, ttl, hard_ttl):
+    """(fresh_until, expires_at) of an entry stored at `now`."""
+    if ttl is None:
+        return None, None
+    return now + ttl, now + max(ttl, hard_ttl or 0)
+
+
+class SizedLRUCache:
+    """Thread-safe LRU cache with per-entry TTLs and a byte budget.
+
+    Sizes are estimated once when an entry is stored. Storing an entry evicts
+    least recently used ones until the cache fits its budget; an entry larger
+    than the whole budget is not stored.
+    """
+
+    def __init__(self, name, max_bytes, default_ttl=None, sizer=estimate_size, hard_ttl=None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.hard_ttl = hard_ttl
+        self._sizer = sizer
+        self._entries = collections.OrderedDict()  # key -> (value, fresh_until, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._last_reap = time.monotonic()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """Fresh value of key, or default (also for stale entries)."""
+        value, stale = self.lookup(key, allow_stale=False)
+        return default if value is None else value
+
+    def lookup(self, key, allow_stale=True):
+        """(value, stale) for key; (None, False) when missing or past its hard TTL."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            value, fresh_until, expires_at, _ = entry
+            if expires_at is not None and expires_at <= now:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None, False
+            stale = fresh_until is not None and fresh_until <= now
+            if stale and not allow_stale:
+                self.misses += 1
+                return None, False
+            self._entries.move_to_end(key)
+            if stale:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+            return value, stale
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.monotonic()
+        fresh_until, expires_at = _expiry(now, ttl, self.hard_ttl)
+        size = self._sizer(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if now - self._last_reap >= REAP_INTERVAL:
+                self._reap(now)
+            if size > self.max_bytes:
+                return False
+            while self._entries and self._bytes + size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            self._entries[key] = (value, fresh_until, expires_at, size)
+            self._bytes += size
+            return True
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._remove(key)
+            return entry[0]
+
+    def pop_prefixes(self, prefixes):
+        """Drop every tuple key starting with one of the given tuples; returns how many were dropped."""
+        prefixes = {tuple(prefix) for prefix in prefixes}
+        lengths = {len(prefix) for prefix in prefixes}
+        with self._lock:
+            matching = [
+                key for key in self._entries
+                if isinstance(key, tuple) and any(key[:length] in prefixes for length in lengths)
+            ]
+            for key in matching:
+                self._remove(key)
+        return len(matching)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def reap(self):
+        """Drop every entry past its hard TTL now."""
+        with self._lock:
+            self._reap(time.monotonic())
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def export_entries(self):
+        """[(key, value, fresh_until, expires_at)] of live entries, least recently used first (wall-clock times)."""
+        now = time.monotonic()
+        offset = time.time() - now
+        with self._lock:
+            entries = list(self._entries.items())
+        return [
+            (key, value,
+             None if fresh_until is None else fresh_until + offset,
+             None if expires_at is None else expires_at + offset)
+            for key, (value, fresh_until, expires_at, _) in entries
+            if expires_at is None or expires_at > now
+        ]
+
+    def restore(self, key, value, fresh_until, expires_at):
+        """Store an exported entry with its remaining TTLs (unless the key is cached already)."""
+        offset = time.monotonic() - time.time()
+        fresh_until = None if fresh_until is None else fresh_until + offset
+        expires_at = None if expires_at is None else expires_at + offset
+        size = self._sizer(value)
+        with self._lock:
+            if key in self._entries or size > self.max_bytes:
+                return False
+            while self._entries and self._bytes + size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            self._entries[key] = (value, fresh_until, expires_at, size)
+            self._bytes += size
+            return True
+
+    def _remove(self, key):
+        size = self._entries.pop(key)[3]
+        self._bytes -= size
+
+    def _reap(self, now):
+        expired = [k for k, (_, _, expires_at, _) in self._entries.items() if expires_at is not None and expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+        self._last_reap = now
+
+
+class SQLiteCache:
+    """Cache shared by all worker processes through a local SQLite database.
+
+    Values are pickled; each write is a single atomic statement, so readers in
+    other workers see either the old or the new entry. Expiry is stored as a
+    wall-clock timestamps (soft and hard). Entries past their hard TTL and,
+    beyond the byte budget, the oldest entries are pruned periodically rather
+    than on every write. SQLite errors (e.g. a lock held too long) degrade to
+    cache misses.
+    """
+
+    def __init__(self, name, path, max_bytes, default_ttl=None, hard_ttl=None):
+        self.name = name
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.hard_ttl = hard_ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._create_schema()
+
+    def get(self, key, default=None):
+        """Fresh value of key, or default (also for stale entries)."""
+        value, stale = self.lookup(key, allow_stale=False)
+        return default if value is None else value
+
+    def lookup(self, key, allow_stale=True):
+        """(value, stale) for key; (None, False) when missing or past its hard TTL."""
+        try:
+            row = self._connection().execute(
+                'SELECT value, fresh_until, expires_at FROM cache_entries WHERE cache = ? AND key = ?',
+                (self.name, repr(key))
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"[cache:{self.name}] read failed: {e}")
+            row = None
+        now = time.time()
+        if row is None or (row[2] is not None and row[2] <= now):
+            self._count('misses')
+            return None, False
+        stale = row[1] is not None and row[1] <= now
+        if stale and not allow_stale:
+            self._count('misses')
+            return None, False
+        self._count('stale_hits' if stale else 'hits')
+        return pickle.loads(row[0]), stale
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        fresh_until, expires_at = _expiry(now, ttl, self.hard_ttl)
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return False
+        try:
+            self._connection().execute(
+                'INSERT OR REPLACE INTO cache_entries (cache, key, value, size, stored_at, fresh_until, expires_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (self.name, repr(key), blob, len(blob), now, fresh_until, expires_at)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"[cache:{self.name}] write failed: {e}")
+            return False
+        if now - self._last_prune >= REAP_INTERVAL:
+            self.reap()
+        return True
+
+    def pop(self, key, default=None):
+        value = self.get(key, default)
+        try:
+            self._connection().execute(
+                'DELETE FROM cache_entries WHERE cache = ? AND key = ?',
+                (self.name, repr(key))
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"[cache:{self.name}] delete failed: {e}")
+        return value
+
+    def pop_prefixes(self, prefixes):
+        """Drop every tuple key starting with one of the given tuples; returns how many were dropped."""
+        # Keys are stored as repr(): a longer tuple's repr starts with the prefix's items and a comma
+        patterns = [
+            (self.name, '(' + ', '.join(repr(item) for item in prefix) + ',', repr(tuple(prefix)))
+            for prefix in prefixes
+        ]
+        try:
+            return self._connection().executemany(
+                'DELETE FROM cache_entries WHERE cache = ?1 AND (substr(key, 1, length(?2)) = ?2 OR key = ?3)',
+                patterns
+            ).rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"[cache:{self.name}] delete failed: {e}")
+            return 0
+
+    def clear(self):
+        try:
+            self._connection().execute('DELETE FROM cache_entries WHERE cache = ?', (self.name,))
+        except sqlite3.Error as e:
+            logger.warning(f"[cache:{self.name}] clear failed: {e}")
+
+    def reap(self):
+        """Drop expired entries, then the oldest ones while over the byte budget."""
+        now = time.time()
+        self._last_prune = now
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                expired = conn.execute(
+                    'DELETE FROM cache_entries WHERE cache = ? AND expires_at <= ?',
+                    (self.name, now)
+                ).rowcount
+                total = conn.execute(
+                    'SELECT COALESCE(SUM(size), 0) FROM cache_entries WHERE cache = ?',
+                    (self.name,)
+                ).fetchone()[0]
+                evicted = []
+                if total > self.max_bytes:
+                    for key, size in conn.execute(
+                        'SELECT key, size FROM cache_entries WHERE cache = ? ORDER BY stored_at',
+                        (self.name,)
+                    ):
+                        if total <= self.max_bytes:
+                            break
+                        evicted.append((self.name, key))
+                        total -= size
+                    conn.executemany('DELETE FROM cache_entries WHERE cache = ? AND key = ?', evicted)
+        except sqlite3.Error as e:
+            logger.warning(f"[cache:{self.name}] prune failed: {e}")
+            return
+        self._count('expirations', expired)
+        self._count('evictions', len(evicted))
+
+    def stats(self):
+        try:
+            entries, total = self._connection().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries WHERE cache = ?',
+                (self.name,)
+            ).fetchone()
+        except sqlite3.Error:
+            entries, total = None, None
+        with self._lock:
+            return {
+                'entries': entries,
+                'bytes': total,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def _connection(self):
+        # One connection per thread, reopened in forked workers
+        conn = getattr(self._local, 'connection', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _create_schema(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache_entries ('
+            ' cache TEXT NOT NULL,'
+            ' key TEXT NOT NULL,'
+            ' value BLOB NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' stored_at REAL NOT NULL,'
+            ' fresh_until REAL,'
+            ' expires_at REAL,'
+            ' PRIMARY KEY (cache, key))'
+        )
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(cache_entries)')}
+        if 'fresh_until' not in columns:
+            # Database created before soft TTLs: existing entries count as fresh until they expire
+            conn.execute('ALTER TABLE cache_entries ADD COLUMN fresh_until REAL')
+        conn.execute('CREATE INDEX IF NOT EXISTS cache_entries_age ON cache_entries (cache, stored_at)')
+
+
+_CACHES = {}
+
+
+def create_cache(name, max_bytes, default_ttl=None, backend=None, hard_ttl=None):
+    """Create a named cache on the configured backend and register it for stats().
+
+    default_ttl is the soft TTL; with hard_ttl, entries stay available to
+    lookup() as stale until hard_ttl has passed. Keys must have a stable repr()
+    (tuples of ints/strings) to be shared across workers.
+    """
+    backend = backend or CACHE_BACKEND
+    if backend == 'sqlite':
+        cache = SQLiteCache(name, os.path.join(CACHE_DIR, SQLITE_CACHE_FILENAME), max_bytes, default_ttl, hard_ttl)
+    else:
+        cache = SizedLRUCache(name, max_bytes, default_ttl, hard_ttl=hard_ttl)
+    _CACHES[name] = cache
+    return cache
+
+
+def _snapshot_time(value):
+    return math.nan if value is None else value
+
+
+def _read_snapshot(path):
+    """(metadata, entries) of a snapshot file, entries as (key blob, value blob, fresh_until, expires_at) memoryviews.
+
+    The file stays mapped while the returned views are referenced.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < _SNAPSHOT_HEADER.size:
+            return None, []
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    magic, version, count, _, metadata_length = _SNAPSHOT_HEADER.unpack_from(view, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        logger.info(f"[cache] ignoring snapshot {path} (format {version})")
+        return None, []
+    position = _SNAPSHOT_HEADER.size
+    metadata = pickle.loads(view[position:position + metadata_length])
+    position += metadata_length
+    entries = []
+    for _ in range(count):
+        offset, key_length, value_length, fresh_until, expires_at = _SNAPSHOT_ENTRY.unpack_from(view, position)
+        position += _SNAPSHOT_ENTRY.size
+        entries.append((
+            view[offset:offset + key_length],
+            view[offset + key_length:offset + key_length + value_length],
+            None if math.isnan(fresh_until) else fresh_until,
+            None if math.isnan(expires_at) else expires_at,
+        ))
+    return metadata, entries
+
+
+def save_snapshot(path, caches, metadata=None, include=None, merge_metadata=None):
+    """Write the live entries of memory caches to a snapshot file; returns the number of entries written.
+
+    Entries other processes saved earlier are kept (unless expired or replaced
+    by ours), so every worker on the host can save into the same file. When
+    any are kept, the file's metadata is merge_metadata(previous, metadata)
+    (the previous metadata without merge_metadata), so it stays true of them.
+    include(cache name, key, value) can leave entries out.
+    """
+    caches = [cache for cache in caches if isinstance(cache, SizedLRUCache)]
+    now = time.time()
+    ours = {}
+    for cache in caches:
+        for key, value, fresh_until, expires_at in cache.export_entries():
+            if include is not None and not include(cache.name, key, value):
+                continue
+            try:
+                key_blob = pickle.dumps((cache.name, key), protocol=pickle.HIGHEST_PROTOCOL)
+                value_blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            except (pickle.PicklingError, TypeError, AttributeError) as e:
+                logger.warning(f"[cache:{cache.name}] entry {key!r} not saved: {e}")
+                continue
+            ours[key_blob] = (value_blob, fresh_until, expires_at)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.lock', 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        entries = []
+        try:
+            previous_metadata, previous = _read_snapshot(path)
+        except FileNotFoundError:
+            previous_metadata, previous = None, []
+        except (OSError, ValueError, struct.error, pickle.UnpicklingError) as e:
+            logger.warning(f"[cache] previous snapshot {path} unreadable, overwriting it: {e}")
+            previous_metadata, previous = None, []
+        for key_blob, value_blob, fresh_until, expires_at in previous:
+            key_blob = bytes(key_blob)
+            if key_blob not in ours and (expires_at is None or expires_at > now):
+                entries.append((key_blob, bytes(value_blob), fresh_until, expires_at))
+        del previous
+        if entries:
+            previous_metadata = previous_metadata or {}
+            metadata = merge_metadata(previous_metadata, metadata or {}) if merge_metadata else previous_metadata
+        # Ours last: they are the most recently used, and restore() keeps the newest when over budget
+        entries.extend((key_blob, *entry) for key_blob, entry in ours.items())
+
+        metadata_blob = pickle.dumps(dict(metadata or {}), protocol=pickle.HIGHEST_PROTOCOL)
+        data_offset = _SNAPSHOT_HEADER.size + len(metadata_blob) + _SNAPSHOT_ENTRY.size * len(entries)
+        # Write to a temp file in the same directory, then rename: readers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-cache-snapshot-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(entries), now, len(metadata_blob)))
+                f.write(metadata_blob)
+                offset = data_offset
+                for key_blob, value_blob, fresh_until, expires_at in entries:
+                    f.write(_SNAPSHOT_ENTRY.pack(
+                        offset, len(key_blob), len(value_blob), _snapshot_time(fresh_until), _snapshot_time(expires_at)
+                    ))
+                    offset += len(key_blob) + len(value_blob)
+                for key_blob, value_blob, _, _ in entries:
+                    f.write(key_blob)
+                    f.write(value_blob)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+    return len(entries)
+
+
+def load_snapshot(path, caches, accept=None):
+    """Restore snapshot entries into memory caches with their remaining TTLs; returns (metadata, entries restored).
+
+    accept(cache name, key, value) can reject entries (e.g. ones referring to files that are gone).
+    """
+    by_name = {cache.name: cache for cache in caches if isinstance(cache, SizedLRUCache)}
+    try:
+        metadata, entries = _read_snapshot(path)
+    except FileNotFoundError:
+        return None, 0
+    except (OSError, ValueError, struct.error, pickle.UnpicklingError) as e:
+        logger.warning(f"[cache] cannot read snapshot {path}: {e}")
+        return None, 0
+    now = time.time()
+    restored = 0
+    for key_blob, value_blob, fresh_until, expires_at in entries:
+        if expires_at is not None and expires_at <= now:
+            continue
+        try:
+            name, key = pickle.loads(key_blob)
+            cache = by_name.get(name)
+            if cache is None:
+                continue
+            value = pickle.loads(value_blob)
+        except Exception as e:
+            logger.warning(f"[cache] skipping unreadable snapshot entry: {e}")
+            continue
+        if accept is not None and not accept(name, key, value):
+            continue
+        if cache.restore(key, value, fresh_until, expires_at):
+            restored += 1
+    return metadata, restored
+
+
+def stats():
+    """Counters of every registered cache, by name."""
+    return {name: cache.stats() for name, cache in _CACHES.items()}
@@ -0,0 +1,496 @@
+"""
+Immutable snapshot of the published catalog structure, shared by the workers.
+It holds what variant resolution, exclusions and default variants are computed
+from: the published templates, their PTAV -> PAV maps, their variants with the
+PTAVs of each, the value/attribute names and exclusions per locale, and the
+default variant of each template per locale.
+
+The snapshot is compact and never mutated: ids live in flat arrays indexed by
+offset tables (no per-record dicts or sets), names in tuples of interned
+strings. Built in the gunicorn master before fork (preload_app), its pages are
+shared copy-on-write by every worker. Rebuilt snapshots get the next generation
+number and are published as a file next to the caches; workers notice a newer
+generation within SNAPSHOT_CHECK_INTERVAL seconds and switch to it. Each worker
+unpickles its own copy of a later generation, so the sharing only covers the
+generation built at boot, until the first patch or rebuild.
+
+Between full rebuilds, snapshots are patched: patched() swaps in freshly read
+templates, and each generation records which templates and variants it changed
+(CHANGES_KEPT generations back), so workers can evict what they cached about them.
+"""
+
+import array
+import bisect
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows dev server: no host-wide coordination needed
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Bumped when the layout changes; snapshot files of another format are ignored
+SNAPSHOT_FORMAT = 2
+# Seconds between checks for a newer snapshot file (per process)
+SNAPSHOT_CHECK_INTERVAL = 15
+# Generations whose changes are kept for workers that skipped some
+CHANGES_KEPT = 50
+
+
+def _ids(values=()):
+    return array.array('q', values)
+
+
+def _offsets(values=()):
+    return array.array('l', values)
+
+
+def ref_id(value):
+    """Id of a many2one value as read from Odoo ([id, name], or a bare id)."""
+    return value[0] if isinstance(value, (list, tuple)) else value
+
+
+class CatalogSnapshot:
+    """Published catalog structure at one point in time (read-only once built)."""
+
+    __slots__ = (
+        'format', 'generation', 'built_at', 'locales',
+        'template_ids', 'ptav_offsets', 'ptav_ids', 'ptav_pav_ids',
+        'variant_offsets', 'variant_ids', 'variant_ptav_offsets', 'variant_ptav_ids',
+        'value_names', 'attribute_names', 'exclusions', 'default_variant_ids',
+        'sync_watermark', 'sync_seen', 'changes',
+    )
+
+    def __init__(self, locales):
+        self.format = SNAPSHOT_FORMAT
+        self.generation = 0
+        self.built_at = time.time()
+        self.locales = tuple(locales)
+        self.template_ids = _ids()
+        # Template i owns ptav_*[ptav_offsets[i]:ptav_offsets[i + 1]] (sorted by PTAV id)
+        self.ptav_offsets = _offsets([0])
+        self.ptav_ids = _ids()
+        self.ptav_pav_ids = _ids()
+        # Template i owns variant_ids[variant_offsets[i]:variant_offsets[i + 1]] (in Odoo's order);
+        # variant j has the PTAVs variant_ptav_ids[variant_ptav_offsets[j]:variant_ptav_offsets[j + 1]]
+        self.variant_offsets = _offsets([0])
+        self.variant_ids = _ids()
+        self.variant_ptav_offsets = _offsets([0])
+        self.variant_ptav_ids = _ids()
+        # Per locale: value and attribute name of each PTAV (parallel to ptav_ids)
+        self.value_names = {}
+        self.attribute_names = {}
+        # Per locale: ((value name, (excluded value names, ...)), ...) per template
+        self.exclusions = {}
+        # Per locale: default variant id per template (0 when it has none)
+        self.default_variant_ids = {}
+        # Odoo write_date the snapshot is synchronized up to, and the (model, id, write_date)
+        # changes already applied close to it (see decilo.sync_catalog)
+        self.sync_watermark = None
+        self.sync_seen = frozenset()
+        # ((generation, template ids, variant ids), ...), oldest first; ids are None for full rebuilds
+        # (set by SnapshotHolder.publish)
+        self.changes = ()
+
+    def _index(self, product_id):
+        i = bisect.bisect_left(self.template_ids, product_id)
+        if i < len(self.template_ids) and self.template_ids[i] == product_id:
+            return i
+        return None
+
+    def __contains__(self, product_id):
+        return self._index(product_id) is not None
+
+    def template_variant_data(self, product_id, locale):
+        """Variant resolution data of a template, shaped like the per-template variant cache; None if not covered."""
+        i = self._index(product_id)
+        if i is None or locale not in self.value_names:
+            return None
+        value_names = self.value_names[locale]
+        attribute_names = self.attribute_names[locale]
+        attr_val_to_ptav = {}
+        pav_to_ptav = {}
+        for j in range(self.ptav_offsets[i], self.ptav_offsets[i + 1]):
+            ptav_id = self.ptav_ids[j]
+            key = (attribute_names[j].strip().lower(), value_names[j].strip().lower())
+            if key[0] and key[1]:
+                attr_val_to_ptav[key] = ptav_id
+            if self.ptav_pav_ids[j]:
+                pav_to_ptav[self.ptav_pav_ids[j]] = ptav_id
+        candidates = [
+            {
+                'id': self.variant_ids[j],
+                'ptavs': set(self.variant_ptav_ids[self.variant_ptav_offsets[j]:self.variant_ptav_offsets[j + 1]])
+            }
+            for j in range(self.variant_offsets[i], self.variant_offsets[i + 1])
+        ]
+        return {'attr_val_to_ptav': attr_val_to_ptav, 'pav_to_ptav': pav_to_ptav, 'candidates': candidates}
+
+    def template_exclusions(self, product_id, locale):
+        """Exclusions of a template as returned by the exclusions endpoint; None if not covered."""
+        i = self._index(product_id)
+        if i is None or locale not in self.exclusions:
+            return None
+        return [
+            {'value': value, 'excluded_values': list(excluded)}
+            for value, excluded in self.exclusions[locale][i]
+        ]
+
+    def default_variants(self, locale):
+        """{template id: default variant id} for a locale, or None if the locale is not covered."""
+        variant_ids = self.default_variant_ids.get(locale)
+        if variant_ids is None:
+            return None
+        return {
+            product_id: variant_id
+            for product_id, variant_id in zip(self.template_ids, variant_ids)
+            if variant_id
+        }
+
+    def template_variant_ids(self, product_id):
+        """Variant ids of a template (empty if not covered)."""
+        i = self._index(product_id)
+        if i is None:
+            return ()
+        return tuple(self.variant_ids[self.variant_offsets[i]:self.variant_offsets[i + 1]])
+
+    def variant_template_ids(self, variant_ids):
+        """Templates of the given variants (those in the snapshot)."""
+        wanted = set(variant_ids)
+        return {
+            self.template_ids[bisect.bisect_right(self.variant_offsets, j) - 1]
+            for j, variant_id in enumerate(self.variant_ids)
+            if variant_id in wanted
+        }
+
+    def changes_since(self, generation):
+        """(template ids, variant ids) changed after a generation, or None if unknown (a full rebuild or too far back)."""
+        newer = [change for change in self.changes if change[0] > generation]
+        if not newer or newer[0][0] != generation + 1 or any(change[1] is None for change in newer):
+            return None
+        template_ids = set()
+        variant_ids = set()
+        for _, changed_templates, changed_variants in newer:
+            template_ids.update(changed_templates)
+            variant_ids.update(changed_variants)
+        return template_ids, variant_ids
+
+    def patched(self, product_ids, patch):
+        """New snapshot with the templates in product_ids taken from patch (dropped if patch lacks them)."""
+        product_ids = set(product_ids)
+        merged = CatalogSnapshot(self.locales)
+        merged.sync_watermark = self.sync_watermark
+        merged.sync_seen = self.sync_seen
+        for locale in self.locales:
+            merged.value_names[locale] = []
+            merged.attribute_names[locale] = []
+            merged.exclusions[locale] = []
+            merged.default_variant_ids[locale] = _ids()
+        kept = [(product_id, self) for product_id in self.template_ids if product_id not in product_ids]
+        kept.extend((product_id, patch) for product_id in patch.template_ids if product_id in product_ids)
+        kept.sort(key=lambda item: item[0])
+        for product_id, source in kept:
+            i = source._index(product_id)
+            merged.template_ids.append(product_id)
+            start, end = source.ptav_offsets[i], source.ptav_offsets[i + 1]
+            merged.ptav_ids.extend(source.ptav_ids[start:end])
+            merged.ptav_pav_ids.extend(source.ptav_pav_ids[start:end])
+            merged.ptav_offsets.append(len(merged.ptav_ids))
+            for j in range(source.variant_offsets[i], source.variant_offsets[i + 1]):
+                merged.variant_ids.append(source.variant_ids[j])
+                merged.variant_ptav_ids.extend(
+                    source.variant_ptav_ids[source.variant_ptav_offsets[j]:source.variant_ptav_offsets[j + 1]]
+                )
+                merged.variant_ptav_offsets.append(len(merged.variant_ptav_ids))
+            merged.variant_offsets.append(len(merged.variant_ids))
+            for locale in self.locales:
+                merged.value_names[locale].extend(source.value_names[locale][start:end])
+                merged.attribute_names[locale].extend(source.attribute_names[locale][start:end])
+                merged.exclusions[locale].append(source.exclusions[locale][i])
+                merged.default_variant_ids[locale].append(source.default_variant_ids[locale][i])
+        for locale in self.locales:
+            merged.value_names[locale] = tuple(merged.value_names[locale])
+            merged.attribute_names[locale] = tuple(merged.attribute_names[locale])
+            merged.exclusions[locale] = tuple(merged.exclusions[locale])
+        return merged
+
+    def stats(self):
+        arrays = (
+            self.template_ids, self.ptav_offsets, self.ptav_ids, self.ptav_pav_ids, self.variant_offsets,
+            self.variant_ids, self.variant_ptav_offsets, self.variant_ptav_ids, *self.default_variant_ids.values()
+        )
+        return {
+            'generation': self.generation,
+            'built_at': self.built_at,
+            'locales': list(self.locales),
+            'templates': len(self.template_ids),
+            'ptavs': len(self.ptav_ids),
+            'variants': len(self.variant_ids),
+            'array_bytes': sum(a.itemsize * len(a) for a in arrays),
+            'sync_watermark': self.sync_watermark,
+        }
+
+
+def named_value_ids(ptavs, exclusions):
+    """PAV ids whose names a snapshot needs: those behind the PTAVs, plus exclusion values that are not PTAVs."""
+    ptav_ids = {ptav['id'] for ptav in ptavs}
+    pav_ids = {ref_id(ptav.get('product_attribute_value_id')) for ptav in ptavs}
+    for exclusion in exclusions:
+        for value_id in exclusion.get('value_ids') or []:
+            if ref_id(value_id) not in ptav_ids:
+                pav_ids.add(ref_id(value_id))
+    return sorted(pav_id for pav_id in pav_ids if pav_id)
+
+
+def build_snapshot(locales, templates, ptavs, variants, exclusions, names, default_variants):
+    """Build a CatalogSnapshot from Odoo records.
+
+    templates: product.template records ('id'); ptavs: PTAV records ('id',
+    'product_tmpl_id', 'product_attribute_value_id', 'exclude_for'); variants:
+    product.product records ('id', 'product_tmpl_id',
+    'product_template_attribute_value_ids'), in the order candidates are tried;
+    exclusions: product.template.attribute.exclusion records ('id',
+    'product_tmpl_id', 'value_ids'); names: {locale: ({PAV id: name},
+    {PAV id: attribute name})}; default_variants: {locale: {template id: variant id}}.
+    """
+    snapshot = CatalogSnapshot(locales)
+    template_ids = sorted({t['id'] for t in templates})
+    snapshot.template_ids = _ids(template_ids)
+
+    ptavs_by_template = {}
+    ptav_to_pav = {}
+    for ptav in ptavs:
+        pav_id = ref_id(ptav.get('product_attribute_value_id')) or 0
+        ptav_to_pav[ptav['id']] = pav_id
+        ptavs_by_template.setdefault(ref_id(ptav.get('product_tmpl_id')), []).append(ptav)
+    variants_by_template = {}
+    for variant in variants:
+        variants_by_template.setdefault(ref_id(variant.get('product_tmpl_id')), []).append(variant)
+    exclusions_by_id = {ex['id']: ex for ex in exclusions}
+
+    template_ptavs = []
+    for product_id in template_ids:
+        own_ptavs = sorted(ptavs_by_template.get(product_id, []), key=lambda p: p['id'])
+        template_ptavs.append(own_ptavs)
+        for ptav in own_ptavs:
+            snapshot.ptav_ids.append(ptav['id'])
+            snapshot.ptav_pav_ids.append(ptav_to_pav[ptav['id']])
+        snapshot.ptav_offsets.append(len(snapshot.ptav_ids))
+        for variant in variants_by_template.get(product_id, []):
+            snapshot.variant_ids.append(variant['id'])
+            snapshot.variant_ptav_ids.extend(sorted(variant.get('product_template_attribute_value_ids') or []))
+            snapshot.variant_ptav_offsets.append(len(snapshot.variant_ptav_ids))
+        snapshot.variant_offsets.append(len(snapshot.variant_ids))
+
+    for locale in snapshot.locales:
+        pav_names, attribute_names = names.get(locale, ({}, {}))
+        snapshot.value_names[locale] = tuple(
+            sys.intern(pav_names.get(pav_id) or '') for pav_id in snapshot.ptav_pav_ids
+        )
+        snapshot.attribute_names[locale] = tuple(
+            sys.intern(attribute_names.get(pav_id) or '') for pav_id in snapshot.ptav_pav_ids
+        )
+        snapshot.exclusions[locale] = tuple(
+            _template_exclusions(product_id, own_ptavs, exclusions_by_id, ptav_to_pav, pav_names)
+            for product_id, own_ptavs in zip(template_ids, template_ptavs)
+        )
+        locale_defaults = default_variants.get(locale, {})
+        snapshot.default_variant_ids[locale] = _ids(locale_defaults.get(product_id) or 0 for product_id in template_ids)
+    return snapshot
+
+
+def _template_exclusions(product_id, own_ptavs, exclusions_by_id, ptav_to_pav, pav_names):
+    # Same grouping as the exclusions endpoint: per PTAV declaring exclusions, its
+    # value name and the (deduplicated) names of the values it excludes
+    result = []
+    for ptav in own_ptavs:
+        exclusion_ids = ptav.get('exclude_for') or []
+        base_name = pav_names.get(ptav_to_pav.get(ptav['id']))
+        if not exclusion_ids or not base_name:
+            continue
+        excluded = []
+        for exclusion_id in exclusion_ids:
+            exclusion = exclusions_by_id.get(exclusion_id)
+            if not exclusion or ref_id(exclusion.get('product_tmpl_id')) != product_id:
+                continue
+            for value_id in exclusion.get('value_ids') or []:
+                value_id = ref_id(value_id)
+                # Value ids are PTAVs; ids that are not are taken as PAV ids
+                name = pav_names.get(ptav_to_pav.get(value_id, value_id))
+                if name and name not in excluded:
+                    excluded.append(name)
+        result.append((sys.intern(base_name), tuple(sys.intern(name) for name in excluded)))
+    return tuple(result)
+
+
+def _stat_signature(stat):
+    """What identifies one version of the snapshot file."""
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class SnapshotHolder:
+    """The current CatalogSnapshot of this process, published to and picked up from a file."""
+
+    def __init__(self, path, max_age, on_switch=None):
+        self.path = path
+        self.lock_path = path + '.lock'
+        self.max_age = max_age
+        # Called as on_switch(old, new) when this process moves to a newer snapshot
+        self.on_switch = on_switch
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._file_signature = None
+
+    def current(self):
+        """The newest snapshot known to this process (checking the file now and then), or None."""
+        if time.monotonic() - self._checked_at >= SNAPSHOT_CHECK_INTERVAL:
+            self._checked_at = time.monotonic()
+            self._pick_up_file()
+        return self._snapshot
+
+    def install(self, snapshot):
+        """Use a snapshot in this process if it is newer than the current one."""
+        with self._lock:
+            old = self._snapshot
+            if old is not None and snapshot.generation <= old.generation:
+                return False
+            self._snapshot = snapshot
+        if old is not None and self.on_switch is not None:
+            try:
+                self.on_switch(old, snapshot)
+            except Exception as e:
+                logger.warning(f"[snapshot] switch to generation {snapshot.generation} not fully applied: {e}", exc_info=True)
+        return True
+
+    def publish(self, snapshot, changed=None):
+        """Number the snapshot as the next generation, write it for the other workers and install it.
+
+        changed is (template ids, variant ids) for a patch, None for a full rebuild.
+        """
+        on_file = self._read_file()
+        snapshot.generation = 1 + max(
+            self._snapshot.generation if self._snapshot else 0,
+            on_file.generation if on_file else 0
+        )
+        previous = on_file or self._snapshot
+        template_ids, variant_ids = changed or (None, None)
+        snapshot.changes = ((previous.changes if previous else ()) + (
+            (snapshot.generation, template_ids, variant_ids),
+        ))[-CHANGES_KEPT:]
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Write to a temp file in the same directory, then rename: readers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix='.tmp-snapshot-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            # Our own file: _pick_up_file() must not read it back in
+            self._file_signature = _stat_signature(os.stat(self.path))
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self.install(snapshot)
+        logger.info(f"[snapshot] published generation {snapshot.generation}: {snapshot.stats()}")
+        return snapshot
+
+    def load_or_build(self, build):
+        """Install a fresh snapshot from the file, or build and publish one (once per host: others wait for it)."""
+        snapshot = self._pick_up_file()
+        if snapshot is not None and self._fresh(snapshot):
+            return snapshot
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Another worker may have built it while we waited for the lock
+            snapshot = self._pick_up_file()
+            if snapshot is not None and self._fresh(snapshot):
+                return snapshot
+            snapshot = self.publish(build())
+            # Tells the periodic refresh (same lock file) that a build just happened
+            os.utime(self.lock_path)
+        return snapshot
+
+    def patch(self, apply):
+        """Publish the patch apply(current snapshot) returns, as (snapshot, changed), unless it returns None.
+
+        Runs under the host's snapshot lock, so patches never race a full rebuild.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            current = self._pick_up_file()
+            if current is None:
+                return None
+            patched = apply(current)
+            if patched is None:
+                return None
+            return self.publish(*patched)
+
+    def _fresh(self, snapshot):
+        return time.time() - snapshot.built_at < self.max_age
+
+    def _pick_up_file(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return self._snapshot
+        signature = _stat_signature(stat)
+        if signature != self._file_signature:
+            snapshot = self._read_file()
+            self._file_signature = signature
+            # Files left over from long ago (e.g. before a restart) are rebuilt rather than served
+            if snapshot is not None and self._fresh(snapshot) and self.install(snapshot):
+                logger.info(f"[snapshot] switched to generation {snapshot.generation}")
+        return self._snapshot
+
+    def _read_file(self):
+        try:
+            with open(self.path, 'rb') as f:
+                snapshot = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"[snapshot] cannot read {self.path}: {e}")
+            return None
+        if not isinstance(snapshot, CatalogSnapshot) or snapshot.format != SNAPSHOT_FORMAT:
+            return None
+        return snapshot
+
+    def stats(self):
+        snapshot = self._snapshot
+        return snapshot.stats() if snapshot else None
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+
+
+_HOLDERS = []
+
+
+def snapshot_holder(path, max_age, on_switch=None):
+    """Create a SnapshotHolder that is reset in forked children."""
+    holder = SnapshotHolder(path, max_age, on_switch)
+    _HOLDERS.append(holder)
+    return holder
+
+
+def _reset_after_fork():
+    for holder in _HOLDERS:
+        holder._reset_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,16 +1,26 @@
-from flask import Blueprint, jsonify, request, Response, g, copy_current_request_context
+from flask import Blueprint, current_app, jsonify, request, Response, g, has_app_context, send_file
 import xmlrpc.client
 import os
+import contextvars
 from dotenv import load_dotenv
 import logging
 import jwt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from functools import wraps
 import base64
-import imghdr
+import hashlib
+import hmac
 import json
+import struct
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+import odoo_rpc
+import catalog_cache
+import catalog_snapshot
+import image_store
+import image_renditions
+import popularity
 
 #  Configure logging
 logging.basicConfig(
@@ -31,18 +41,105 @@ ODOO_DB = os.getenv('DECILO_ODOO_DB')
 ODOO_USERNAME = os.getenv('DECILO_ODOO_USERNAME')
 ODOO_API_KEY = os.getenv('DECILO_ODOO_API_KEY')
 
+# Service account whose UID is cached for the lifetime of the worker
+SERVICE_ACCOUNT = odoo_rpc.get_service_account(ODOO_URL, ODOO_DB, ODOO_USERNAME, ODOO_API_KEY)
+
+# Shared pool for independent Odoo reads fanned out from a request
+ODOO_FANOUT_MAX_WORKERS = int(os.getenv('DECILO_ODOO_FANOUT_WORKERS', '8'))
+ODOO_FANOUT = odoo_rpc.fan_out_executor(ODOO_FANOUT_MAX_WORKERS, 'decilo-odoo')
+# Separate pool for background refreshes (stale cache entries, placeholders): started from
+# fan-out tasks they are queued here instead of running inline in the task
+ODOO_REFRESH_MAX_WORKERS = int(os.getenv('DECILO_ODOO_REFRESH_WORKERS', '2'))
+ODOO_REFRESH = odoo_rpc.fan_out_executor(ODOO_REFRESH_MAX_WORKERS, 'decilo-refresh')
+
+# Time budget for all Odoo calls of one API request; each call's socket timeout is what is left of it.
+# Endpoints that write to Odoo are exempt (see no_request_budget): a write sequence is never cut short
+REQUEST_BUDGET_SECONDS = float(os.getenv('DECILO_REQUEST_BUDGET_SECONDS', '30'))
+
 # JWT Configuration
 JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-secret-key')  # Change in production
 JWT_EXPIRATION_HOURS = 24
 
-# Simple in-memory caches to cut down on repeated Odoo RPCs
-VARIANT_TEMPLATE_CACHE_TTL = 30 * 60  # 30 minutes
-VARIANT_IMAGE_CACHE_TTL = 30 * 60
-VARIANT_TEMPLATE_CACHE = {}
-VARIANT_IMAGE_CACHE = {}
+# Signed image URLs (served without a JWT). Expiries are rounded up to a whole window so the
+# same image keeps the same URL for a while and browser/proxy caches can reuse it. Without a
+# secret of its own no URLs are signed (images then go through the authenticated endpoints)
+IMAGE_URL_SECRET = os.getenv('DECILO_IMAGE_URL_SECRET', '').encode('utf-8')
+if not IMAGE_URL_SECRET:
+    logger.error("DECILO_IMAGE_URL_SECRET is not set: signed image URLs are disabled")
+IMAGE_URL_TTL = int(os.getenv('DECILO_IMAGE_URL_TTL', str(6 * 60 * 60)))  # 6 hours
+SIGNED_IMAGE_KINDS = {'variant': 'product.product', 'template': 'product.template'}
+SIGNED_IMAGE_FIELDS = {'image_256', 'image_512', 'image_1024', 'image_1920'}
+
+# Caches to cut down on repeated Odoo RPCs, bounded by a byte budget. Per worker by default;
+# DECILO_CACHE_BACKEND=sqlite shares them between the workers on a host (see catalog_cache).
+# *_TTL is the soft TTL: past it, entries are still served (stale-while-revalidate) while one
+# background refresh runs, until the hard TTL (*_HARD_TTL) when they are dropped. Edits in Odoo
+# evict entries early through the catalog sync and /internal/invalidate, so TTLs can be long
+VARIANT_TEMPLATE_CACHE_TTL = int(os.getenv('DECILO_VARIANT_TEMPLATE_CACHE_TTL', str(30 * 60)))  # 30 minutes
+VARIANT_IMAGE_CACHE_TTL = int(os.getenv('DECILO_VARIANT_IMAGE_CACHE_TTL', str(30 * 60)))
+VARIANT_TEMPLATE_CACHE_HARD_TTL = int(os.getenv('DECILO_VARIANT_TEMPLATE_CACHE_HARD_TTL', str(24 * 60 * 60)))
+VARIANT_IMAGE_CACHE_HARD_TTL = int(os.getenv('DECILO_VARIANT_IMAGE_CACHE_HARD_TTL', str(24 * 60 * 60)))
+VARIANT_TEMPLATE_CACHE_MAX_BYTES = int(os.getenv('DECILO_VARIANT_TEMPLATE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+VARIANT_IMAGE_CACHE_MAX_BYTES = int(os.getenv('DECILO_VARIANT_IMAGE_CACHE_MAX_BYTES', str(128 * 1024 * 1024)))
+VARIANT_TEMPLATE_CACHE = catalog_cache.create_cache(
+    'variant_template', VARIANT_TEMPLATE_CACHE_MAX_BYTES, VARIANT_TEMPLATE_CACHE_TTL, hard_ttl=VARIANT_TEMPLATE_CACHE_HARD_TTL
+)
+# Images are cached once per (variant|template, size) as image_store.StoredImage references (or
+# catalog_cache.CachedImage bytes without the disk store); selections only reference them
+VARIANT_IMAGE_CACHE = catalog_cache.create_cache(
+    'variant_image', VARIANT_IMAGE_CACHE_MAX_BYTES, VARIANT_IMAGE_CACHE_TTL, hard_ttl=VARIANT_IMAGE_CACHE_HARD_TTL
+)
+# Browser caching of image responses (Cache-Control: private, max-age=...); revalidated with ETag afterwards
+IMAGE_CACHE_CONTROL_MAX_AGE = int(os.getenv('DECILO_IMAGE_CACHE_CONTROL_MAX_AGE', '3600'))
+# Content-addressed disk store backing the image caches (None when disabled)
+IMAGE_STORE = image_store.create_image_store()
+# Tiny blurred previews (LQIP) of template images, sent inline in the product listing and
+# recomputed when the template's write_date changes (also kept in the disk store)
+PLACEHOLDER_CACHE_TTL = 24 * 60 * 60  # 24 hours
+PLACEHOLDER_CACHE_MAX_BYTES = int(os.getenv('DECILO_PLACEHOLDER_CACHE_MAX_BYTES', str(4 * 1024 * 1024)))
+PLACEHOLDER_CACHE = catalog_cache.create_cache('image_placeholder', PLACEHOLDER_CACHE_MAX_BYTES, PLACEHOLDER_CACHE_TTL)
+PLACEHOLDER_FIELD = 'placeholder'  # image index field of the placeholder
+PLACEHOLDER_SOURCE_FIELD = 'image_128'
 # Cached default variant lookup for all published products (per locale)
-DEFAULT_VARIANTS_CACHE_TTL = 10 * 60  # 10 minutes
-DEFAULT_VARIANTS_CACHE = {}
+DEFAULT_VARIANTS_CACHE_TTL = int(os.getenv('DECILO_DEFAULT_VARIANTS_CACHE_TTL', str(10 * 60)))  # 10 minutes
+DEFAULT_VARIANTS_CACHE_HARD_TTL = int(os.getenv('DECILO_DEFAULT_VARIANTS_CACHE_HARD_TTL', str(6 * 60 * 60)))
+DEFAULT_VARIANTS_CACHE_MAX_BYTES = int(os.getenv('DECILO_DEFAULT_VARIANTS_CACHE_MAX_BYTES', str(4 * 1024 * 1024)))
+DEFAULT_VARIANTS_CACHE = catalog_cache.create_cache(
+    'default_variants', DEFAULT_VARIANTS_CACHE_MAX_BYTES, DEFAULT_VARIANTS_CACHE_TTL, hard_ttl=DEFAULT_VARIANTS_CACHE_HARD_TTL
+)
+# Variant exclusions per (template, locale)
+EXCLUSIONS_CACHE_TTL = int(os.getenv('DECILO_EXCLUSIONS_CACHE_TTL', str(30 * 60)))  # 30 minutes
+EXCLUSIONS_CACHE_HARD_TTL = int(os.getenv('DECILO_EXCLUSIONS_CACHE_HARD_TTL', str(6 * 60 * 60)))
+EXCLUSIONS_CACHE_MAX_BYTES = int(os.getenv('DECILO_EXCLUSIONS_CACHE_MAX_BYTES', str(4 * 1024 * 1024)))
+EXCLUSIONS_CACHE = catalog_cache.create_cache(
+    'variant_exclusions', EXCLUSIONS_CACHE_MAX_BYTES, EXCLUSIONS_CACHE_TTL, hard_ttl=EXCLUSIONS_CACHE_HARD_TTL
+)
+# Concurrent cache rebuilds (and identical uncached GETs) share a single upstream computation
+SINGLE_FLIGHT = odoo_rpc.single_flight()
+
+# Popularity-driven warming: accesses are counted with decaying counters, and a background
+# thread refreshes the caches of the hottest templates/variants before their entries expire
+WARM_ENABLED = os.getenv('DECILO_WARM', 'on').strip().lower() != 'off'
+WARM_INTERVAL = int(os.getenv('DECILO_WARM_INTERVAL', '120'))  # seconds
+WARM_TOP_TEMPLATES = int(os.getenv('DECILO_WARM_TOP_TEMPLATES', '20'))
+WARM_TOP_VARIANTS = int(os.getenv('DECILO_WARM_TOP_VARIANTS', '50'))
+WARM_IMAGE_SIZES = [size.strip() for size in os.getenv('DECILO_WARM_IMAGE_SIZES', 'medium,full').split(',') if size.strip()]
+# Entries are refreshed once this fraction of their TTL has passed since the last refresh
+WARM_REFRESH_AFTER = 0.75
+POPULARITY_HALF_LIFE = float(os.getenv('DECILO_POPULARITY_HALF_LIFE', str(6 * 60 * 60)))
+TEMPLATE_POPULARITY = popularity.decayed_counter(POPULARITY_HALF_LIFE)  # keys: (locale, template id)
+VARIANT_POPULARITY = popularity.decayed_counter(POPULARITY_HALF_LIFE)  # keys: (variant id, image field)
+# With caches shared by the workers (sqlite backend), one worker per host does each refresh
+CATALOG_WARMER = popularity.background_warmer(
+    'catalog', WARM_INTERVAL, lambda: warm_popular_catalog(),
+    lock_path=os.path.join(catalog_cache.CACHE_DIR, 'catalog-warmer.lock') if catalog_cache.CACHE_BACKEND == 'sqlite' else None
+)
+
+# Binary alternative to base64-in-JSON for /decilo-api/product-images: a stream of frames, each
+# a header (product id, image length, MIME type length; big-endian uint32, uint32, uint8)
+# followed by the MIME type and the image bytes. A zero length means the product has no image.
+IMAGE_FRAMES_MIMETYPE = 'application/vnd.decilo.image-frames'
+IMAGE_FRAME_HEADER = struct.Struct('>IIB')
 
 # Language mapping helpers
 # Default locale for the application (UI shorthand and Odoo code)
@@ -55,6 +152,8 @@ UI_TO_ODOO_LANG = {
     # Prefer nl_BE because nl_NL is not installed on the instance
     'nl': 'nl_BE',
 }
+# Every locale a request can resolve to (see normalize_to_odoo_locale)
+SUPPORTED_ODOO_LOCALES = sorted(set(UI_TO_ODOO_LANG.values()))
 
 ODOO_TO_UI_LANG = {
     'en_US': 'en',
@@ -65,6 +164,74 @@ ODOO_TO_UI_LANG = {
     'nl_BE': 'nl',
 }
 
+# Boot-time warm-up of the published catalog (hooks in gunicorn.conf.py): once in the master
+# before fork with preload_app, otherwise in each worker after it starts. /healthz/ready
+# reports ready once it has finished (also when it failed: workers then start cold)
+BOOT_WARMUP_ENABLED = os.getenv('DECILO_BOOT_WARMUP', 'on').strip().lower() != 'off'
+BOOT_WARMUP_LOCALES = [
+    locale.strip()
+    for locale in os.getenv('DECILO_BOOT_WARMUP_LOCALES', ','.join(SUPPORTED_ODOO_LOCALES)).split(',')
+    if locale.strip()
+]
+BOOT_WARMUP_IMAGE_SIZES = [size.strip() for size in os.getenv('DECILO_BOOT_WARMUP_IMAGE_SIZES', 'medium').split(',') if size.strip()]
+BOOT_WARMUP_TIMEOUT = float(os.getenv('DECILO_BOOT_WARMUP_TIMEOUT', '300'))  # seconds per locale
+# Cap on the whole warm-up run in a preloading gunicorn master, which cannot manage workers meanwhile
+BOOT_WARMUP_MASTER_TIMEOUT = float(os.getenv('DECILO_BOOT_WARMUP_MASTER_TIMEOUT', '300'))  # seconds
+# Compact catalog structure shared by the workers (see catalog_snapshot): built before fork
+# with preload_app, else once per host by the first worker; rebuilt every interval (catches
+# deletions and attribute renames, which the incremental sync below does not see)
+CATALOG_SNAPSHOT_ENABLED = os.getenv('DECILO_CATALOG_SNAPSHOT', 'on').strip().lower() != 'off'
+CATALOG_SNAPSHOT_INTERVAL = int(os.getenv('DECILO_CATALOG_SNAPSHOT_INTERVAL', str(60 * 60)))  # seconds
+CATALOG_SNAPSHOT = catalog_snapshot.snapshot_holder(
+    os.path.join(catalog_cache.CACHE_DIR, 'catalog-snapshot.pickle'),
+    max_age=2 * CATALOG_SNAPSHOT_INTERVAL,
+    on_switch=lambda old, new: apply_catalog_changes(old, new)
+)
+CATALOG_SNAPSHOT_REFRESHER = popularity.background_warmer(
+    'catalog-snapshot', CATALOG_SNAPSHOT_INTERVAL,
+    lambda: refresh_catalog_snapshot(),
+    lock_path=CATALOG_SNAPSHOT.lock_path
+)
+# Incremental sync: one worker per host polls Odoo for records with a newer write_date than
+# the snapshot's watermark and patches the snapshot, caches and image index with them
+CATALOG_SYNC_ENABLED = os.getenv('DECILO_CATALOG_SYNC', 'on').strip().lower() != 'off'
+CATALOG_SYNC_INTERVAL = int(os.getenv('DECILO_CATALOG_SYNC_INTERVAL', '30'))  # seconds
+# Changes are re-read this far behind the watermark: write_date is the transaction's start
+# time, so a long transaction can commit records older than ones already seen
+CATALOG_SYNC_OVERLAP = 120  # seconds
+# More changed templates than this in one poll trigger a full rebuild instead of a patch
+CATALOG_SYNC_MAX_PATCH = int(os.getenv('DECILO_CATALOG_SYNC_MAX_PATCH', '200'))
+# Models polled for changes, with the fields read from them
+CATALOG_SYNC_MODELS = {
+    'product.template': ['write_date'],
+    'product.product': ['product_tmpl_id', 'write_date'],
+    'product.template.attribute.value': ['product_tmpl_id', 'write_date'],
+    'product.template.attribute.exclusion': ['product_tmpl_id', 'write_date'],
+}
+# Memory caches saved to a snapshot file at intervals and on worker exit, and restored (with
+# their remaining TTLs) at boot, so restarts do not start cold. Point DECILO_CACHE_SNAPSHOT_PATH
+# (and DECILO_IMAGE_STORE_DIR, which the image entries refer to) at storage that outlives restarts
+CACHE_SNAPSHOT_ENABLED = (
+    os.getenv('DECILO_CACHE_SNAPSHOT', 'on').strip().lower() != 'off' and catalog_cache.CACHE_BACKEND == 'memory'
+)
+CACHE_SNAPSHOT_PATH = os.getenv('DECILO_CACHE_SNAPSHOT_PATH', os.path.join(catalog_cache.CACHE_DIR, 'cache-snapshot.bin'))
+CACHE_SNAPSHOT_INTERVAL = int(os.getenv('DECILO_CACHE_SNAPSHOT_INTERVAL', str(15 * 60)))  # seconds
+PERSISTED_CACHES = (VARIANT_TEMPLATE_CACHE, DEFAULT_VARIANTS_CACHE, EXCLUSIONS_CACHE, VARIANT_IMAGE_CACHE, PLACEHOLDER_CACHE)
+CACHE_SNAPSHOT_SAVER = popularity.background_warmer(
+    'cache-snapshot', CACHE_SNAPSHOT_INTERVAL,
+    lambda: save_cache_snapshot()
+)
+# Shared secret Odoo automated actions send (X-Decilo-Invalidate-Token) to POST /internal/invalidate;
+# the endpoint is disabled while it is unset
+INVALIDATE_SECRET = os.getenv('DECILO_INVALIDATE_SECRET', '')
+CATALOG_SYNC = popularity.background_warmer(
+    'catalog-sync', CATALOG_SYNC_INTERVAL,
+    lambda: sync_catalog(),
+    lock_path=CATALOG_SNAPSHOT.path + '.sync.lock'
+)
+_WARMUP_LOCK = threading.Lock()
+_WARMUP_STATUS = {'state': 'not_started'}
+
 def normalize_to_odoo_locale(locale_value):
     """Normalize various locale inputs to an Odoo-friendly locale code."""
     if not locale_value:
@@ -104,9 +271,17 @@ def normalize_to_ui_language(locale_value):
         return lower_val
     return DEFAULT_UI_LOCALE
 
+# Locale of the request being served; fan-out tasks see the value captured at submit time
+REQUEST_LOCALE = contextvars.ContextVar('decilo_request_locale', default=DEFAULT_ODOO_LOCALE)
+
 def get_request_locale():
-    """Return the current request locale (Odoo code)."""
-    return getattr(g, 'decilo_locale', DEFAULT_ODOO_LOCALE)
+    """Return the current request locale (Odoo code).
+
+    Works on fan-out threads too, where g is not available.
+    """
+    if has_app_context():
+        return getattr(g, 'decilo_locale', DEFAULT_ODOO_LOCALE)
+    return REQUEST_LOCALE.get()
 
 def create_token(user_data):
     """Create a JWT token for the user"""
@@ -125,6 +300,18 @@ def create_token(user_data):
         logger.error(f"Error creating token: {str(e)}")
         raise
 
+def invalidate_token_required(f):
+    """Decorator to check the shared secret of invalidation webhooks"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not INVALIDATE_SECRET:
+            return jsonify({'error': 'Invalidation is not configured'}), 404
+        token = request.headers.get('X-Decilo-Invalidate-Token', '')
+        if not hmac.compare_digest(token.encode(), INVALIDATE_SECRET.encode()):
+            return jsonify({'error': 'Invalid token'}), 401
+        return f(*args, **kwargs)
+    return decorated
+
 def token_required(f):
     """Decorator to check valid token"""
     @wraps(f)
@@ -152,7 +339,7 @@ def token_required(f):
 def get_odoo_common():
     """Get Odoo common endpoint"""
     try:
-        common = xmlrpc.client.ServerProxy(f'{ODOO_URL}/xmlrpc/2/common', allow_none=True)
+        common = odoo_rpc.server_proxy(ODOO_URL, 'common')
         return common
     except Exception as e:
         logger.error(f"Failed to connect to Odoo common endpoint: {str(e)}")
@@ -180,10 +367,18 @@ class OdooModelsProxy:
     def __getattr__(self, item):
         return getattr(self._models, item)
 
-def get_odoo_models():
-    """Get Odoo models endpoint with locale-aware wrapper"""
+def get_odoo_models(binary_fields=None, spool_max_size=None):
+    """Get Odoo models endpoint with locale-aware wrapper.
+
+    Fields listed in binary_fields are decoded while the response is parsed
+    (bytes, or spooled temp files when spool_max_size is set).
+    """
     try:
-        base_models = xmlrpc.client.ServerProxy(f'{ODOO_URL}/xmlrpc/2/object', allow_none=True)
+        base_models = odoo_rpc.service_models_proxy(
+            SERVICE_ACCOUNT,
+            binary_fields=binary_fields,
+            spool_max_size=spool_max_size
+        )
         return OdooModelsProxy(base_models, get_request_locale)
     except Exception as e:
         logger.error(f"Failed to connect to Odoo models endpoint: {str(e)}")
@@ -192,24 +387,102 @@ def get_odoo_models():
 def get_thread_safe_models(locale):
     """Get Odoo models proxy with a fixed locale for thread-safe usage.
 
-    Use this instead of get_odoo_models() when making RPC calls from threads,
-    since g.decilo_locale may not be accessible in copied request contexts.
+    Useful for work that outlives the request (or runs outside fan_out()), where
+    neither g nor the request's context variables are available.
     """
-    base_models = xmlrpc.client.ServerProxy(f'{ODOO_URL}/xmlrpc/2/object', allow_none=True)
+    base_models = odoo_rpc.service_models_proxy(SERVICE_ACCOUNT)
     return OdooModelsProxy(base_models, lambda: locale)
 
 def get_uid():
-    """Get Odoo user ID"""
+    """Get Odoo user ID (cached per worker, refreshed when Odoo rejects it)"""
     try:
-        common = get_odoo_common()
-        uid = common.authenticate(ODOO_DB, ODOO_USERNAME, ODOO_API_KEY, {})
-        if not uid:
-            raise Exception("Authentication failed")
-        return uid
+        return SERVICE_ACCOUNT.get_uid()
     except Exception as e:
         logger.error(f"Failed to authenticate with Odoo: {str(e)}")
         raise
 
+def get_read_batcher():
+    """Get the request-scoped read batcher (created on first use).
+
+    Reads queued with defer_read() on the same model are sent as one call, and
+    records already read during the request are served from memory.
+    """
+    batcher = g.get('decilo_read_batcher')
+    if batcher is None:
+        batcher = odoo_rpc.ReadBatcher(
+            get_thread_safe_models(get_request_locale()),
+            ODOO_DB, get_uid(), ODOO_API_KEY
+        )
+        g.decilo_read_batcher = batcher
+    return batcher
+
+def fan_out(*calls):
+    """Run independent zero-argument Odoo calls in parallel on the shared pool.
+
+    Results come back in call order; the first failure is re-raised. Calls see
+    the request locale (get_request_locale()/get_odoo_models() work inside them).
+    Wrap a call in odoo_rpc.OptionalCall to get its default back instead of
+    waiting once the request budget is spent (see request_is_partial()).
+    """
+    return ODOO_FANOUT.run_all(*calls)
+
+def request_flight_key():
+    """Single-flight key for an uncached GET: normalized path and query plus locale."""
+    query = tuple(sorted(request.args.items(multi=True)))
+    return ('get', request.path.rstrip('/'), query, get_request_locale())
+
+def request_is_partial():
+    """Whether optional Odoo work was dropped for this request because its budget ran out."""
+    deadline = odoo_rpc.current_deadline()
+    return bool(deadline and deadline.partial)
+
+def cached_with_refresh(cache, cache_key, flight_key, build):
+    """Read-through cache access with stale-while-revalidate.
+
+    Fresh values are returned as is; stale ones (past the soft TTL) are returned
+    right away while build() refreshes them in the background, once per key.
+    Only misses (nothing cached, or past the hard TTL) wait for build().
+    """
+    value, stale = cache.lookup(cache_key)
+    if value is not None:
+        if stale:
+            SINGLE_FLIGHT.start(flight_key, build, ODOO_REFRESH)
+        return value
+    return SINGLE_FLIGHT.do(flight_key, build)
+
+def record_popularity(product_id=None, variant_product_id=None, size_field=None):
+    """Count a template/variant image access for the background warmer (started on first use)."""
+    if not WARM_ENABLED:
+        return
+    if product_id:
+        TEMPLATE_POPULARITY.record((get_request_locale(), product_id))
+    if variant_product_id and size_field:
+        VARIANT_POPULARITY.record((variant_product_id, size_field))
+    CATALOG_WARMER.ensure_started()
+
+def no_request_budget(f):
+    """Decorator exempting an endpoint that writes to Odoo from the request budget.
+
+    Aborting a sequence of writes halfway leaves partial records behind (and a
+    client retry duplicates them), so these calls only use the socket timeout.
+    Apply it directly below the route decorator.
+    """
+    f.skip_request_budget = True
+    return f
+
+@decilo_bp.before_app_request
+def start_request_deadline():
+    """Give the request's Odoo calls a shared time budget (every blueprint; read endpoints only)."""
+    view = current_app.view_functions.get(request.endpoint)
+    if getattr(view, 'skip_request_budget', False):
+        return
+    odoo_rpc.set_deadline(REQUEST_BUDGET_SECONDS)
+
+@decilo_bp.teardown_app_request
+def clear_request_deadline(exc):
+    # Worker threads are reused across requests
+    odoo_rpc.clear_deadline()
+
 @decilo_bp.before_app_request
 def set_request_locale():
     """Middleware-style hook to determine locale for the current request."""
@@ -232,8 +505,16 @@ def set_request_locale():
                 locale = None
 
     g.decilo_locale = normalize_to_odoo_locale(locale)
+    REQUEST_LOCALE.set(g.decilo_locale)
     logger.info(f"[locale] Selected locale for request: {g.decilo_locale}")
 
+@decilo_bp.after_app_request
+def advertise_client_hints(response):
+    """Ask browsers for DPR/Width/Save-Data hints on page loads, used to size image renditions."""
+    if response.mimetype == 'text/html':
+        response.headers.setdefault('Accept-CH', image_renditions.ACCEPT_CH)
+    return response
+
 @decilo_bp.route('/decilo-api/customer-login', methods=['POST'])
 def customer_login():
     logger.info("Received request for /decilo-api/customer-login")
@@ -308,6 +589,7 @@ def customer_login():
 
 
 @decilo_bp.route('/decilo-api/customer-signup', methods=['POST'])
+@no_request_budget
 def customer_signup():
     logger.info("Received request for /decilo-api/customer-signup")
     try:
@@ -405,27 +687,24 @@ class OdooClient(ABC):
 
 class OdooXMLRPCClient(OdooClient):
     """XML-RPC implementation of Odoo API operations"""
+
+    protocol = 'xmlrpc'
     
     def __init__(self, url, db, username, api_key):
         self.url = url
         self.db = db
         self.username = username
         self.api_key = api_key
-        self._uid = None
-        self._models = None
+        # Shared with the module-level get_uid() when the credentials match
+        self._account = odoo_rpc.get_service_account(url, db, username, api_key)
     
     def authenticate(self):
-        if not self._uid:
-            common = xmlrpc.client.ServerProxy(f'{self.url}/xmlrpc/2/common', allow_none=True)
-            self._uid = common.authenticate(self.db, self.username, self.api_key, {})
-            if not self._uid:
-                raise Exception("Authentication failed")
-        return self._uid
+        return self._account.get_uid()
     
     def _get_models(self):
-        # Always create a fresh proxy to avoid stale HTTP connections causing transport errors
+        # The pooled transport evicts stale keep-alive connections before reuse
         return OdooModelsProxy(
-            xmlrpc.client.ServerProxy(f'{self.url}/xmlrpc/2/object', allow_none=True),
+            odoo_rpc.service_models_proxy(self._account, self.protocol),
             get_request_locale
         )
     
@@ -444,7 +723,8 @@ class OdooXMLRPCClient(OdooClient):
                 'categ_id',
                 'description_sale',
                 'description_ecommerce',
-                'x_studio_is_published_b2audio'
+                'x_studio_is_published_b2audio',
+                'write_date'  # versions the image placeholder and the signed image URL
             ]
             if include_variants:
                 fields.append('attribute_line_ids')
@@ -640,13 +920,16 @@ class OdooXMLRPCClient(OdooClient):
         return size_map.get(size, 'image_512')
 
     def get_product_images(self, product_ids, size='medium'):
-        """Fetch images for a list of product IDs, preserving input order"""
+        """Fetch images (base64 strings) for a list of product IDs, preserving input order.
+
+        The binary frames path reads raw bytes through the image caches instead.
+        """
         if not product_ids:
             return []
 
         uid = self.authenticate()
-        models = self._get_models()
         size_field = self._image_field_for_size(size)
+        models = self._get_models()
 
         records = models.execute_kw(
             self.db, uid, self.api_key,
@@ -666,6 +949,21 @@ class OdooXMLRPCClient(OdooClient):
             })
         return images
 
+class OdooJSONRPCClient(OdooXMLRPCClient):
+    """JSON-RPC implementation of Odoo API operations.
+
+    Reuses the queries of OdooXMLRPCClient over Odoo's /jsonrpc endpoint, where
+    decoding large base64 image payloads is much cheaper than XML unmarshalling.
+    """
+
+    protocol = 'jsonrpc'
+
+def create_odoo_client(protocol=None):
+    """Build the Odoo client for the configured protocol (DECILO_ODOO_PROTOCOL)."""
+    protocol = protocol or odoo_rpc.ODOO_RPC_PROTOCOL
+    client_class = OdooJSONRPCClient if protocol == 'jsonrpc' else OdooXMLRPCClient
+    return client_class(ODOO_URL, ODOO_DB, ODOO_USERNAME, ODOO_API_KEY)
+
 def resolve_variant_product(models, uid, product_template_id, selected_variants):
     """Resolve product.product ID for a template + selected variant names."""
     variant_product_id = None
@@ -747,13 +1045,19 @@ def resolve_variant_product(models, uid, product_template_id, selected_variants)
 
 def get_template_variant_cache(models, uid, product_template_id):
     """Build or return cached per-template data for fast variant resolution."""
-    now = time.time()
     locale = get_request_locale()
+    snapshot = current_catalog_snapshot()
+    if snapshot is not None:
+        data = snapshot.template_variant_data(product_template_id, locale)
+        if data is not None:
+            return data
     cache_key = (product_template_id, locale)
-    cached = VARIANT_TEMPLATE_CACHE.get(cache_key)
-    if cached and cached.get('expires_at', 0) > now:
-        return cached
+    return cached_with_refresh(
+        VARIANT_TEMPLATE_CACHE, cache_key, ('variant_template', cache_key),
+        lambda: _build_template_variant_cache(models, uid, product_template_id, cache_key)
+    )
 
+def _build_template_variant_cache(models, uid, product_template_id, cache_key):
     # Fetch all PTAVs for the template
     ptav_ids = models.execute_kw(
         ODOO_DB, uid, ODOO_API_KEY,
@@ -829,12 +1133,367 @@ def get_template_variant_cache(models, uid, product_template_id):
     cached = {
         'attr_val_to_ptav': attr_val_to_ptav,
         'pav_to_ptav': pav_to_ptav,
-        'candidates': candidates,
-        'expires_at': now + VARIANT_TEMPLATE_CACHE_TTL
+        'candidates': candidates
     }
-    VARIANT_TEMPLATE_CACHE[cache_key] = cached
+    VARIANT_TEMPLATE_CACHE.set(cache_key, cached)
     return cached
 
+def remember_variant_selection(cache_key, product_id, variant_product_id, ptav_ids, source, size, image_key):
+    """Cache how a variant selection resolved; the image itself is cached under image_key."""
+    selection = {
+        'product_id': product_id,
+        'variant_product_id': variant_product_id,
+        'ptav_ids': ptav_ids,
+        'source': source,
+        'size': size,
+        'image_key': image_key
+    }
+    VARIANT_IMAGE_CACHE.set(cache_key, selection)
+    return selection
+
+def variant_image_payload(selection, image, inline=True):
+    """Build the variant image response for a resolved selection (signed image_url, plus the data URL if inline)."""
+    payload = {k: v for k, v in selection.items() if k != 'image_key'}
+    kind, record_id, _ = selection['image_key']
+    payload['image_url'] = sign_image_url(kind, record_id, selection['size'], image.write_date)
+    if inline:
+        payload['image'] = image.data_url()
+    return payload
+
+def cached_variant_image_payload(cache_key, inline=True):
+    """Response for a cached selection, or None if the selection or its image is not cached."""
+    selection = VARIANT_IMAGE_CACHE.get(cache_key)
+    if not selection:
+        return None
+    kind, record_id, size_field = selection['image_key']
+    image, stale = lookup_cached_image(selection['image_key'])
+    if not image:
+        return None
+    if stale:
+        _refresh_record_image_in_background(SIGNED_IMAGE_KINDS[kind], record_id, size_field, selection['image_key'])
+    try:
+        return variant_image_payload(selection, image, inline)
+    except FileNotFoundError:
+        # Garbage-collected since the lookup: the caller resolves the image again
+        return None
+
+def lookup_cached_image(image_key):
+    """VARIANT_IMAGE_CACHE.lookup() of an image; drops entries whose store file is gone.
+
+    The image store's garbage collection only sees its own index, so other workers (or a
+    restored cache snapshot) can still hold StoredImage entries of files it has deleted.
+    """
+    image, stale = VARIANT_IMAGE_CACHE.lookup(image_key)
+    if isinstance(image, image_store.StoredImage) and not os.path.exists(image.path):
+        logger.info(f"[image-store] {image_key} was garbage-collected, fetching it again")
+        VARIANT_IMAGE_CACHE.pop(image_key)
+        return None, False
+    return image, stale
+
+def get_cached_variant_image(variant_product_id, size_field, refresh=False):
+    """Return a variant's image (None if it has none); refresh=True re-reads it from Odoo."""
+    return _get_cached_record_image('product.product', variant_product_id, size_field, ('variant', variant_product_id, size_field), refresh)
+
+def get_cached_template_image(product_id, size, refresh=False):
+    """Return a product template's image (None if it has none); refresh=True re-reads it from Odoo."""
+    size_field = odoo_client._image_field_for_size(size)
+    return _get_cached_record_image('product.template', product_id, size_field, ('template', product_id, size_field), refresh)
+
+def _get_cached_record_image(model, record_id, size_field, image_key, refresh=False):
+    if not refresh:
+        image, stale = lookup_cached_image(image_key)
+        if image:
+            if stale:
+                _refresh_record_image_in_background(model, record_id, size_field, image_key)
+            return image
+
+    return SINGLE_FLIGHT.do(
+        ('variant_image', image_key),
+        lambda: _fetch_record_image(model, record_id, size_field, image_key, refresh)
+    )
+
+def _refresh_record_image_in_background(model, record_id, size_field, image_key):
+    """Re-read a stale cached image on the refresh pool; callers keep serving the stale one."""
+    SINGLE_FLIGHT.start(
+        ('variant_image', image_key),
+        lambda: _fetch_record_image(model, record_id, size_field, image_key),
+        ODOO_REFRESH
+    )
+
+def _fetch_record_image(model, record_id, size_field, image_key, refresh=False):
+    # Another worker on this host may already have stored (or refreshed) it
+    if IMAGE_STORE is not None and not refresh:
+        stored = IMAGE_STORE.lookup(model, record_id, size_field, max_age=VARIANT_IMAGE_CACHE_TTL)
+        if stored:
+            VARIANT_IMAGE_CACHE.set(image_key, stored)
+            return stored
+
+    # Decode the image while parsing the response (no base64 copy)
+    records = get_odoo_models(binary_fields=[size_field]).execute_kw(
+        ODOO_DB, get_uid(), ODOO_API_KEY,
+        model, 'read',
+        [[record_id]],
+        {'fields': [size_field, 'write_date']}
+    )
+    if not records or not records[0].get(size_field):
+        return None
+    data = records[0][size_field]
+
+    fetched = None
+    if IMAGE_STORE is not None:
+        try:
+            fetched = IMAGE_STORE.store(model, record_id, size_field, data, records[0].get('write_date'))
+        except OSError as e:
+            logger.warning(f"Could not write {model} {record_id} {size_field} to the image store: {e}")
+    if fetched is None:
+        fetched = catalog_cache.CachedImage.from_bytes(data, records[0].get('write_date'))
+    VARIANT_IMAGE_CACHE.set(image_key, fetched)
+    if model == 'product.template' and size_field in ('image_128', 'image_256', 'image_512'):
+        # Small template images are cheap to shrink: refresh the listing placeholder as well
+        cached = PLACEHOLDER_CACHE.get(('placeholder', record_id))
+        if not cached or cached[0] != fetched.write_date:
+            remember_template_placeholder(record_id, fetched.write_date, data, fetched.mimetype)
+    return fetched
+
+def get_image_rendition(kind, record_id, rendition):
+    """Resized/transcoded image of a record (see image_renditions), or None if it has no image.
+
+    Only the Odoo size covering the rendition is fetched; renditions are cached like the
+    originals and re-rendered when the source image's write_date changes.
+    """
+    model = SIGNED_IMAGE_KINDS[kind]
+    source_field = rendition.source_field
+    source = _get_cached_record_image(model, record_id, source_field, (kind, record_id, source_field))
+    if not source:
+        return None
+
+    # Renditions are keyed by the source's content hash, so a stale one still matches its source
+    rendition_key = (kind, record_id, source_field, source.sha256, rendition.key)
+    image, _ = lookup_cached_image(rendition_key)
+    if image:
+        return image
+
+    def build():
+        index_field = f"{source_field}@{rendition.key}"
+        if IMAGE_STORE is not None and source.write_date:
+            stored = IMAGE_STORE.lookup(model, record_id, index_field)
+            if stored and stored.write_date == source.write_date:
+                VARIANT_IMAGE_CACHE.set(rendition_key, stored)
+                return stored
+
+        data = read_cached_image(
+            source, lambda: _get_cached_record_image(model, record_id, source_field, (kind, record_id, source_field))
+        )
+        rendered = image_renditions.render(data, source.mimetype, rendition)
+        if rendered is None:
+            built = source
+        else:
+            built = None
+            if IMAGE_STORE is not None:
+                try:
+                    built = IMAGE_STORE.store(model, record_id, index_field, rendered, source.write_date)
+                except OSError as e:
+                    logger.warning(f"Could not write {model} {record_id} {index_field} to the image store: {e}")
+            if built is None:
+                built = catalog_cache.CachedImage.from_bytes(rendered, source.write_date)
+        VARIANT_IMAGE_CACHE.set(rendition_key, built)
+        return built
+
+    return SINGLE_FLIGHT.do(('image_rendition', rendition_key), build)
+
+def read_cached_image(image, reload):
+    """Bytes of a cached image; if its store file was garbage-collected meanwhile, of reload() instead."""
+    if not isinstance(image, image_store.StoredImage):
+        return image.data
+    try:
+        return image.read()
+    except FileNotFoundError:
+        # The lookup in reload() drops the entry and fetches the image again
+        image = reload()
+        if not image:
+            return b''
+        return image.read() if isinstance(image, image_store.StoredImage) else image.data
+
+def send_record_image(kind, record_id, size_field, public_max_age=None, version=None):
+    """Serve a variant/template image negotiated from Accept and client hints; None if it has no image.
+
+    With public_max_age (signed URLs), the response is only cached as immutable when the
+    URL's version matches the image served; otherwise shared caches must revalidate it.
+    """
+    rendition = image_renditions.negotiate(request.headers, request.args, size_field)
+    for attempt in range(2):
+        if rendition is None:
+            image = _get_cached_record_image(SIGNED_IMAGE_KINDS[kind], record_id, size_field, (kind, record_id, size_field))
+        else:
+            image = get_image_rendition(kind, record_id, rendition)
+        if not image:
+            return None
+        max_age = public_max_age
+        if max_age is not None and (version is None or version != image_version(image.write_date)):
+            max_age = 0
+        try:
+            response = send_image(image, max_age)
+            break
+        except FileNotFoundError:
+            # Garbage-collected since the lookup, which drops it (and fetches it again) the second time
+            if attempt:
+                raise
+    response.vary.update(image_renditions.VARY_HEADERS)
+    response.headers['Accept-CH'] = image_renditions.ACCEPT_CH
+    return response
+
+def remember_template_placeholder(product_id, write_date, data, mimetype):
+    """Build and cache the placeholder of a template image; returns its data URL (None if it cannot be built)."""
+    rendered = image_renditions.placeholder(data, mimetype) if data else None
+    if rendered is None:
+        # Negative entry: not tried again until the template's write_date changes
+        PLACEHOLDER_CACHE.set(('placeholder', product_id), (write_date, None))
+        return None
+    stored = None
+    if IMAGE_STORE is not None:
+        try:
+            stored = IMAGE_STORE.store('product.template', product_id, PLACEHOLDER_FIELD, rendered, write_date)
+        except OSError as e:
+            logger.warning(f"Could not write the placeholder of product {product_id} to the image store: {e}")
+    data_url = (stored or catalog_cache.CachedImage.from_bytes(rendered, write_date)).data_url()
+    PLACEHOLDER_CACHE.set(('placeholder', product_id), (write_date, data_url))
+    return data_url
+
+def get_template_placeholders(products):
+    """Placeholder data URLs of listed templates ({id: data URL}) that match their current write_date.
+
+    Missing or outdated placeholders are built in the background (one batched read of the
+    small image field), so the listing never waits for them. Templates without a usable
+    image are remembered as such and not read again until their write_date changes.
+    """
+    placeholders = {}
+    missing = []
+    for product in products:
+        product_id, write_date = product.get('id'), product.get('write_date')
+        if not product_id or not write_date:
+            continue
+        cached = PLACEHOLDER_CACHE.get(('placeholder', product_id))
+        if cached and cached[0] == write_date:
+            if cached[1]:
+                placeholders[product_id] = cached[1]
+            continue
+        if IMAGE_STORE is not None:
+            stored = IMAGE_STORE.lookup('product.template', product_id, PLACEHOLDER_FIELD)
+            if stored and stored.write_date == write_date:
+                data_url = stored.data_url()
+                PLACEHOLDER_CACHE.set(('placeholder', product_id), (write_date, data_url))
+                placeholders[product_id] = data_url
+                continue
+        missing.append(product_id)
+
+    if missing:
+        flight_key = ('placeholders', tuple(sorted(missing)))
+        SINGLE_FLIGHT.start(flight_key, lambda: _build_template_placeholders(missing), ODOO_REFRESH)
+    return placeholders
+
+def _build_template_placeholders(product_ids):
+    try:
+        records = get_odoo_models(binary_fields=[PLACEHOLDER_SOURCE_FIELD]).execute_kw(
+            ODOO_DB, get_uid(), ODOO_API_KEY,
+            'product.template', 'read',
+            [product_ids],
+            {'fields': [PLACEHOLDER_SOURCE_FIELD, 'write_date']}
+        )
+        for record in records:
+            # Records without an image get a negative entry as well, so listings stop asking for them
+            data = record.get(PLACEHOLDER_SOURCE_FIELD)
+            mimetype = catalog_cache.sniff_image_mimetype(data) if data else None
+            remember_template_placeholder(record['id'], record.get('write_date'), data, mimetype)
+        logger.info(f"[placeholders] built placeholders for {len(records)} products")
+    except Exception as e:
+        logger.warning(f"[placeholders] could not build placeholders for {len(product_ids)} products: {e}")
+
+def format_odoo_datetime(value):
+    """Format an aware datetime as an Odoo datetime string (UTC)."""
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+def parse_odoo_datetime(value):
+    """Parse an Odoo datetime string (UTC, 'YYYY-MM-DD HH:MM:SS') into an aware datetime."""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+def send_image(image, public_max_age=None):
+    """Serve a cached image with validators; files from the disk store go out through send_file (sendfile).
+
+    The content hash is a strong ETag and write_date the Last-Modified, so
+    revalidations (If-None-Match / If-Modified-Since) are answered with 304
+    without sending the image. With public_max_age (signed URLs) the response
+    may be stored by shared caches and is never revalidated; 0 makes them
+    revalidate it on every use.
+    """
+    last_modified = parse_odoo_datetime(image.write_date)
+    if isinstance(image, image_store.StoredImage):
+        response = send_file(
+            image.path,
+            mimetype=image.mimetype,
+            etag=image.sha256,
+            last_modified=last_modified,
+            conditional=True
+        )
+    else:
+        response = Response(image.data, mimetype=image.mimetype)
+        response.set_etag(image.sha256)
+        response.last_modified = last_modified
+        response = response.make_conditional(request)
+    # Assigned whole: send_file() without max_age has already set no-cache, which must not stay
+    if public_max_age == 0:
+        response.headers['Cache-Control'] = "public, no-cache"
+    elif public_max_age is not None:
+        response.headers['Cache-Control'] = f"public, max-age={public_max_age}, immutable"
+    else:
+        response.headers['Cache-Control'] = f"private, max-age={IMAGE_CACHE_CONTROL_MAX_AGE}"
+    return response
+
+def image_version(write_date):
+    """Content version of an image in signed URLs: its record's write_date as unix time (None if unknown)."""
+    modified = parse_odoo_datetime(write_date)
+    return str(int(modified.timestamp())) if modified else None
+
+def _image_url_signature(kind, record_id, size_field, expires, version):
+    message = f"{kind}:{record_id}:{size_field}:{expires}:{version or ''}".encode('ascii')
+    return hmac.new(IMAGE_URL_SECRET, message, hashlib.sha256).hexdigest()[:32]
+
+def sign_image_url(kind, record_id, size, write_date=None):
+    """Signed URL of a variant or template image that can be loaded without the Authorization header.
+
+    The expiry is rounded up to the next IMAGE_URL_TTL window (so a URL stays valid for at
+    least IMAGE_URL_TTL), which keeps URLs identical for a window and cacheable. With the
+    record's write_date the URL changes with the image, and its response is cached as immutable.
+    """
+    if not record_id or not IMAGE_URL_SECRET:
+        return None
+    size_field = odoo_client._image_field_for_size(size)
+    expires = (int(time.time()) // IMAGE_URL_TTL + 2) * IMAGE_URL_TTL
+    version = image_version(write_date)
+    signature = _image_url_signature(kind, record_id, size_field, expires, version)
+    url = f"/decilo-api/img/{kind}/{record_id}/{size_field}?exp={expires}&sig={signature}"
+    return f"{url}&v={version}" if version else url
+
+def verify_image_url(kind, record_id, size_field, expires, signature, version=None):
+    """Check a signed image URL; returns the seconds it stays valid, or None if invalid or expired."""
+    if not IMAGE_URL_SECRET:
+        return None
+    if kind not in SIGNED_IMAGE_KINDS or size_field not in SIGNED_IMAGE_FIELDS:
+        return None
+    if expires is None or not signature or (version is not None and not version.isdigit()):
+        return None
+    remaining = expires - int(time.time())
+    if remaining <= 0:
+        return None
+    expected = _image_url_signature(kind, record_id, size_field, expires, version)
+    if not hmac.compare_digest(expected, signature):
+        return None
+    return remaining
+
 def resolve_variant_from_cache(models, uid, product_template_id, selected_variants):
     """Resolve variant using cached per-template metadata to avoid extra RPCs."""
     cache = get_template_variant_cache(models, uid, product_template_id)
@@ -906,7 +1565,7 @@ def resolve_variant_from_cache_by_pav_ids(models, uid, product_template_id, sele
     return None, needed_ptavs, "Could not resolve product variant for the selected options"
 
 # Initialize the Odoo client
-odoo_client = OdooXMLRPCClient(ODOO_URL, ODOO_DB, ODOO_USERNAME, ODOO_API_KEY)
+odoo_client = create_odoo_client()
 
 @decilo_bp.route('/decilo-api/products', methods=['GET'])
 @token_required
@@ -919,6 +1578,7 @@ def get_products(current_user):
         order = request.args.get('order', 'name asc')
         search = request.args.get('search')
         category_id = request.args.get('category_id', type=int)
+        image_size = request.args.get('image_size', 'medium')
 
         logger.info(f"🔍 GET_PRODUCTS called with params - limit: {limit}, offset: {offset}, search: {search}, category_id: {category_id}")
 
@@ -948,6 +1608,13 @@ def get_products(current_user):
         logger.info(f"📦 Found {len(products)} products matching domain")
         for i, product in enumerate(products):
             logger.info(f"   Product {i+1}: id={product.get('id')}, name='{product.get('name')}', category='{product.get('categ_id', ['?', '?'])[1]}'")
+            # Signed URL so the browser loads the image directly (no Authorization header)
+            product['image_url'] = sign_image_url('template', product.get('id'), image_size, product.get('write_date'))
+
+        # Blurred placeholders shown until the images load
+        placeholders = get_template_placeholders(products)
+        for product in products:
+            product['image_placeholder'] = placeholders.get(product.get('id'))
 
         # Get all categories for filtering
         uid = get_uid()
@@ -992,238 +1659,251 @@ def get_products(current_user):
         return jsonify({'error': error_msg, 'code': 'unknown_error'}), 500
 
 
-@decilo_bp.route('/decilo-api/products/default-variants', methods=['GET'])
-@token_required
-def get_default_variant_ids(current_user):
-    """
-    Get default variant product IDs for all published products.
-    Used for background prefetching to enable instant image loading on click.
+def _build_default_variants_payload(cache_key, only_ids=None):
+    """Resolve the default variant of every published product (a handful of bulk RPCs).
 
-    Returns:
-        { "variants": { product_template_id: variant_product_id, ... } }
+    With only_ids, just those products are resolved (and nothing is cached).
     """
-    try:
-        now = time.time()
-        locale = get_request_locale()
-        cache_key = (locale,)
-        cached = DEFAULT_VARIANTS_CACHE.get(cache_key)
-        if cached and cached.get('expires_at', 0) > now:
-            return jsonify(cached['payload'])
+    uid = get_uid()
+    models = get_odoo_models()
+
+    # Get all published products in one call (combined search + read)
+    domain = [
+        ('sale_ok', '=', True),
+        ('x_studio_is_published_b2audio', '=', True)
+    ]
+    if only_ids is not None:
+        domain.append(('id', 'in', list(only_ids)))
+
+    products = models.execute_kw(
+        ODOO_DB, uid, ODOO_API_KEY,
+        'product.template', 'search_read',
+        [domain],
+        {'fields': ['id', 'attribute_line_ids', 'product_variant_id']}
+    )
 
-        uid = get_uid()
-        models = get_odoo_models()
+    if not products:
+        return {'variants': {}}
 
-        # Get all published products in one call (combined search + read)
-        domain = [
-            ('sale_ok', '=', True),
-            ('x_studio_is_published_b2audio', '=', True)
-        ]
+    product_ids = [p['id'] for p in products]
 
-        products = models.execute_kw(
+    # Collect all attribute line IDs for batch fetch
+    all_attr_line_ids = list(set(
+        line_id
+        for p in products
+        for line_id in p.get('attribute_line_ids', [])
+    ))
+
+    # Attribute lines, PTAVs and variants are independent: fetch them in parallel
+    def fetch_attr_lines():
+        if not all_attr_line_ids:
+            return []
+        return get_odoo_models().execute_kw(
             ODOO_DB, uid, ODOO_API_KEY,
-            'product.template', 'search_read',
-            [domain],
-            {'fields': ['id', 'attribute_line_ids', 'product_variant_id']}
+            'product.template.attribute.line', 'read',
+            [all_attr_line_ids],
+            {'fields': ['id', 'attribute_id', 'value_ids']}
         )
 
-        if not products:
-            return jsonify({'variants': {}})
-
-        product_ids = [p['id'] for p in products]
-
-        # Collect all attribute line IDs for batch fetch
-        all_attr_line_ids = list(set(
-            line_id
-            for p in products
-            for line_id in p.get('attribute_line_ids', [])
-        ))
-
-        # Capture locale before spawning threads (g.decilo_locale is not thread-safe)
-        request_locale = get_request_locale()
-
-        # Define fetch functions for parallel execution
-        # Each thread needs its own models proxy (XML-RPC connections aren't thread-safe)
-        def fetch_attr_lines():
-            if not all_attr_line_ids:
-                return []
-            thread_models = get_thread_safe_models(request_locale)
-            return thread_models.execute_kw(
-                ODOO_DB, uid, ODOO_API_KEY,
-                'product.template.attribute.line', 'read',
-                [all_attr_line_ids],
-                {'fields': ['id', 'attribute_id', 'value_ids']}
-            )
-
-        def fetch_ptavs():
-            thread_models = get_thread_safe_models(request_locale)
-            return thread_models.execute_kw(
-                ODOO_DB, uid, ODOO_API_KEY,
-                'product.template.attribute.value', 'search_read',
-                [[('product_tmpl_id', 'in', product_ids)]],
-                {'fields': ['id', 'product_tmpl_id', 'product_attribute_value_id']}
-            )
-
-        def fetch_variants():
-            thread_models = get_thread_safe_models(request_locale)
-            return thread_models.execute_kw(
-                ODOO_DB, uid, ODOO_API_KEY,
-                'product.product', 'search_read',
-                [[('product_tmpl_id', 'in', product_ids)]],
-                {'fields': ['id', 'product_tmpl_id', 'product_template_attribute_value_ids']}
-            )
+    def fetch_ptavs():
+        return get_odoo_models().execute_kw(
+            ODOO_DB, uid, ODOO_API_KEY,
+            'product.template.attribute.value', 'search_read',
+            [[('product_tmpl_id', 'in', product_ids)]],
+            {'fields': ['id', 'product_tmpl_id', 'product_attribute_value_id']}
+        )
 
-        # Execute attribute lines, PTAVs, and variants in parallel
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            future_attr_lines = executor.submit(copy_current_request_context(fetch_attr_lines))
-            future_ptavs = executor.submit(copy_current_request_context(fetch_ptavs))
-            future_variants = executor.submit(copy_current_request_context(fetch_variants))
-
-            attr_lines = future_attr_lines.result()
-            all_ptavs = future_ptavs.result()
-            all_variants = future_variants.result()
-
-        attr_lines_by_id = {al['id']: al for al in attr_lines}
-
-        # Fetch attributes for ear impression check (depends on attr_lines)
-        attr_ids = list(set(
-            line['attribute_id'][0]
-            for line in attr_lines_by_id.values()
-            if line.get('attribute_id')
-        ))
-        all_attrs = models.execute_kw(
+    def fetch_variants():
+        return get_odoo_models().execute_kw(
             ODOO_DB, uid, ODOO_API_KEY,
-            'product.attribute', 'search_read',
-            [[('id', 'in', attr_ids)]],
-            {'fields': ['id', 'name']}
-        ) if attr_ids else []
-
-        # Build per-template lookup structures (no RPC calls needed)
-        # Map: product_template_id -> { pav_id -> ptav_id }
-        # Using PAV IDs (product.attribute.value) for robust matching instead of names
-        pav_to_ptav_by_template = {}
-        for ptav in all_ptavs:
-            tmpl_id = ptav['product_tmpl_id'][0] if isinstance(ptav.get('product_tmpl_id'), (list, tuple)) else ptav.get('product_tmpl_id')
-            if not tmpl_id:
-                continue
-            pav_ref = ptav.get('product_attribute_value_id')
-            pav_id = pav_ref[0] if isinstance(pav_ref, (list, tuple)) else pav_ref
-            if pav_id:
-                if tmpl_id not in pav_to_ptav_by_template:
-                    pav_to_ptav_by_template[tmpl_id] = {}
-                pav_to_ptav_by_template[tmpl_id][pav_id] = ptav['id']
-
-        # Map: product_template_id -> list of candidate variants with their PTAVs
-        candidates_by_template = {}
-        for variant in all_variants:
-            tmpl_id = variant['product_tmpl_id'][0] if isinstance(variant.get('product_tmpl_id'), (list, tuple)) else variant.get('product_tmpl_id')
-            if not tmpl_id:
-                continue
-            if tmpl_id not in candidates_by_template:
-                candidates_by_template[tmpl_id] = []
-            candidates_by_template[tmpl_id].append({
-                'id': variant['id'],
-                'ptavs': set(variant.get('product_template_attribute_value_ids', []))
-            })
+            'product.product', 'search_read',
+            [[('product_tmpl_id', 'in', product_ids)]],
+            {'fields': ['id', 'product_tmpl_id', 'product_template_attribute_value_ids']}
+        )
 
-        # Build set of "ear impression" attribute IDs to skip (using IDs, not names)
-        ear_impression_attr_ids = set()
-        for attr in all_attrs:
-            if 'ear impression' in attr.get('name', '').lower():
-                ear_impression_attr_ids.add(attr['id'])
+    attr_lines, all_ptavs, all_variants = fan_out(fetch_attr_lines, fetch_ptavs, fetch_variants)
 
-        # Now resolve default variant for each product (no RPC calls!)
-        result = {}
-        for product in products:
-            product_id = product['id']
-            attr_line_ids = product.get('attribute_line_ids', [])
-
-            if not attr_line_ids:
-                # No variants - use template's default variant (already fetched)
-                default_variant = product.get('product_variant_id')
-                if default_variant:
-                    variant_id = default_variant[0] if isinstance(default_variant, (list, tuple)) else default_variant
-                    result[product_id] = variant_id
-                else:
-                    # Fallback to first candidate
-                    candidates = candidates_by_template.get(product_id, [])
-                    if candidates:
-                        result[product_id] = candidates[0]['id']
-                continue
+    attr_lines_by_id = {al['id']: al for al in attr_lines}
 
-            # Compute default selections as PAV IDs (first value of each attribute, skip ear impression)
-            # Using IDs instead of names for robust matching across locales
-            default_pav_ids = []
-            for line_id in attr_line_ids:
-                line = attr_lines_by_id.get(line_id, {})
-                attr_ref = line.get('attribute_id', [0, ''])
-                attr_id = attr_ref[0] if isinstance(attr_ref, (list, tuple)) else attr_ref
-                value_ids = line.get('value_ids', [])
-
-                # Skip ear impression attributes
-                if attr_id in ear_impression_attr_ids:
-                    continue
+    # Fetch attributes for ear impression check (depends on attr_lines)
+    attr_ids = list(set(
+        line['attribute_id'][0]
+        for line in attr_lines_by_id.values()
+        if line.get('attribute_id')
+    ))
+    all_attrs = models.execute_kw(
+        ODOO_DB, uid, ODOO_API_KEY,
+        'product.attribute', 'search_read',
+        [[('id', 'in', attr_ids)]],
+        {'fields': ['id', 'name']}
+    ) if attr_ids else []
 
-                # Get first value (as PAV ID)
-                if value_ids:
-                    default_pav_ids.append(value_ids[0])
-
-            # Resolve variant locally (no RPC calls!)
-            pav_to_ptav = pav_to_ptav_by_template.get(product_id, {})
-            candidates = candidates_by_template.get(product_id, [])
-
-            if not default_pav_ids:
-                # No selections needed, use default variant or first candidate
-                default_variant = product.get('product_variant_id')
-                if default_variant:
-                    variant_id = default_variant[0] if isinstance(default_variant, (list, tuple)) else default_variant
-                    result[product_id] = variant_id
-                elif candidates:
-                    result[product_id] = candidates[0]['id']
-                continue
+    # Build per-template lookup structures (no RPC calls needed)
+    # Map: product_template_id -> { pav_id -> ptav_id }
+    # Using PAV IDs (product.attribute.value) for robust matching instead of names
+    pav_to_ptav_by_template = {}
+    for ptav in all_ptavs:
+        tmpl_id = ptav['product_tmpl_id'][0] if isinstance(ptav.get('product_tmpl_id'), (list, tuple)) else ptav.get('product_tmpl_id')
+        if not tmpl_id:
+            continue
+        pav_ref = ptav.get('product_attribute_value_id')
+        pav_id = pav_ref[0] if isinstance(pav_ref, (list, tuple)) else pav_ref
+        if pav_id:
+            if tmpl_id not in pav_to_ptav_by_template:
+                pav_to_ptav_by_template[tmpl_id] = {}
+            pav_to_ptav_by_template[tmpl_id][pav_id] = ptav['id']
+
+    # Map: product_template_id -> list of candidate variants with their PTAVs
+    candidates_by_template = {}
+    for variant in all_variants:
+        tmpl_id = variant['product_tmpl_id'][0] if isinstance(variant.get('product_tmpl_id'), (list, tuple)) else variant.get('product_tmpl_id')
+        if not tmpl_id:
+            continue
+        if tmpl_id not in candidates_by_template:
+            candidates_by_template[tmpl_id] = []
+        candidates_by_template[tmpl_id].append({
+            'id': variant['id'],
+            'ptavs': set(variant.get('product_template_attribute_value_ids', []))
+        })
 
-            # Convert PAV IDs to PTAV IDs
-            needed_ptavs = []
-            for pav_id in default_pav_ids:
-                ptav_id = pav_to_ptav.get(pav_id)
-                if ptav_id:
-                    needed_ptavs.append(ptav_id)
-
-            # Guard: if we couldn't map all PAV IDs to PTAVs, fall back to default variant
-            if len(needed_ptavs) != len(default_pav_ids):
-                logger.warning(f"Product {product_id}: Could not map all PAV IDs to PTAVs "
-                             f"({len(needed_ptavs)}/{len(default_pav_ids)}), using default variant")
-                default_variant = product.get('product_variant_id')
-                if default_variant:
-                    variant_id = default_variant[0] if isinstance(default_variant, (list, tuple)) else default_variant
-                    result[product_id] = variant_id
-                elif candidates:
+    # Build set of "ear impression" attribute IDs to skip (using IDs, not names)
+    ear_impression_attr_ids = set()
+    for attr in all_attrs:
+        if 'ear impression' in attr.get('name', '').lower():
+            ear_impression_attr_ids.add(attr['id'])
+
+    # Now resolve default variant for each product (no RPC calls!)
+    result = {}
+    for product in products:
+        product_id = product['id']
+        attr_line_ids = product.get('attribute_line_ids', [])
+
+        if not attr_line_ids:
+            # No variants - use template's default variant (already fetched)
+            default_variant = product.get('product_variant_id')
+            if default_variant:
+                variant_id = default_variant[0] if isinstance(default_variant, (list, tuple)) else default_variant
+                result[product_id] = variant_id
+            else:
+                # Fallback to first candidate
+                candidates = candidates_by_template.get(product_id, [])
+                if candidates:
                     result[product_id] = candidates[0]['id']
+            continue
+
+        # Compute default selections as PAV IDs (first value of each attribute, skip ear impression)
+        # Using IDs instead of names for robust matching across locales
+        default_pav_ids = []
+        for line_id in attr_line_ids:
+            line = attr_lines_by_id.get(line_id, {})
+            attr_ref = line.get('attribute_id', [0, ''])
+            attr_id = attr_ref[0] if isinstance(attr_ref, (list, tuple)) else attr_ref
+            value_ids = line.get('value_ids', [])
+
+            # Skip ear impression attributes
+            if attr_id in ear_impression_attr_ids:
                 continue
 
-            # Find matching variant
-            needed = set(needed_ptavs)
-            matched = False
-            for c in candidates:
-                if needed.issubset(c.get('ptavs', set())):
-                    result[product_id] = c['id']
-                    matched = True
-                    break
+            # Get first value (as PAV ID)
+            if value_ids:
+                default_pav_ids.append(value_ids[0])
+
+        # Resolve variant locally (no RPC calls!)
+        pav_to_ptav = pav_to_ptav_by_template.get(product_id, {})
+        candidates = candidates_by_template.get(product_id, [])
+
+        if not default_pav_ids:
+            # No selections needed, use default variant or first candidate
+            default_variant = product.get('product_variant_id')
+            if default_variant:
+                variant_id = default_variant[0] if isinstance(default_variant, (list, tuple)) else default_variant
+                result[product_id] = variant_id
+            elif candidates:
+                result[product_id] = candidates[0]['id']
+            continue
+
+        # Convert PAV IDs to PTAV IDs
+        needed_ptavs = []
+        for pav_id in default_pav_ids:
+            ptav_id = pav_to_ptav.get(pav_id)
+            if ptav_id:
+                needed_ptavs.append(ptav_id)
+
+        # Guard: if we couldn't map all PAV IDs to PTAVs, fall back to default variant
+        if len(needed_ptavs) != len(default_pav_ids):
+            logger.warning(f"Product {product_id}: Could not map all PAV IDs to PTAVs "
+                         f"({len(needed_ptavs)}/{len(default_pav_ids)}), using default variant")
+            default_variant = product.get('product_variant_id')
+            if default_variant:
+                variant_id = default_variant[0] if isinstance(default_variant, (list, tuple)) else default_variant
+                result[product_id] = variant_id
+            elif candidates:
+                result[product_id] = candidates[0]['id']
+            continue
+
+        # Find matching variant
+        needed = set(needed_ptavs)
+        matched = False
+        for c in candidates:
+            if needed.issubset(c.get('ptavs', set())):
+                result[product_id] = c['id']
+                matched = True
+                break
+
+        # If no match found, fall back to default variant
+        if not matched:
+            logger.warning(f"Product {product_id}: No variant matched PTAVs {needed}, using default variant")
+            default_variant = product.get('product_variant_id')
+            if default_variant:
+                variant_id = default_variant[0] if isinstance(default_variant, (list, tuple)) else default_variant
+                result[product_id] = variant_id
+            elif candidates:
+                result[product_id] = candidates[0]['id']
+
+    payload = {'variants': result}
+    if only_ids is None:
+        DEFAULT_VARIANTS_CACHE.set(cache_key, payload)
+    return payload
+
+def get_default_variants_payload(locale):
+    """{'variants': {template id: default variant id}} for a locale, from the catalog snapshot or the cache."""
+    snapshot = current_catalog_snapshot()
+    variants = snapshot.default_variants(locale) if snapshot is not None else None
+    if variants is not None:
+        return {'variants': variants}
+    cache_key = (locale,)
+    return cached_with_refresh(
+        DEFAULT_VARIANTS_CACHE, cache_key, ('default_variants', cache_key),
+        lambda: _build_default_variants_payload(cache_key)
+    )
 
-            # If no match found, fall back to default variant
-            if not matched:
-                logger.warning(f"Product {product_id}: No variant matched PTAVs {needed}, using default variant")
-                default_variant = product.get('product_variant_id')
-                if default_variant:
-                    variant_id = default_variant[0] if isinstance(default_variant, (list, tuple)) else default_variant
-                    result[product_id] = variant_id
-                elif candidates:
-                    result[product_id] = candidates[0]['id']
 
-        payload = {'variants': result}
-        DEFAULT_VARIANTS_CACHE[cache_key] = {
-            'payload': payload,
-            'expires_at': now + DEFAULT_VARIANTS_CACHE_TTL
-        }
+@decilo_bp.route('/decilo-api/products/default-variants', methods=['GET'])
+@token_required
+def get_default_variant_ids(current_user):
+    """
+    Get default variant product IDs for all published products.
+    Used for background prefetching to enable instant image loading on click.
+
+    Query params:
+        image_size: when given, also return signed image URLs of the default variants at that size
+
+    Returns:
+        { "variants": { product_template_id: variant_product_id, ... },
+          "image_urls": { product_template_id: signed_url, ... } (with image_size) }
+    """
+    try:
+        locale = get_request_locale()
+        image_size = request.args.get('image_size')
+        payload = get_default_variants_payload(locale)
+
+        if image_size:
+            # Signed per response, not cached: URLs roll over with their expiry window
+            payload = dict(payload)
+            payload['image_urls'] = {
+                template_id: sign_image_url('variant', variant_id, image_size)
+                for template_id, variant_id in payload['variants'].items()
+            }
         return jsonify(payload)
 
     except Exception as e:
@@ -1232,6 +1912,41 @@ def get_default_variant_ids(current_user):
         return jsonify({'error': error_msg, 'code': 'unknown_error'}), 500
 
 
+def iter_image_frames(product_ids, size_field):
+    """Start reading every product's image on the fan-out pool and return a generator of frames.
+
+    Reads are submitted right away (while the request context is live); each
+    frame is yielded as soon as its image is available, so the first thumbnails
+    reach the browser before the slowest read completes.
+    """
+    futures = {
+        ODOO_FANOUT.submit(_get_cached_record_image, 'product.template', pid, size_field, ('template', pid, size_field)): pid
+        for pid in dict.fromkeys(product_ids)
+    }
+
+    def generate():
+        for future in as_completed(futures):
+            product_id = futures[future]
+            try:
+                image = future.result()
+            except Exception as e:
+                logger.warning(f"Image of product {product_id} not streamed: {e}")
+                image = None
+            if image:
+                data = read_cached_image(
+                    image,
+                    lambda: _get_cached_record_image('product.template', product_id, size_field, ('template', product_id, size_field))
+                )
+                mimetype = image.mimetype.encode('ascii')
+            else:
+                data, mimetype = b'', b''
+            yield IMAGE_FRAME_HEADER.pack(product_id, len(data), len(mimetype)) + mimetype
+            if data:
+                yield data
+
+    return generate()
+
+
 @decilo_bp.route('/decilo-api/product-images', methods=['GET'])
 @token_required
 def get_product_images_endpoint(current_user):
@@ -1240,6 +1955,8 @@ def get_product_images_endpoint(current_user):
     Query params:
       - ids: comma-separated product IDs (required)
       - size: thumb | small | medium | large | full | original (default: medium)
+      - format: json (default) | frames - stream binary frames (see IMAGE_FRAME_HEADER) in
+        completion order instead of base64 JSON; also selected by Accept: IMAGE_FRAMES_MIMETYPE
     """
     try:
         ids_param = request.args.get('ids')
@@ -1256,6 +1973,15 @@ def get_product_images_endpoint(current_user):
         if not product_ids:
             return jsonify({'error': 'ids must contain at least one product id'}), 400
 
+        wants_frames = request.args.get('format') == 'frames' or IMAGE_FRAMES_MIMETYPE in (request.headers.get('Accept') or '')
+        if wants_frames:
+            size_field = odoo_client._image_field_for_size(size)
+            return Response(
+                iter_image_frames(product_ids, size_field),
+                mimetype=IMAGE_FRAMES_MIMETYPE,
+                headers={'Cache-Control': 'private, no-store', 'X-Accel-Buffering': 'no'}
+            )
+
         images = odoo_client.get_product_images(product_ids, size=size)
         return jsonify({
             'size': size,
@@ -1302,12 +2028,8 @@ def prefetch_products(current_user):
 
         uid = get_uid()
         models = get_odoo_models()
-        now = time.time()
-
-        prefetched = []
-        errors = []
 
-        for product_id in product_ids:
+        def prefetch_one(product_id):
             try:
                 product_result = {
                     'product_id': product_id,
@@ -1343,11 +2065,10 @@ def prefetch_products(current_user):
                         if default_selections:
                             for size in image_sizes:
                                 try:
-                                    cache_key = (product_id, size, json.dumps(sorted(default_selections.items())))
+                                    cache_key = ('selection', product_id, size, json.dumps(sorted(default_selections.items())))
 
                                     # Check if already cached
-                                    cached = VARIANT_IMAGE_CACHE.get(cache_key)
-                                    if cached and cached.get('expires_at', 0) > now:
+                                    if cached_variant_image_payload(cache_key, inline=False):
                                         product_result['images'].append({'size': size, 'cached': True})
                                         continue
 
@@ -1358,39 +2079,19 @@ def prefetch_products(current_user):
 
                                     if not err and variant_product_id:
                                         size_field = odoo_client._image_field_for_size(size)
-                                        variant_image = models.execute_kw(
-                                            ODOO_DB, uid, ODOO_API_KEY,
-                                            'product.product', 'read',
-                                            [[variant_product_id]],
-                                            {'fields': [size_field]}
-                                        )
-
-                                        image_b64 = None
-                                        if variant_image and variant_image[0].get(size_field):
-                                            image_b64 = variant_image[0].get(size_field)
+                                        source = 'variant'
+                                        image_key = ('variant', variant_product_id, size_field)
+                                        image = get_cached_variant_image(variant_product_id, size_field)
 
                                         # Fallback to template image
-                                        if not image_b64:
-                                            template_images = odoo_client.get_product_images([product_id], size=size)
-                                            if template_images and template_images[0].get('image'):
-                                                image_b64 = template_images[0].get('image')
-
-                                        if image_b64:
-                                            # Cache the full payload
-                                            image_url = f"data:image/png;base64,{image_b64}"
-                                            cached_payload = {
-                                                'product_id': product_id,
-                                                'variant_product_id': variant_product_id,
-                                                'image': image_url,
-                                                'ptav_ids': ptav_ids,
-                                                'source': 'variant' if variant_image and variant_image[0].get(size_field) else 'product',
-                                                'size': size
-                                            }
-                                            VARIANT_IMAGE_CACHE[cache_key] = {
-                                                'payload': cached_payload,
-                                                'expires_at': now + VARIANT_IMAGE_CACHE_TTL,
-                                                'image': image_b64
-                                            }
+                                        if not image:
+                                            source = 'product'
+                                            image_key = ('template', product_id, size_field)
+                                            image = get_cached_template_image(product_id, size)
+
+                                        if image:
+                                            # Cache how the selection resolved (the image is cached by the getters)
+                                            remember_variant_selection(cache_key, product_id, variant_product_id, ptav_ids, source, size, image_key)
                                             product_result['images'].append({'size': size, 'cached': False, 'fetched': True})
                                         else:
                                             product_result['images'].append({'size': size, 'fetched': False, 'reason': 'no_image'})
@@ -1399,23 +2100,34 @@ def prefetch_products(current_user):
                                 except Exception as img_err:
                                     product_result['images'].append({'size': size, 'error': str(img_err)})
 
-                # 5. Pre-warm exclusions cache by calling the exclusion logic
+                # 5. Pre-warm exclusions cache
                 try:
-                    ptav_ids = models.execute_kw(
-                        ODOO_DB, uid, ODOO_API_KEY,
-                        'product.template.attribute.value', 'search',
-                        [[('product_tmpl_id', '=', product_id)]],
-                        {'order': 'id asc'}
-                    )
-                    if ptav_ids:
-                        product_result['exclusions'] = True
+                    get_variant_exclusions(product_id, get_request_locale())
+                    product_result['exclusions'] = True
                 except Exception:
                     pass
 
-                prefetched.append(product_result)
+                return product_result, None
 
             except Exception as prod_err:
-                errors.append({'product_id': product_id, 'error': str(prod_err)})
+                return None, {'product_id': product_id, 'error': str(prod_err)}
+
+        # Products are independent; warm them in parallel on the shared pool, and
+        # skip whatever is left once the request budget is spent
+        prefetched = []
+        errors = []
+        prefetch_calls = [
+            odoo_rpc.OptionalCall(
+                lambda pid=pid: prefetch_one(pid),
+                default=(None, {'product_id': pid, 'error': 'skipped: request budget exhausted'})
+            )
+            for pid in product_ids
+        ]
+        for product_result, error in fan_out(*prefetch_calls):
+            if error:
+                errors.append(error)
+            else:
+                prefetched.append(product_result)
 
         return jsonify({
             'prefetched': prefetched,
@@ -1436,17 +2148,12 @@ def get_product_image(current_user, product_id):
     """Fetch a single product image at the requested size"""
     try:
         size = request.args.get('size', 'medium')
-        images = odoo_client.get_product_images([product_id], size=size)
-        image_data = images[0]['image'] if images else None
+        response = send_record_image('template', product_id, odoo_client._image_field_for_size(size))
 
-        if not image_data:
+        if response is None:
             return jsonify({'error': 'Image not found', 'code': 'not_found'}), 404
 
-        binary = base64.b64decode(image_data)
-        image_type = imghdr.what(None, h=binary) or 'png'
-        mimetype = f'image/{image_type}'
-
-        return Response(binary, mimetype=mimetype)
+        return response
 
     except Exception as e:
         error_msg = f"Error fetching image for product {product_id}: {str(e)}"
@@ -1459,41 +2166,65 @@ def get_product_image(current_user, product_id):
 def get_variant_image_by_id(current_user, variant_product_id):
     """
     Fetch image for a specific variant product by its ID.
-    This is the fast path - no variant resolution needed, just one RPC.
+    This is the fast path - no variant resolution needed, at most one RPC (cached).
 
     Query params:
         size: thumb | small | medium | large | full (default: medium)
+        w: displayed width in CSS px (optional, times DPR; otherwise the Width hint or the size)
+        dpr: device pixel ratio when the DPR hint is not sent (optional)
 
-    Returns: Binary image data with appropriate MIME type
+    Returns: Binary image data, as WebP/AVIF when the Accept header allows
     """
     try:
         size = request.args.get('size', 'medium')
-        uid = get_uid()
-        models = get_odoo_models()
 
-        # Map size to Odoo field
+        # Map size to Odoo field; the served width/format is negotiated from Accept and client hints
         size_field = odoo_client._image_field_for_size(size)
+        record_popularity(variant_product_id=variant_product_id, size_field=size_field)
+        response = send_record_image('variant', variant_product_id, size_field)
 
-        # Single RPC to get the image
-        variant_data = models.execute_kw(
-            ODOO_DB, uid, ODOO_API_KEY,
-            'product.product', 'read',
-            [[variant_product_id]],
-            {'fields': [size_field]}
+        if response is None:
+            return jsonify({'error': 'Image not found', 'code': 'not_found'}), 404
+
+        return response
+
+    except Exception as e:
+        error_msg = f"Error fetching variant image {variant_product_id}: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        return jsonify({'error': error_msg, 'code': 'unknown_error'}), 500
+
+
+@decilo_bp.route('/decilo-api/img/<kind>/<int:record_id>/<size_field>', methods=['GET'])
+def get_signed_image(kind, record_id, size_field):
+    """
+    Serve an image through a URL from sign_image_url (no Authorization header, no JWT decoding).
+    Versioned URLs change with the image, so their response is cached as immutable while it
+    matches; unversioned ones are revalidated (ETag) by caches on every use.
+
+    Query params:
+        exp: expiry (unix time), sig: HMAC of kind, id, size field, expiry and version
+        v: optional image version (see image_version)
+        w, dpr: optional rendition width, as for /decilo-api/variant-image/<id>
+    """
+    try:
+        version = request.args.get('v')
+        remaining = verify_image_url(
+            kind, record_id, size_field, request.args.get('exp', type=int), request.args.get('sig'), version
         )
+        if remaining is None:
+            return jsonify({'error': 'Invalid or expired image URL', 'code': 'forbidden'}), 403
+        if kind == 'variant':
+            record_popularity(variant_product_id=record_id, size_field=size_field)
 
-        if not variant_data or not variant_data[0].get(size_field):
-            return jsonify({'error': 'Image not found', 'code': 'not_found'}), 404
+        response = send_record_image(kind, record_id, size_field, public_max_age=remaining, version=version)
 
-        image_b64 = variant_data[0][size_field]
-        binary = base64.b64decode(image_b64)
-        image_type = imghdr.what(None, h=binary) or 'png'
-        mimetype = f'image/{image_type}'
+        if response is None:
+            return jsonify({'error': 'Image not found', 'code': 'not_found'}), 404
 
-        return Response(binary, mimetype=mimetype)
+        return response
 
     except Exception as e:
-        error_msg = f"Error fetching variant image {variant_product_id}: {str(e)}"
+        error_msg = f"Error fetching signed {kind} image {record_id}: {str(e)}"
         logger.error(error_msg, exc_info=True)
         return jsonify({'error': error_msg, 'code': 'unknown_error'}), 500
 
@@ -1512,9 +2243,14 @@ def get_product(current_user, product_id):
     try:
         include_image_param = request.args.get('include_image', 'false').lower()
         include_image = include_image_param in ['true', '1', 'yes']
+        record_popularity(product_id=product_id)
 
-        # read_product already fetches variants internally - no need for separate call
-        product = odoo_client.read_product(product_id, include_image=include_image)
+        # read_product already fetches variants internally - no need for separate call.
+        # Identical concurrent requests share one upstream read.
+        product = SINGLE_FLIGHT.do(
+            request_flight_key(),
+            lambda: odoo_client.read_product(product_id, include_image=include_image)
+        )
 
         if not product:
             return jsonify({'error': 'Product not found', 'code': 'not_found'}), 404
@@ -1528,6 +2264,7 @@ def get_product(current_user, product_id):
         return jsonify({'error': error_msg, 'code': 'unknown_error'}), 500
 
 @decilo_bp.route('/decilo-api/customer-password-reset', methods=['POST'])
+@no_request_budget
 def customer_password_reset():
     logger.info("Received request for /decilo-api/customer-password-reset")
     try:
@@ -1631,6 +2368,7 @@ def get_patient_contacts(current_user):
 
 
 @decilo_bp.route('/decilo-api/patient-contacts', methods=['POST'])
+@no_request_budget
 @token_required
 def create_patient_contact(current_user):
     """Create a new patient contact for the logged-in user"""
@@ -1767,17 +2505,21 @@ def get_customer_orders(current_user):
         )
 
         # Fetch related manufacturing orders (mrp.production) by origin = sale order name
-        origin_to_mo_data = {}
         order_names = [o.get('name') for o in orders if o.get('name')]
-        if order_names:
-            mo_ids = models.execute_kw(
+
+        def fetch_manufacturing_orders():
+            origin_to_mo_data = {}
+            if not order_names:
+                return origin_to_mo_data
+            mo_models = get_odoo_models()
+            mo_ids = mo_models.execute_kw(
                 ODOO_DB, uid, ODOO_API_KEY,
                 'mrp.production', 'search',
                 [[('origin', 'in', order_names)]],
                 {'order': 'id desc'}
             )
             if mo_ids:
-                mo_records = models.execute_kw(
+                mo_records = mo_models.execute_kw(
                     ODOO_DB, uid, ODOO_API_KEY,
                     'mrp.production', 'read',
                     [mo_ids],
@@ -1790,6 +2532,7 @@ def get_customer_orders(current_user):
                     name = rec.get('name')
                     if origin and origin not in origin_to_mo_data:
                         origin_to_mo_data[origin] = {'state': state, 'name': name}
+            return origin_to_mo_data
 
         # Collect all line ids and shipping partner ids for batch reads
         all_line_ids = []
@@ -1805,41 +2548,31 @@ def get_customer_orders(current_user):
                 if patient_id:
                     patient_ids.append(patient_id)
 
-        # Read lines
-        lines_by_id = {}
+        # Queue line, shipping partner and patient reads (the two res.partner reads
+        # go out as a single call) and run them alongside the MO lookup
+        batcher = get_read_batcher()
+        line_read = partner_read = patient_read = None
         if all_line_ids:
             line_fields = ['product_id', 'name', 'product_uom_qty', 'price_unit', 'price_subtotal']
-            line_records = models.execute_kw(
-                ODOO_DB, uid, ODOO_API_KEY,
-                'sale.order.line', 'read',
-                [list(set(all_line_ids))],
-                {'fields': line_fields}
-            )
-            lines_by_id = {rec['id']: rec for rec in line_records}
-
-        # Read shipping partners
-        partners_by_id = {}
+            line_read = batcher.defer_read('sale.order.line', set(all_line_ids), line_fields)
         if shipping_partner_ids:
             partner_fields = ['name', 'street', 'city', 'zip', 'country_id']
-            partner_records = models.execute_kw(
-                ODOO_DB, uid, ODOO_API_KEY,
-                'res.partner', 'read',
-                [list(set(shipping_partner_ids))],
-                {'fields': partner_fields}
-            )
-            partners_by_id = {rec['id']: rec for rec in partner_records}
-
-        # Read patients with custom ID field
-        patients_by_id = {}
+            partner_read = batcher.defer_read('res.partner', set(shipping_partner_ids), partner_fields)
         if patient_ids:
             patient_fields = ['name', 'x_studio_id_custom']
-            patient_records = models.execute_kw(
-                ODOO_DB, uid, ODOO_API_KEY,
-                'res.partner', 'read',
-                [list(set(patient_ids))],
-                {'fields': patient_fields}
-            )
-            patients_by_id = {rec['id']: rec for rec in patient_records}
+            patient_read = batcher.defer_read('res.partner', set(patient_ids), patient_fields)
+
+        def resolve(deferred):
+            return (lambda: {rec['id']: rec for rec in deferred.result()}) if deferred else dict
+
+        # Manufacturing state is optional: under an Odoo brownout the orders are
+        # returned without it and the response is flagged partial
+        origin_to_mo_data, lines_by_id, partners_by_id, patients_by_id = fan_out(
+            odoo_rpc.OptionalCall(fetch_manufacturing_orders, default={}),
+            resolve(line_read),
+            resolve(partner_read),
+            resolve(patient_read)
+        )
 
         def map_state_to_status(state: str) -> str:
             if state in ['done']:
@@ -1927,7 +2660,12 @@ def get_customer_orders(current_user):
         # Ensure date descending in case of later filtering
         response_orders.sort(key=lambda x: x.get('date') or '', reverse=True)
 
-        return jsonify({'orders': response_orders, 'total': len(response_orders), 'offset': offset})
+        return jsonify({
+            'orders': response_orders,
+            'total': len(response_orders),
+            'offset': offset,
+            'partial': request_is_partial()
+        })
 
     except Exception as e:
         error_msg = f"Error fetching customer orders: {str(e)}"
@@ -1942,15 +2680,25 @@ def get_order_details(current_user, order_id):
     logger.info(f"Received request for /decilo-api/orders/{order_id}")
     try:
         uid = get_uid()
-        models = get_odoo_models()
+        batcher = get_read_batcher()
 
-        # Read the order and verify it belongs to the current partner
+        # Read the order and its lines in parallel; lines are looked up by order id
+        # so they don't wait on the order read, and are only used once ownership is
+        # verified below
         order_fields = ['name', 'date_order', 'state', 'partner_id', 'x_studio_patient', 'order_line', 'amount_total', 'amount_tax', 'amount_untaxed', 'x_studio_notes']
-        orders = models.execute_kw(
-            ODOO_DB, uid, ODOO_API_KEY,
-            'sale.order', 'read',
-            [order_id],
-            {'fields': order_fields}
+        line_fields = ['product_id', 'name', 'product_uom_qty', 'price_unit', 'price_subtotal']
+
+        def fetch_lines():
+            return get_odoo_models().execute_kw(
+                ODOO_DB, uid, ODOO_API_KEY,
+                'sale.order.line', 'search_read',
+                [[('order_id', '=', order_id)]],
+                {'fields': line_fields}
+            )
+
+        orders, line_records = fan_out(
+            lambda: batcher.read('sale.order', order_id, order_fields),
+            fetch_lines
         )
 
         if not orders:
@@ -1962,46 +2710,24 @@ def get_order_details(current_user, order_id):
         if not order.get('partner_id') or order['partner_id'][0] != current_user['id']:
             return jsonify({'error': 'Forbidden', 'code': 'forbidden'}), 403
 
-        # Read order lines
-        line_fields = ['product_id', 'name', 'product_uom_qty', 'price_unit', 'price_subtotal']
+        # Keep lines in the order's own line order
         line_ids = order.get('order_line', [])
-        lines = []
-        products_product_ids = []
-        if line_ids:
-            line_records = models.execute_kw(
-                ODOO_DB, uid, ODOO_API_KEY,
-                'sale.order.line', 'read',
-                [line_ids],
-                {'fields': line_fields}
-            )
-            lines = line_records
-            # Collect product.product ids
-            for lr in line_records:
-                if lr.get('product_id'):
-                    products_product_ids.append(lr['product_id'][0])
+        lines_by_id = {lr['id']: lr for lr in line_records or []}
+        lines = [lines_by_id[lid] for lid in line_ids if lid in lines_by_id]
+        products_product_ids = [lr['product_id'][0] for lr in lines if lr.get('product_id')]
 
         # Map product.product -> template and details
         product_id_to_details = {}
         if products_product_ids:
             # Read product.product to get template ids and display name
             product_product_fields = ['display_name', 'default_code', 'product_tmpl_id']
-            product_products = models.execute_kw(
-                ODOO_DB, uid, ODOO_API_KEY,
-                'product.product', 'read',
-                [list(set(products_product_ids))],
-                {'fields': product_product_fields}
-            )
+            product_products = batcher.read('product.product', set(products_product_ids), product_product_fields)
             tmpl_ids = [pp['product_tmpl_id'][0] for pp in product_products if pp.get('product_tmpl_id')]
 
             tmpl_id_to_data = {}
             if tmpl_ids:
                 tmpl_fields = ['image_1920', 'description_ecommerce', 'name']
-                tmpls = models.execute_kw(
-                    ODOO_DB, uid, ODOO_API_KEY,
-                    'product.template', 'read',
-                    [list(set(tmpl_ids))],
-                    {'fields': tmpl_fields}
-                )
+                tmpls = batcher.read('product.template', set(tmpl_ids), tmpl_fields)
                 tmpl_id_to_data = {t['id']: t for t in tmpls}
 
             for pp in product_products:
@@ -2104,11 +2830,12 @@ def get_patient_ear_impressions(current_user):
         except Exception:
             pass
 
+        # bin_size returns file sizes instead of the impression payloads; we only need presence
         recs = models.execute_kw(
             ODOO_DB, uid, ODOO_API_KEY,
             'res.partner', 'read',
             [patient_id],
-            {'fields': fields}
+            {'fields': fields, 'context': {'bin_size': True}}
         )
         if not recs:
             return jsonify({'error': 'Patient not found'}), 404
@@ -2141,12 +2868,13 @@ def download_patient_ear_impression(current_user):
             return jsonify({'error': 'patient_id and side (left|right) are required'}), 400
 
         uid = get_uid()
-        models = get_odoo_models()
 
         # Security: ensure the patient belongs to current user if needed? Skipping strict check; relying on portal visibility.
         # Read fields including optional filename
         bin_field = f"x_studio_{side}_ear_impression"
         name_field = f"x_studio_{side}_ear_impression_filename"
+        # Decode the impression while parsing, spilling large files to disk
+        models = get_odoo_models(binary_fields=[bin_field], spool_max_size=odoo_rpc.ODOO_BINARY_SPOOL_MAX_SIZE)
         fields = ['name', bin_field]
         try:
             available = models.execute_kw(
@@ -2169,22 +2897,18 @@ def download_patient_ear_impression(current_user):
             return jsonify({'error': 'Patient not found'}), 404
 
         rec = recs[0]
-        b64data = rec.get(bin_field)
-        if not b64data:
+        file_obj = rec.get(bin_field)
+        if not file_obj:
             return jsonify({'error': 'File not found'}), 404
 
-        try:
-            file_bytes = base64.b64decode(b64data)
-        except Exception:
-            return jsonify({'error': 'Invalid file data'}), 500
-
         filename = rec.get(name_field) or f"{side}_ear_impression.bin"
 
-        headers = {
-            'Content-Type': 'application/octet-stream',
-            'Content-Disposition': f'attachment; filename="{filename}"'
-        }
-        return Response(file_bytes, headers=headers)
+        return send_file(
+            file_obj,
+            mimetype='application/octet-stream',
+            as_attachment=True,
+            download_name=filename
+        )
     except Exception as e:
         error_msg = f"Error downloading ear impression: {str(e)}"
         logger.error(error_msg, exc_info=True)
@@ -2233,11 +2957,12 @@ def get_order_ear_impressions(current_user, order_id: int):
         except Exception:
             pass
 
+        # bin_size returns file sizes instead of the impression payloads; we only need presence
         recs = models.execute_kw(
             ODOO_DB, uid, ODOO_API_KEY,
             'res.partner', 'read',
             [patient_id],
-            {'fields': fields}
+            {'fields': fields, 'context': {'bin_size': True}}
         )
         if not recs:
             return jsonify({'error': 'Patient not found'}), 404
@@ -2259,6 +2984,725 @@ def get_order_ear_impressions(current_user, order_id: int):
         return jsonify({'error': error_msg, 'code': 'unknown_error'}), 500
 
 
+def get_variant_exclusions(product_id, locale, refresh=False):
+    """Forbidden combinations of a template (names in the given locale), cached per (template, locale)."""
+    cache_key = (product_id, locale)
+    snapshot = None if refresh else current_catalog_snapshot()
+    if snapshot is not None:
+        exclusions = snapshot.template_exclusions(product_id, locale)
+        if exclusions is not None:
+            return exclusions
+
+    def build():
+        return _build_variant_exclusions(product_id, locale, cache_key)
+
+    if refresh:
+        return SINGLE_FLIGHT.do(('exclusions', cache_key), build)
+    return cached_with_refresh(EXCLUSIONS_CACHE, cache_key, ('exclusions', cache_key), build)
+
+def _build_variant_exclusions(product_id, locale, cache_key):
+    uid = get_uid()
+    models = get_thread_safe_models(locale)
+
+    # Find all product.template.attribute.value (PTAV) for this template to get exclusion record ids
+    ptav_ids = models.execute_kw(
+        ODOO_DB, uid, ODOO_API_KEY,
+        'product.template.attribute.value', 'search',
+        [[('product_tmpl_id', '=', product_id)]],
+        {'order': 'id asc'}
+    )
+
+    if not ptav_ids:
+        EXCLUSIONS_CACHE.set(cache_key, [])
+        return []
+
+    # Reads go through one batcher, so the PTAV and PAV re-reads below are
+    # mostly served from memory
+    batcher = odoo_rpc.ReadBatcher(models, ODOO_DB, uid, ODOO_API_KEY)
+    ptavs = batcher.read('product.template.attribute.value', ptav_ids, ['exclude_for', 'product_attribute_value_id'])
+    exclusion_ids = set()
+    ptav_base_pav_ids = []
+    for r in ptavs:
+        for eid in (r.get('exclude_for') or []):
+            exclusion_ids.add(eid)
+        pav = r.get('product_attribute_value_id')
+        pav_id = pav[0] if isinstance(pav, (list, tuple)) else pav
+        if pav_id:
+            ptav_base_pav_ids.append(pav_id)
+    if not exclusion_ids:
+        EXCLUSIONS_CACHE.set(cache_key, [])
+        return []
+
+    # Read exclusion records (value_ids involved per exclusion) and the names of
+    # every base PAV of this template in parallel; excluded values are PTAVs of
+    # the same template, so their names are normally covered by the second read
+    def fetch_base_pavs():
+        if not ptav_base_pav_ids:
+            return []
+        return batcher.read('product.attribute.value', set(ptav_base_pav_ids), ['name'])
+
+    exclusions_raw, base_pavs = fan_out(
+        lambda: batcher.read('product.template.attribute.exclusion', exclusion_ids, ['product_tmpl_id', 'value_ids']),
+        fetch_base_pavs
+    )
+    # Resolve names for base PAVs (declaring PTAVs' own PAV)
+    base_pav_meta = {v['id']: v.get('name') for v in base_pavs}
+
+    # Keep only exclusions for this product template to avoid cross-template mixups
+    ex_by_id = {}
+    for ex in exclusions_raw or []:
+        tmpl = ex.get('product_tmpl_id')
+        tmpl_id = tmpl[0] if isinstance(tmpl, (list, tuple)) else tmpl
+        if tmpl_id == product_id:
+            ex_by_id[ex.get('id')] = ex
+    # Collect all ids inside exclusion value_ids to resolve to names
+    all_value_ids = set()
+    for ex in ex_by_id.values():
+        vids = ex.get('value_ids') or []
+        for vid in vids:
+            all_value_ids.add(vid if isinstance(vid, int) else (vid[0] if isinstance(vid, (list, tuple)) else None))
+    all_value_ids = {vid for vid in all_value_ids if vid}
+
+    # Build mapping prefering PTAV->PAV name resolution to avoid cross-model id collisions
+    pav_name_by_id = {}
+    ptav_to_pav = {}
+    if all_value_ids:
+        # First attempt: treat all ids as PTAV ids
+        ptav_read = batcher.read('product.template.attribute.value', all_value_ids, ['product_attribute_value_id'])
+        pav_ids_from_ptav = []
+        for r in ptav_read:
+            pav = r.get('product_attribute_value_id')
+            pav_id = pav[0] if isinstance(pav, (list, tuple)) else pav
+            if pav_id:
+                ptav_to_pav[r['id']] = pav_id
+                pav_ids_from_ptav.append(pav_id)
+        # Read names for PAV ids gathered via PTAV
+        pav_reads = []
+        if pav_ids_from_ptav:
+            pav_reads.append(batcher.defer_read('product.attribute.value', set(pav_ids_from_ptav), ['name']))
+
+        # Fallback: any ids not present as PTAV keys might actually be direct PAV ids
+        unresolved_ids = [vid for vid in all_value_ids if vid not in ptav_to_pav]
+        if unresolved_ids:
+            pav_reads.append(batcher.defer_read('product.attribute.value', unresolved_ids, ['name']))
+
+        for pav_read in pav_reads:
+            for v in pav_read.result():
+                pav_name_by_id[v['id']] = v.get('name')
+
+    # Build grouped exclusions: value (base) -> excluded value names
+    result_exclusions = []
+    # Create helper: given id that may be PAV or PTAV, resolve name
+    def resolve_value_name(unknown_id):
+        # If it's a PTAV id, map to PAV and resolve name
+        pav = ptav_to_pav.get(unknown_id)
+        if pav:
+            return pav_name_by_id.get(pav)
+        # Else, treat as direct PAV id
+        return pav_name_by_id.get(unknown_id)
+
+    # For each PTAV that declares exclusions, map to its base PAV name
+    for r in ptavs:
+        ex_ids = r.get('exclude_for') or []
+        if not ex_ids:
+            continue
+        pav = r.get('product_attribute_value_id')
+        pav_id = pav[0] if isinstance(pav, (list, tuple)) else pav
+        base_name = base_pav_meta.get(pav_id)
+        if not base_name:
+            continue
+        excluded_names = []
+        for ex_id in ex_ids:
+            # find corresponding exclusion record
+            ex_rec = ex_by_id.get(ex_id)
+            if not ex_rec:
+                continue
+            for vid in (ex_rec.get('value_ids') or []):
+                norm_vid = vid if isinstance(vid, int) else (vid[0] if isinstance(vid, (list, tuple)) else None)
+                name = resolve_value_name(norm_vid) if norm_vid else None
+                if name:
+                    excluded_names.append(name)
+        # unique and keep order
+        seen = set()
+        dedup = []
+        for n in excluded_names:
+            if n not in seen:
+                seen.add(n)
+                dedup.append(n)
+        result_exclusions.append({'value': base_name, 'excluded_values': dedup})
+    EXCLUSIONS_CACHE.set(cache_key, result_exclusions)
+    return result_exclusions
+
+
+# Monotonic time each warmed entry was last refreshed (per process)
+_WARMED_AT = {}
+
+def _warm_due(key, ttl):
+    warmed_at = _WARMED_AT.get(key)
+    return warmed_at is None or time.monotonic() - warmed_at >= ttl * WARM_REFRESH_AFTER
+
+def _warm(key, ttl, refresh):
+    """Run refresh() if the entry is due; failures are logged and retried next round."""
+    if not _warm_due(key, ttl):
+        return
+    try:
+        refresh()
+        _WARMED_AT[key] = time.monotonic()
+    except Exception as e:
+        logger.warning(f"[warmer] could not refresh {key}: {e}")
+
+def warm_popular_catalog():
+    """Refresh the caches of the most requested templates and variant images ahead of their TTL.
+
+    Per hot template (and the locale it was requested in): the variant resolution
+    metadata, the exclusions and the default variant's images; plus the images of
+    the hottest variants at the sizes they were requested in.
+    """
+    templates_by_locale = {}
+    for (locale, product_id), _ in TEMPLATE_POPULARITY.top(WARM_TOP_TEMPLATES):
+        templates_by_locale.setdefault(locale, []).append(product_id)
+    for locale, product_ids in templates_by_locale.items():
+        # Fresh context: the locale applies to this warm-up only, and no request deadline is inherited
+        contextvars.Context().run(_warm_templates, locale, product_ids)
+
+    for (variant_product_id, size_field), _ in VARIANT_POPULARITY.top(WARM_TOP_VARIANTS):
+        _warm(
+            ('variant_image', variant_product_id, size_field), VARIANT_IMAGE_CACHE_TTL,
+            lambda: get_cached_variant_image(variant_product_id, size_field, refresh=True)
+        )
+    # Forget entries that dropped out of the top long ago (they would be due again anyway)
+    cutoff = time.monotonic() - 2 * max(VARIANT_TEMPLATE_CACHE_TTL, VARIANT_IMAGE_CACHE_TTL, EXCLUSIONS_CACHE_TTL)
+    for key, warmed_at in list(_WARMED_AT.items()):
+        if warmed_at < cutoff:
+            del _WARMED_AT[key]
+
+def _warm_templates(locale, product_ids):
+    REQUEST_LOCALE.set(locale)
+    uid = get_uid()
+    models = get_thread_safe_models(locale)
+
+    snapshot = current_catalog_snapshot()
+    default_variants = snapshot.default_variants(locale) if snapshot is not None else None
+    if default_variants is None:
+        defaults_key = (locale,)
+        _warm(
+            ('default_variants', locale), DEFAULT_VARIANTS_CACHE_TTL,
+            lambda: SINGLE_FLIGHT.do(('default_variants', defaults_key), lambda: _build_default_variants_payload(defaults_key))
+        )
+        default_variants = (DEFAULT_VARIANTS_CACHE.lookup(defaults_key)[0] or {}).get('variants', {})
+
+    for product_id in product_ids:
+        # Variant maps and exclusions of snapshot templates are refreshed with the snapshot
+        if snapshot is None or product_id not in snapshot:
+            variant_cache_key = (product_id, locale)
+            _warm(
+                ('variant_template', product_id, locale), VARIANT_TEMPLATE_CACHE_TTL,
+                lambda: SINGLE_FLIGHT.do(
+                    ('variant_template', variant_cache_key),
+                    lambda: _build_template_variant_cache(models, uid, product_id, variant_cache_key)
+                )
+            )
+            _warm(
+                ('exclusions', product_id, locale), EXCLUSIONS_CACHE_TTL,
+                lambda: get_variant_exclusions(product_id, locale, refresh=True)
+            )
+        variant_product_id = default_variants.get(product_id)
+        for size in WARM_IMAGE_SIZES:
+            size_field = odoo_client._image_field_for_size(size)
+            if variant_product_id:
+                _warm(
+                    ('variant_image', variant_product_id, size_field), VARIANT_IMAGE_CACHE_TTL,
+                    lambda: get_cached_variant_image(variant_product_id, size_field, refresh=True)
+                    or get_cached_template_image(product_id, size, refresh=True)
+                )
+    logger.info(f"[warmer] refreshed {len(product_ids)} popular products for locale {locale}")
+
+
+def current_catalog_snapshot():
+    """The catalog snapshot to serve variant maps, exclusions and default variants from, or None."""
+    if not CATALOG_SNAPSHOT_ENABLED:
+        return None
+    return CATALOG_SNAPSHOT.current()
+
+def build_catalog_snapshot(locales=None, product_ids=None):
+    """Read the published catalog structure from Odoo (a few bulk calls per locale) into a CatalogSnapshot.
+
+    With product_ids, only those templates are read (a patch for CatalogSnapshot.patched()).
+    """
+    locales = locales or BOOT_WARMUP_LOCALES
+    uid = get_uid()
+    models = get_thread_safe_models(locales[0])
+    # Changes made while this build reads are picked up by the next sync
+    sync_watermark = format_odoo_datetime(datetime.now(timezone.utc) - timedelta(seconds=CATALOG_SYNC_OVERLAP))
+
+    domain = [('sale_ok', '=', True), ('x_studio_is_published_b2audio', '=', True)]
+    if product_ids is not None:
+        domain.append(('id', 'in', list(product_ids)))
+    templates = models.execute_kw(
+        ODOO_DB, uid, ODOO_API_KEY,
+        'product.template', 'search_read',
+        [domain],
+        {'fields': ['id']}
+    )
+    template_ids = [t['id'] for t in templates]
+
+    def read_all(model, fields):
+        if not template_ids:
+            return []
+        return models.execute_kw(
+            ODOO_DB, uid, ODOO_API_KEY,
+            model, 'search_read',
+            [[('product_tmpl_id', 'in', template_ids)]],
+            {'fields': fields}
+        )
+
+    ptavs, variants, exclusions = fan_out(
+        lambda: read_all('product.template.attribute.value', ['product_tmpl_id', 'product_attribute_value_id', 'exclude_for']),
+        lambda: read_all('product.product', ['product_tmpl_id', 'product_template_attribute_value_ids']),
+        lambda: read_all('product.template.attribute.exclusion', ['product_tmpl_id', 'value_ids'])
+    )
+
+    pav_ids = catalog_snapshot.named_value_ids(ptavs, exclusions)
+    names = {}
+    default_variants = {}
+    for locale in locales:
+        names[locale], default_variants[locale] = contextvars.Context().run(
+            _read_snapshot_locale, locale, uid, pav_ids, template_ids if product_ids is not None else None
+        )
+    snapshot = catalog_snapshot.build_snapshot(locales, templates, ptavs, variants, exclusions, names, default_variants)
+    snapshot.sync_watermark = sync_watermark
+    return snapshot
+
+def _read_snapshot_locale(locale, uid, pav_ids, product_ids):
+    REQUEST_LOCALE.set(locale)
+    models = get_thread_safe_models(locale)
+    pavs = models.execute_kw(
+        ODOO_DB, uid, ODOO_API_KEY,
+        'product.attribute.value', 'read',
+        [pav_ids],
+        {'fields': ['name', 'attribute_id']}
+    ) if pav_ids else []
+    attr_ids = {pav['attribute_id'][0] for pav in pavs if pav.get('attribute_id')}
+    attrs = models.execute_kw(
+        ODOO_DB, uid, ODOO_API_KEY,
+        'product.attribute', 'read',
+        [list(attr_ids)],
+        {'fields': ['name']}
+    ) if attr_ids else []
+    attr_name_by_id = {attr['id']: attr.get('name') for attr in attrs}
+    pav_names = {pav['id']: pav.get('name') or '' for pav in pavs}
+    attribute_names = {
+        pav['id']: attr_name_by_id.get(pav['attribute_id'][0]) if pav.get('attribute_id') else ''
+        for pav in pavs
+    }
+    defaults_key = (locale,)
+    if product_ids is not None:
+        payload = _build_default_variants_payload(defaults_key, product_ids) if product_ids else {}
+    else:
+        payload = SINGLE_FLIGHT.do(('default_variants', defaults_key), lambda: _build_default_variants_payload(defaults_key))
+    return (pav_names, attribute_names), payload.get('variants', {})
+
+def refresh_catalog_snapshot():
+    """Rebuild the catalog snapshot and publish it to the other workers as the next generation."""
+    CATALOG_SNAPSHOT.publish(contextvars.Context().run(build_catalog_snapshot))
+
+def ensure_catalog_snapshot(timeout=None):
+    """Load the host's catalog snapshot, building it first if there is none yet (or it is too old).
+
+    With timeout, the build's Odoo calls get that many seconds in total.
+    """
+    if not CATALOG_SNAPSHOT_ENABLED:
+        return None
+
+    def build():
+        if timeout is not None:
+            odoo_rpc.set_deadline(timeout)
+        return build_catalog_snapshot()
+
+    try:
+        return CATALOG_SNAPSHOT.load_or_build(lambda: contextvars.Context().run(build))
+    except Exception as e:
+        logger.warning(f"[snapshot] catalog snapshot unavailable, using per-template caches: {e}", exc_info=True)
+        return None
+
+def start_catalog_snapshot_refresh():
+    """Start the periodic snapshot rebuild and sync in this worker (one worker per host runs each per interval)."""
+    if CATALOG_SNAPSHOT_ENABLED:
+        CATALOG_SNAPSHOT_REFRESHER.ensure_started()
+        if CATALOG_SYNC_ENABLED:
+            CATALOG_SYNC.ensure_started()
+
+def sync_catalog():
+    """Patch the catalog snapshot with the records Odoo changed since its watermark."""
+    snapshot = current_catalog_snapshot()
+    if snapshot is None or not snapshot.sync_watermark:
+        return
+    since = parse_odoo_datetime(snapshot.sync_watermark) - timedelta(seconds=CATALOG_SYNC_OVERLAP)
+    changed = contextvars.Context().run(_read_catalog_changes, format_odoo_datetime(since))
+    if not any(key not in snapshot.sync_seen for key in changed):
+        return
+    CATALOG_SNAPSHOT.patch(lambda current: _patch_catalog_snapshot(current, changed))
+
+def _read_catalog_changes(since):
+    """{(model, id, write_date): template id} of the records of the synced models written since a time."""
+    uid = get_uid()
+    models = get_thread_safe_models(BOOT_WARMUP_LOCALES[0])
+
+    def read_changes(model, fields):
+        return models.execute_kw(
+            ODOO_DB, uid, ODOO_API_KEY,
+            model, 'search_read',
+            [[('write_date', '>=', since)]],
+            # Archived records too: archiving must drop them from the snapshot
+            {'fields': fields, 'context': {'active_test': False}}
+        )
+
+    models_and_fields = list(CATALOG_SYNC_MODELS.items())
+    results = fan_out(*[
+        lambda model=model, fields=fields: read_changes(model, fields)
+        for model, fields in models_and_fields
+    ])
+    changed = {}
+    for (model, _), records in zip(models_and_fields, results):
+        for record in records:
+            if model == 'product.template':
+                template_id = record['id']
+            else:
+                template_id = catalog_snapshot.ref_id(record.get('product_tmpl_id'))
+            changed[(model, record['id'], record['write_date'])] = template_id
+    return changed
+
+def _patch_catalog_snapshot(current, changed):
+    """(patched snapshot, (template ids, variant ids)) for the changes current has not applied yet."""
+    fresh = {key: template_id for key, template_id in changed.items() if key not in current.sync_seen}
+    if not fresh:
+        return None
+    template_ids = {template_id for template_id in fresh.values() if template_id}
+    variant_ids = {record_id for model, record_id, _ in fresh if model == 'product.product'}
+    write_dates = {(model, record_id): write_date for model, record_id, write_date in fresh}
+    snapshot, changed_ids = _patch_catalog_templates(current, template_ids, variant_ids, write_dates)
+
+    # Advance the watermark; remember what was applied within the overlap so it is not applied twice
+    snapshot.sync_watermark = max([current.sync_watermark] + [write_date for _, _, write_date in changed])
+    cutoff = format_odoo_datetime(parse_odoo_datetime(snapshot.sync_watermark) - timedelta(seconds=CATALOG_SYNC_OVERLAP))
+    snapshot.sync_seen = frozenset(key for key in current.sync_seen.union(changed) if key[2] >= cutoff)
+    logger.info(f"[sync] {len(fresh)} changed records, {len(template_ids)} templates patched up to {snapshot.sync_watermark}")
+    return snapshot, changed_ids
+
+def _patch_catalog_templates(current, template_ids, variant_ids, write_dates=None):
+    """Re-read changed templates into a new snapshot; returns (snapshot, (template ids, variant ids)).
+
+    Their images (and those of their variants) are expired in the shared image
+    index unless they match write_dates {(model, id): write_date}.
+    """
+    write_dates = write_dates or {}
+    variant_ids = set(variant_ids)
+    for product_id in template_ids:
+        variant_ids.update(current.template_variant_ids(product_id))
+
+    if len(template_ids) > CATALOG_SYNC_MAX_PATCH:
+        logger.info(f"[sync] {len(template_ids)} templates changed, rebuilding the catalog snapshot")
+        snapshot = contextvars.Context().run(build_catalog_snapshot)
+        snapshot.sync_watermark = current.sync_watermark
+        snapshot.sync_seen = current.sync_seen
+        changed_ids = None
+    else:
+        patch = contextvars.Context().run(build_catalog_snapshot, None, sorted(template_ids))
+        snapshot = current.patched(template_ids, patch)
+        for product_id in template_ids:
+            variant_ids.update(snapshot.template_variant_ids(product_id))
+        changed_ids = (tuple(sorted(template_ids)), tuple(sorted(variant_ids)))
+
+    expire_record_images(template_ids, variant_ids, write_dates)
+    return snapshot, changed_ids
+
+def expire_record_images(template_ids, variant_ids, write_dates=None):
+    """Have the images of templates and variants re-read from Odoo on next use (the host's index is shared)."""
+    if IMAGE_STORE is None:
+        return
+    write_dates = write_dates or {}
+    for product_id in template_ids:
+        IMAGE_STORE.expire('product.template', product_id, write_dates.get(('product.template', product_id)))
+    for variant_product_id in variant_ids:
+        # Variants without an image of their own show the template's, so expire them with it
+        IMAGE_STORE.expire('product.product', variant_product_id, write_dates.get(('product.product', variant_product_id)))
+
+def apply_catalog_changes(old, new):
+    """Evict what this worker cached about the templates and variants changed since its snapshot."""
+    changed = new.changes_since(old.generation)
+    if changed is None:
+        # Full rebuild (or too many generations missed): cached entries expire on their own TTLs
+        return
+    template_ids, variant_ids = changed
+    evict_catalog_entries(template_ids, variant_ids)
+    logger.info(f"[sync] generation {new.generation}: evicted {len(template_ids)} templates and {len(variant_ids)} variants")
+
+def evict_catalog_entries(template_ids, variant_ids):
+    """Drop this worker's cached variant maps, exclusions, default variants, selections and images of templates/variants."""
+    # Every locale, not only the warmed ones: requests fill the caches in any supported locale
+    for locale in sorted(set(SUPPORTED_ODOO_LOCALES).union(BOOT_WARMUP_LOCALES)):
+        DEFAULT_VARIANTS_CACHE.pop((locale,))
+        for product_id in template_ids:
+            VARIANT_TEMPLATE_CACHE.pop((product_id, locale))
+            EXCLUSIONS_CACHE.pop((product_id, locale))
+    # Variant selections of the templates resolve to variants that may have changed
+    VARIANT_IMAGE_CACHE.pop_prefixes([('selection', product_id) for product_id in template_ids])
+    for size_field in (PLACEHOLDER_SOURCE_FIELD, *sorted(SIGNED_IMAGE_FIELDS)):
+        for product_id in template_ids:
+            VARIANT_IMAGE_CACHE.pop(('template', product_id, size_field))
+        for variant_product_id in variant_ids:
+            VARIANT_IMAGE_CACHE.pop(('variant', variant_product_id, size_field))
+    for product_id in template_ids:
+        PLACEHOLDER_CACHE.pop(('placeholder', product_id))
+
+def invalidate_catalog(model, ids):
+    """Evict everything cached about Odoo records, in every worker; returns the affected (template ids, variant ids).
+
+    With the catalog snapshot, the affected templates are re-read into a new
+    generation, whose change log makes every worker evict them; without it,
+    only this worker's caches (and shared sqlite ones) are cleared.
+    """
+    template_ids, variant_ids = _records_to_catalog_ids(model, ids)
+    if not template_ids and not variant_ids:
+        return template_ids, variant_ids
+    if current_catalog_snapshot() is not None:
+        CATALOG_SNAPSHOT.patch(lambda current: _patch_catalog_templates(current, template_ids, variant_ids))
+    else:
+        expire_record_images(template_ids, variant_ids)
+        evict_catalog_entries(template_ids, variant_ids)
+    return template_ids, variant_ids
+
+def _records_to_catalog_ids(model, ids):
+    """Templates and variants affected by a change to records of a model."""
+    if model == 'product.template':
+        return set(ids), set()
+
+    uid = get_uid()
+    models = get_thread_safe_models(BOOT_WARMUP_LOCALES[0])
+
+    def read_templates(record_model, domain):
+        records = models.execute_kw(
+            ODOO_DB, uid, ODOO_API_KEY,
+            record_model, 'search_read',
+            [domain],
+            {'fields': ['product_tmpl_id'], 'context': {'active_test': False}}
+        )
+        return {catalog_snapshot.ref_id(record.get('product_tmpl_id')) for record in records} - {None, False}
+
+    ptav_model = 'product.template.attribute.value'
+    if model == 'product.product':
+        template_ids = read_templates(model, [('id', 'in', ids)])
+        snapshot = current_catalog_snapshot()
+        if snapshot is not None:
+            # Deleted variants are not found in Odoo any more; their template is in the snapshot
+            template_ids.update(snapshot.variant_template_ids(ids))
+        return template_ids, set(ids)
+    if model in (ptav_model, 'product.template.attribute.exclusion'):
+        return read_templates(model, [('id', 'in', ids)]), set()
+    if model == 'product.attribute.value':
+        return read_templates(ptav_model, [('product_attribute_value_id', 'in', ids)]), set()
+    if model == 'product.attribute':
+        return read_templates(ptav_model, [('attribute_id', 'in', ids)]), set()
+    raise ValueError(f"Unsupported model {model!r}")
+
+
+def warm_up_catalog(locales=None, stop_at=None):
+    """Load the published catalog into the caches; returns (templates warmed, whether time ran out).
+
+    Per locale: the default variants of all published templates, then for each
+    template its variant resolution map and exclusions; plus the default
+    variants' images (locale independent, fetched once). With stop_at (a
+    time.monotonic() value), no locale runs past it and the rest are skipped.
+    """
+    warmed_images = set()
+    total = 0
+    partial = False
+    for locale in locales or BOOT_WARMUP_LOCALES:
+        timeout = BOOT_WARMUP_TIMEOUT
+        if stop_at is not None:
+            timeout = min(timeout, stop_at - time.monotonic())
+            if timeout <= 0:
+                logger.warning(f"[warm-up] time is up, skipping locale {locale}")
+                partial = True
+                continue
+        # Fresh context per locale: its own locale and time budget, nothing inherited from a request
+        count, locale_partial = contextvars.Context().run(_warm_up_locale, locale, warmed_images, timeout)
+        total += count
+        partial = partial or locale_partial
+    return total, partial
+
+def _warm_up_locale(locale, warmed_images, timeout):
+    REQUEST_LOCALE.set(locale)
+    deadline = odoo_rpc.set_deadline(timeout)
+    uid = get_uid()
+    models = get_thread_safe_models(locale)
+
+    default_variants = get_default_variants_payload(locale).get('variants', {})
+
+    def warm_template(product_id, variant_product_id):
+        get_template_variant_cache(models, uid, product_id)
+        get_variant_exclusions(product_id, locale)
+        for size in BOOT_WARMUP_IMAGE_SIZES:
+            size_field = odoo_client._image_field_for_size(size)
+            if variant_product_id and (variant_product_id, size_field) not in warmed_images:
+                warmed_images.add((variant_product_id, size_field))
+                get_cached_variant_image(variant_product_id, size_field)
+        return True
+
+    results = fan_out(*[
+        odoo_rpc.OptionalCall(lambda pid=pid, vid=vid: warm_template(pid, vid), default=False)
+        for pid, vid in default_variants.items()
+    ])
+    warmed = sum(1 for result in results if result)
+    logger.info(f"[warm-up] {warmed}/{len(default_variants)} published products warmed for locale {locale}")
+    return warmed, deadline.partial
+
+def run_catalog_warm_up(max_duration=None):
+    """Restore the saved caches and run the boot warm-up now (blocking); records the outcome for /healthz/ready.
+
+    With max_duration, the snapshot build and the warm-up stop after that many seconds in total.
+    """
+    restore_cache_snapshot()
+    if not BOOT_WARMUP_ENABLED:
+        return
+    with _WARMUP_LOCK:
+        _WARMUP_STATUS.clear()
+        _WARMUP_STATUS.update(state='running', started_at=time.time(), pid=os.getpid())
+    started = time.monotonic()
+    stop_at = started + max_duration if max_duration is not None else None
+    try:
+        snapshot = ensure_catalog_snapshot(timeout=max_duration)
+        _WARMUP_STATUS['snapshot_generation'] = snapshot.generation if snapshot else None
+        products, partial = warm_up_catalog(stop_at=stop_at)
+        outcome = {'state': 'ready', 'products': products, 'partial': partial}
+    except Exception as e:
+        logger.error(f"[warm-up] catalog warm-up failed, starting cold: {e}", exc_info=True)
+        outcome = {'state': 'failed', 'error': str(e)}
+    outcome['duration'] = round(time.monotonic() - started, 3)
+    with _WARMUP_LOCK:
+        _WARMUP_STATUS.update(outcome)
+    logger.info(f"[warm-up] finished: {outcome}")
+
+def start_catalog_warm_up():
+    """Restore the saved caches and run the boot warm-up in a background thread (the worker keeps serving meanwhile)."""
+    start_catalog_snapshot_refresh()
+    start_cache_snapshot_saver()
+    with _WARMUP_LOCK:
+        if _WARMUP_STATUS.get('state') == 'running' and _WARMUP_STATUS.get('pid') == os.getpid():
+            return
+        if BOOT_WARMUP_ENABLED:
+            _WARMUP_STATUS.clear()
+            _WARMUP_STATUS.update(state='running', started_at=time.time(), pid=os.getpid())
+    threading.Thread(target=run_catalog_warm_up, name='catalog-warm-up', daemon=True).start()
+
+def save_cache_snapshot():
+    """Save this worker's catalog caches to the host's cache snapshot (merged with the other workers' entries)."""
+    if not CACHE_SNAPSHOT_ENABLED:
+        return
+    started = time.monotonic()
+    # Changes made after this are looked for when the snapshot is restored
+    metadata = {'saved_watermark': format_odoo_datetime(datetime.now(timezone.utc))}
+    try:
+        count = catalog_cache.save_snapshot(
+            CACHE_SNAPSHOT_PATH, PERSISTED_CACHES, metadata,
+            include=_persist_cache_entry, merge_metadata=_merge_cache_snapshot_metadata
+        )
+    except OSError as e:
+        logger.warning(f"[cache-snapshot] could not save {CACHE_SNAPSHOT_PATH}: {e}")
+        return
+    logger.info(f"[cache-snapshot] saved {count} entries in {time.monotonic() - started:.2f}s")
+
+def _merge_cache_snapshot_metadata(previous, ours):
+    # Entries kept from earlier saves are only valid up to their own save: keep the oldest watermark.
+    # An earlier file without one leaves the merged file without one (its entries are then dropped on restore)
+    if not previous.get('saved_watermark'):
+        return {**ours, 'saved_watermark': None}
+    return {**ours, 'saved_watermark': min(previous['saved_watermark'], ours['saved_watermark'])}
+
+def _persist_cache_entry(cache_name, key, value):
+    # Image bytes stay out of the snapshot: the disk store keeps them (StoredImage entries refer to it)
+    return not isinstance(value, catalog_cache.CachedImage)
+
+def _restored_cache_entry_usable(cache_name, key, value):
+    return not isinstance(value, image_store.StoredImage) or os.path.exists(value.path)
+
+def restore_cache_snapshot():
+    """Load the saved catalog caches, then evict what Odoo changed since they were saved."""
+    if not CACHE_SNAPSHOT_ENABLED:
+        return
+    metadata, restored = catalog_cache.load_snapshot(CACHE_SNAPSHOT_PATH, PERSISTED_CACHES, accept=_restored_cache_entry_usable)
+    if not restored:
+        return
+    logger.info(f"[cache-snapshot] restored {restored} cache entries")
+    saved_watermark = (metadata or {}).get('saved_watermark')
+    try:
+        if not saved_watermark:
+            raise ValueError('snapshot has no watermark')
+        since = parse_odoo_datetime(saved_watermark) - timedelta(seconds=CATALOG_SYNC_OVERLAP)
+        changed = contextvars.Context().run(_read_catalog_changes, format_odoo_datetime(since))
+    except Exception as e:
+        # Unvalidated entries could be arbitrarily old: start cold rather than serve them
+        logger.warning(f"[cache-snapshot] cannot validate restored entries, dropping them: {e}")
+        for cache in PERSISTED_CACHES:
+            cache.clear()
+        return
+    template_ids = {template_id for template_id in changed.values() if template_id}
+    variant_ids = {record_id for model, record_id, _ in changed if model == 'product.product'}
+    snapshot = current_catalog_snapshot()
+    if snapshot is not None:
+        for product_id in template_ids:
+            variant_ids.update(snapshot.template_variant_ids(product_id))
+    write_dates = {(model, record_id): write_date for model, record_id, write_date in changed}
+    expire_record_images(template_ids, variant_ids, write_dates)
+    evict_catalog_entries(template_ids, variant_ids)
+    logger.info(f"[cache-snapshot] {len(template_ids)} templates changed since {saved_watermark}, evicted")
+
+def start_cache_snapshot_saver():
+    """Start saving this worker's caches periodically."""
+    if CACHE_SNAPSHOT_ENABLED:
+        CACHE_SNAPSHOT_SAVER.ensure_started()
+
+def catalog_warm_up_status():
+    """Warm-up state of this process; 'ready' is False only while a warm-up is running."""
+    with _WARMUP_LOCK:
+        status = dict(_WARMUP_STATUS)
+    status['ready'] = status.get('state') != 'running'
+    return status
+
+
+@decilo_bp.route('/internal/invalidate', methods=['POST'])
+@invalidate_token_required
+def invalidate_cache():
+    """Evict cached catalog data after records changed in Odoo (called by Odoo automated actions).
+
+    Headers:
+        X-Decilo-Invalidate-Token: the DECILO_INVALIDATE_SECRET
+
+    Body (JSON):
+        { "model": "product.template", "ids": [1, 2, 3] }
+        model: product.template, product.product, product.template.attribute.value,
+        product.template.attribute.exclusion, product.attribute.value or product.attribute
+
+    Returns:
+        { "templates": [...], "variants": [...] } affected ids
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        model = data.get('model')
+        ids = data.get('ids')
+        if not isinstance(model, str) or not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return jsonify({'error': 'Expected {"model": str, "ids": [int, ...]}', 'code': 'invalid_request'}), 400
+        try:
+            template_ids, variant_ids = invalidate_catalog(model, ids)
+        except ValueError as e:
+            return jsonify({'error': str(e), 'code': 'invalid_request'}), 400
+        logger.info(f"[invalidate] {model} {ids}: {len(template_ids)} templates, {len(variant_ids)} variants")
+        return jsonify({'templates': sorted(template_ids), 'variants': sorted(variant_ids)})
+    except Exception as e:
+        error_msg = f"Error invalidating cache: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        return jsonify({'error': error_msg, 'code': 'unknown_error'}), 500
+
 @decilo_bp.route('/decilo-api/products/<int:product_id>/variant-exclusions', methods=['GET'])
 @token_required
 def get_product_variant_exclusions(current_user, product_id: int):
@@ -2275,152 +3719,9 @@ def get_product_variant_exclusions(current_user, product_id: int):
     """
     logger.info(f"Received request for /decilo-api/products/{product_id}/variant-exclusions")
     try:
-        uid = get_uid()
-        models = get_odoo_models()
-
-        # Find all product.template.attribute.value (PTAV) for this template to get exclusion record ids
-        ptav_ids = models.execute_kw(
-            ODOO_DB, uid, ODOO_API_KEY,
-            'product.template.attribute.value', 'search',
-            [[('product_tmpl_id', '=', product_id)]],
-            {'order': 'id asc'}
-        )
-
-        if not ptav_ids:
-            return jsonify({'product_id': product_id, 'exclusions': []})
-
-        ptavs = models.execute_kw(
-            ODOO_DB, uid, ODOO_API_KEY,
-            'product.template.attribute.value', 'read',
-            [ptav_ids],
-            {'fields': ['exclude_for', 'product_attribute_value_id']}
-        )
-        exclusion_ids = set()
-        ptav_base_pav_ids = []
-        for r in ptavs:
-            for eid in (r.get('exclude_for') or []):
-                exclusion_ids.add(eid)
-            pav = r.get('product_attribute_value_id')
-            pav_id = pav[0] if isinstance(pav, (list, tuple)) else pav
-            if pav_id:
-                ptav_base_pav_ids.append(pav_id)
-        if not exclusion_ids:
-            return jsonify({'product_id': product_id, 'exclusions': []})
-
-        # Read exclusion records to get the value_ids involved per exclusion
-        exclusions_raw = models.execute_kw(
-            ODOO_DB, uid, ODOO_API_KEY,
-            'product.template.attribute.exclusion', 'read',
-            [list(exclusion_ids)],
-            {'fields': ['product_tmpl_id', 'value_ids']}
-        )
-        # Keep only exclusions for this product template to avoid cross-template mixups
-        ex_by_id = {}
-        for ex in exclusions_raw or []:
-            tmpl = ex.get('product_tmpl_id')
-            tmpl_id = tmpl[0] if isinstance(tmpl, (list, tuple)) else tmpl
-            if tmpl_id == product_id:
-                ex_by_id[ex.get('id')] = ex
-        # Resolve names for base PAVs (declaring PTAVs' own PAV)
-        base_pav_meta = {}
-        if ptav_base_pav_ids:
-            base_pavs = models.execute_kw(
-                ODOO_DB, uid, ODOO_API_KEY,
-                'product.attribute.value', 'read',
-                [list(set(ptav_base_pav_ids))],
-                {'fields': ['name']}
-            ) or []
-            base_pav_meta = {v['id']: v.get('name') for v in base_pavs}
-
-        # Collect all ids inside exclusion value_ids to resolve to names
-        all_value_ids = set()
-        for ex in ex_by_id.values():
-            vids = ex.get('value_ids') or []
-            for vid in vids:
-                all_value_ids.add(vid if isinstance(vid, int) else (vid[0] if isinstance(vid, (list, tuple)) else None))
-        all_value_ids = {vid for vid in all_value_ids if vid}
-
-        # Build mapping prefering PTAV->PAV name resolution to avoid cross-model id collisions
-        pav_name_by_id = {}
-        ptav_to_pav = {}
-        if all_value_ids:
-            # First attempt: treat all ids as PTAV ids
-            ptav_read = models.execute_kw(
-                ODOO_DB, uid, ODOO_API_KEY,
-                'product.template.attribute.value', 'read',
-                [list(all_value_ids)],
-                {'fields': ['product_attribute_value_id']}
-            ) or []
-            pav_ids_from_ptav = []
-            for r in ptav_read:
-                pav = r.get('product_attribute_value_id')
-                pav_id = pav[0] if isinstance(pav, (list, tuple)) else pav
-                if pav_id:
-                    ptav_to_pav[r['id']] = pav_id
-                    pav_ids_from_ptav.append(pav_id)
-            # Read names for PAV ids gathered via PTAV
-            if pav_ids_from_ptav:
-                pavs_from_ptav = models.execute_kw(
-                    ODOO_DB, uid, ODOO_API_KEY,
-                    'product.attribute.value', 'read',
-                    [list(set(pav_ids_from_ptav))],
-                    {'fields': ['name']}
-                ) or []
-                for v in pavs_from_ptav:
-                    pav_name_by_id[v['id']] = v.get('name')
-
-            # Fallback: any ids not present as PTAV keys might actually be direct PAV ids
-            unresolved_ids = [vid for vid in all_value_ids if vid not in ptav_to_pav]
-            if unresolved_ids:
-                pavs_direct = models.execute_kw(
-                    ODOO_DB, uid, ODOO_API_KEY,
-                    'product.attribute.value', 'read',
-                    [unresolved_ids],
-                    {'fields': ['name']}
-                ) or []
-                for v in pavs_direct:
-                    pav_name_by_id[v['id']] = v.get('name')
-
-        # Build grouped exclusions: value (base) -> excluded value names
-        result_exclusions = []
-        # Create helper: given id that may be PAV or PTAV, resolve name
-        def resolve_value_name(unknown_id):
-            # If it's a PTAV id, map to PAV and resolve name
-            pav = ptav_to_pav.get(unknown_id)
-            if pav:
-                return pav_name_by_id.get(pav)
-            # Else, treat as direct PAV id
-            return pav_name_by_id.get(unknown_id)
-
-        # For each PTAV that declares exclusions, map to its base PAV name
-        for r in ptavs:
-            ex_ids = r.get('exclude_for') or []
-            if not ex_ids:
-                continue
-            pav = r.get('product_attribute_value_id')
-            pav_id = pav[0] if isinstance(pav, (list, tuple)) else pav
-            base_name = base_pav_meta.get(pav_id)
-            if not base_name:
-                continue
-            excluded_names = []
-            for ex_id in ex_ids:
-                # find corresponding exclusion record
-                ex_rec = ex_by_id.get(ex_id)
-                if not ex_rec:
-                    continue
-                for vid in (ex_rec.get('value_ids') or []):
-                    norm_vid = vid if isinstance(vid, int) else (vid[0] if isinstance(vid, (list, tuple)) else None)
-                    name = resolve_value_name(norm_vid) if norm_vid else None
-                    if name:
-                        excluded_names.append(name)
-            # unique and keep order
-            seen = set()
-            dedup = []
-            for n in excluded_names:
-                if n not in seen:
-                    seen.add(n)
-                    dedup.append(n)
-            result_exclusions.append({'value': base_name, 'excluded_values': dedup})
+        locale = get_request_locale()
+        record_popularity(product_id=product_id)
+        result_exclusions = get_variant_exclusions(product_id, locale)
         logger.info(f"Result exclusions: {result_exclusions}")
         return jsonify({'product_id': product_id, 'exclusions': result_exclusions})
 
@@ -2445,14 +3746,20 @@ def get_variant_image(current_user, product_id: int):
             return jsonify({'error': 'selected_variant_ids must be a JSON object'}), 400
 
         size = payload.get('size', 'full')
+        # inline_image=false returns only the signed image_url instead of a base64 data URL
+        inline = payload.get('inline_image', True) is not False
         cache_input = selected_variant_ids if selected_variant_ids else selected_variants
-        cache_key = (product_id, size, json.dumps(sorted(cache_input.items())))
-        now = time.time()
-
-        # Fast path: reuse fully cached payload for this selection/size
-        cached_payload = VARIANT_IMAGE_CACHE.get(cache_key)
-        if cached_payload and cached_payload.get('expires_at', 0) > now and cached_payload.get('payload'):
-            return jsonify(cached_payload['payload'])
+        cache_key = ('selection', product_id, size, json.dumps(sorted(cache_input.items())))
+
+        # Fast path: reuse the cached resolution for this selection/size
+        cached_payload = cached_variant_image_payload(cache_key, inline)
+        if cached_payload:
+            record_popularity(
+                product_id=product_id,
+                variant_product_id=cached_payload.get('variant_product_id'),
+                size_field=odoo_client._image_field_for_size(size)
+            )
+            return jsonify(cached_payload)
 
         # Resolve variant using cached template metadata to avoid repeated RPCs
         variant_product_id = None
@@ -2477,65 +3784,21 @@ def get_variant_image(current_user, product_id: int):
             return jsonify({'error': variant_error}), 400
 
         size_field = odoo_client._image_field_for_size(size)
-        image_b64 = None
+        record_popularity(product_id=product_id, variant_product_id=variant_product_id, size_field=size_field)
         source = 'variant'
+        image_key = ('variant', variant_product_id, size_field)
+        image = get_cached_variant_image(variant_product_id, size_field) if variant_product_id else None
 
-        # Check variant-level image cache
-        variant_cache_key = (variant_product_id, size_field)
-        variant_cached = VARIANT_IMAGE_CACHE.get(variant_cache_key)
-        if variant_cached and variant_cached.get('expires_at', 0) > now:
-            image_b64 = variant_cached.get('image')
-
-        if variant_product_id and not image_b64:
-            variant_image = models.execute_kw(
-                ODOO_DB, uid, ODOO_API_KEY,
-                'product.product', 'read',
-                [[variant_product_id]],
-                {'fields': [size_field]}
-            )
-            if variant_image and variant_image[0].get(size_field):
-                image_b64 = variant_image[0].get(size_field)
-                VARIANT_IMAGE_CACHE[variant_cache_key] = {
-                    'image': image_b64,
-                    'expires_at': now + VARIANT_IMAGE_CACHE_TTL,
-                    'payload': None
-                }
-
-        if not image_b64:
+        if not image:
             source = 'product'
-            template_cache_key = ('template', product_id, size_field)
-            template_cached = VARIANT_IMAGE_CACHE.get(template_cache_key)
-            if template_cached and template_cached.get('expires_at', 0) > now:
-                image_b64 = template_cached.get('image')
-            else:
-                template_images = odoo_client.get_product_images([product_id], size=size)
-                if template_images and template_images[0].get('image'):
-                    image_b64 = template_images[0].get('image')
-                    VARIANT_IMAGE_CACHE[template_cache_key] = {
-                        'image': image_b64,
-                        'expires_at': now + VARIANT_IMAGE_CACHE_TTL,
-                        'payload': None
-                    }
+            image_key = ('template', product_id, size_field)
+            image = get_cached_template_image(product_id, size)
 
-        if not image_b64:
+        if not image:
             return jsonify({'error': 'Image not found', 'variant_product_id': variant_product_id}), 404
 
-        image_url = f"data:image/png;base64,{image_b64}"
-        payload = {
-            'product_id': product_id,
-            'variant_product_id': variant_product_id,
-            'image': image_url,
-            'ptav_ids': ptav_ids,
-            'source': source,
-            'size': size
-        }
-
-        VARIANT_IMAGE_CACHE[cache_key] = {
-            'payload': payload,
-            'expires_at': now + VARIANT_IMAGE_CACHE_TTL,
-            'image': image_b64
-        }
-        return jsonify(payload)
+        selection = remember_variant_selection(cache_key, product_id, variant_product_id, ptav_ids, source, size, image_key)
+        return jsonify(variant_image_payload(selection, image, inline))
     except Exception as e:
         error_msg = f"Error fetching variant image for product {product_id}: {str(e)}"
         logger.error(error_msg, exc_info=True)
@@ -2565,9 +3828,10 @@ def download_order_ear_impression(current_user, order_id: int):
             return jsonify({'error': 'Patient not linked to order'}), 404
         patient_id = orders[0]['x_studio_patient'][0]
 
-        # Read patient binary
+        # Read patient binary, decoded while parsing and spilled to disk when large
         bin_field = f"x_studio_{side}_ear_impression"
         name_field = f"x_studio_{side}_ear_impression_filename"
+        models = get_odoo_models(binary_fields=[bin_field], spool_max_size=odoo_rpc.ODOO_BINARY_SPOOL_MAX_SIZE)
         fields = ['name', bin_field]
         try:
             available = models.execute_kw(
@@ -2589,23 +3853,24 @@ def download_order_ear_impression(current_user, order_id: int):
         if not recs:
             return jsonify({'error': 'Patient not found'}), 404
         rec = recs[0]
-        b64data = rec.get(bin_field)
-        if not b64data:
+        file_obj = rec.get(bin_field)
+        if not file_obj:
             return jsonify({'error': 'File not found'}), 404
 
-        file_bytes = base64.b64decode(b64data)
         filename = rec.get(name_field) or f"{side}_ear_impression.bin"
-        headers = {
-            'Content-Type': 'application/octet-stream',
-            'Content-Disposition': f'attachment; filename="{filename}"'
-        }
-        return Response(file_bytes, headers=headers)
+        return send_file(
+            file_obj,
+            mimetype='application/octet-stream',
+            as_attachment=True,
+            download_name=filename
+        )
     except Exception as e:
         error_msg = f"Error downloading order ear impression: {str(e)}"
         logger.error(error_msg, exc_info=True)
         return jsonify({'error': error_msg, 'code': 'unknown_error'}), 500
         
 @decilo_bp.route('/decilo-api/orders', methods=['POST'])
+@no_request_budget
 @token_required
 def create_order(current_user):
     """Create a sale order for the logged-in partner with product/variant, add chatter and attach docs."""
@@ -3,17 +3,18 @@ Ear Impressions Portal Backend
 Provides API endpoints for bulk downloading ear impression files from Manufacturing Orders.
 """
 
-from flask import Blueprint, jsonify, request, Response
-import xmlrpc.client
+from flask import Blueprint, jsonify, request, send_file
 import os
 from dotenv import load_dotenv
 import logging
 import jwt
 from functools import wraps
-import base64
-import io
+import shutil
+import tempfile
 import zipfile
 from datetime import datetime
+import odoo_rpc
+from decilo import no_request_budget
 
 # Configure logging
 logging.basicConfig(
@@ -34,6 +35,9 @@ ODOO_DB = os.getenv('DECILO_ODOO_DB')
 ODOO_USERNAME = os.getenv('DECILO_ODOO_USERNAME')
 ODOO_API_KEY = os.getenv('DECILO_ODOO_API_KEY')
 
+# Service account whose UID is cached for the lifetime of the worker
+SERVICE_ACCOUNT = odoo_rpc.get_service_account(ODOO_URL, ODOO_DB, ODOO_USERNAME, ODOO_API_KEY)
+
 # JWT Configuration
 JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-secret-key')
 
@@ -47,17 +51,25 @@ DESIGNER_MATCHING = {
 def get_odoo_common():
     """Get Odoo common endpoint"""
     try:
-        common = xmlrpc.client.ServerProxy(f'{ODOO_URL}/xmlrpc/2/common', allow_none=True)
+        common = odoo_rpc.server_proxy(ODOO_URL, 'common')
         return common
     except Exception as e:
         logger.error(f"Failed to connect to Odoo common endpoint: {str(e)}")
         raise
 
 
-def get_odoo_models():
-    """Get Odoo models endpoint"""
+def get_odoo_models(binary_fields=None):
+    """Get Odoo models endpoint.
+
+    Fields listed in binary_fields are decoded while the response is parsed and
+    come back as spooled temp files instead of base64 text.
+    """
     try:
-        models = xmlrpc.client.ServerProxy(f'{ODOO_URL}/xmlrpc/2/object', allow_none=True)
+        models = odoo_rpc.service_models_proxy(
+            SERVICE_ACCOUNT,
+            binary_fields=binary_fields,
+            spool_max_size=odoo_rpc.ODOO_BINARY_SPOOL_MAX_SIZE if binary_fields else None
+        )
         return models
     except Exception as e:
         logger.error(f"Failed to connect to Odoo models endpoint: {str(e)}")
@@ -65,13 +77,9 @@ def get_odoo_models():
 
 
 def get_uid():
-    """Get Odoo user ID"""
+    """Get Odoo user ID (cached per worker, refreshed when Odoo rejects it)"""
     try:
-        common = get_odoo_common()
-        uid = common.authenticate(ODOO_DB, ODOO_USERNAME, ODOO_API_KEY, {})
-        if not uid:
-            raise Exception("Authentication failed")
-        return uid
+        return SERVICE_ACCOUNT.get_uid()
     except Exception as e:
         logger.error(f"Failed to authenticate with Odoo: {str(e)}")
         raise
@@ -263,7 +271,8 @@ def get_manufacturing_orders(current_user):
             ODOO_DB, uid, ODOO_API_KEY,
             'mrp.production', 'read',
             [mo_ids],
-            {'fields': mo_fields}
+            # bin_size returns file sizes instead of the STL payloads; we only need presence
+            {'fields': mo_fields, 'context': {'bin_size': True}}
         )
 
         # Format response
@@ -333,7 +342,6 @@ def bulk_download_ear_impressions(current_user):
             return jsonify({'error': 'No manufacturing orders selected'}), 400
 
         uid = get_uid()
-        models = get_odoo_models()
 
         # Determine which file fields to read
         file_fields = ['name']
@@ -341,6 +349,7 @@ def bulk_download_ear_impressions(current_user):
             file_fields.append('x_studio_left_ear_impression_file')
         if 'right' in sides:
             file_fields.append('x_studio_right_ear_impression_file')
+        models = get_odoo_models(binary_fields=file_fields[1:])
 
         # Also try to get filename fields if they exist
         filename_fields = []
@@ -370,8 +379,9 @@ def bulk_download_ear_impressions(current_user):
         if not mo_records:
             return jsonify({'error': 'No manufacturing orders found'}), 404
 
-        # Create ZIP file in memory
-        zip_buffer = io.BytesIO()
+        # Build the ZIP in a spooled temp file: files are decoded straight from the
+        # RPC response, so no STL is ever held as base64 text plus a decoded copy
+        zip_buffer = tempfile.SpooledTemporaryFile(max_size=odoo_rpc.ODOO_BINARY_SPOOL_MAX_SIZE)
         files_added = 0
 
         with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
@@ -381,28 +391,29 @@ def bulk_download_ear_impressions(current_user):
                 safe_mo_name = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in mo_name)
 
                 if 'left' in sides:
-                    left_data = rec.get('x_studio_left_ear_impression_file')
-                    if left_data:
+                    left_file = rec.get('x_studio_left_ear_impression_file')
+                    if left_file:
                         try:
-                            left_bytes = base64.b64decode(left_data)
                             left_filename = rec.get('x_studio_left_ear_impression_file_filename', 'left_ear.stl')
-                            zip_file.writestr(f"{safe_mo_name}/{left_filename}", left_bytes)
+                            with left_file, zip_file.open(f"{safe_mo_name}/{left_filename}", 'w') as dest:
+                                shutil.copyfileobj(left_file, dest)
                             files_added += 1
                         except Exception as e:
-                            logger.warning(f"Could not decode left ear file for {mo_name}: {e}")
+                            logger.warning(f"Could not add left ear file for {mo_name}: {e}")
 
                 if 'right' in sides:
-                    right_data = rec.get('x_studio_right_ear_impression_file')
-                    if right_data:
+                    right_file = rec.get('x_studio_right_ear_impression_file')
+                    if right_file:
                         try:
-                            right_bytes = base64.b64decode(right_data)
                             right_filename = rec.get('x_studio_right_ear_impression_file_filename', 'right_ear.stl')
-                            zip_file.writestr(f"{safe_mo_name}/{right_filename}", right_bytes)
+                            with right_file, zip_file.open(f"{safe_mo_name}/{right_filename}", 'w') as dest:
+                                shutil.copyfileobj(right_file, dest)
                             files_added += 1
                         except Exception as e:
-                            logger.warning(f"Could not decode right ear file for {mo_name}: {e}")
+                            logger.warning(f"Could not add right ear file for {mo_name}: {e}")
 
         if files_added == 0:
+            zip_buffer.close()
             return jsonify({'error': 'No ear impression files found in selected orders'}), 404
 
         zip_buffer.seek(0)
@@ -411,13 +422,11 @@ def bulk_download_ear_impressions(current_user):
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"ear_impressions_{timestamp}.zip"
 
-        return Response(
-            zip_buffer.getvalue(),
+        return send_file(
+            zip_buffer,
             mimetype='application/zip',
-            headers={
-                'Content-Disposition': f'attachment; filename="{filename}"',
-                'Content-Type': 'application/zip'
-            }
+            as_attachment=True,
+            download_name=filename
         )
 
     except Exception as e:
@@ -444,10 +453,10 @@ def download_single_ear_impression(current_user):
             return jsonify({'error': 'side must be "left" or "right"'}), 400
 
         uid = get_uid()
-        models = get_odoo_models()
 
         file_field = f'x_studio_{side}_ear_impression_file'
         filename_field = f'x_studio_{side}_ear_impression_file_filename'
+        models = get_odoo_models(binary_fields=[file_field])
 
         fields = ['name', file_field]
         try:
@@ -472,25 +481,19 @@ def download_single_ear_impression(current_user):
             return jsonify({'error': 'Manufacturing order not found'}), 404
 
         rec = records[0]
-        file_data = rec.get(file_field)
+        file_obj = rec.get(file_field)
 
-        if not file_data:
+        if not file_obj:
             return jsonify({'error': 'File not found'}), 404
 
-        try:
-            file_bytes = base64.b64decode(file_data)
-        except Exception:
-            return jsonify({'error': 'Invalid file data'}), 500
-
         mo_name = rec.get('name', f'MO_{mo_id}')
         filename = rec.get(filename_field) or f"{mo_name}_{side}_ear.stl"
 
-        return Response(
-            file_bytes,
-            headers={
-                'Content-Type': 'application/octet-stream',
-                'Content-Disposition': f'attachment; filename="{filename}"'
-            }
+        return send_file(
+            file_obj,
+            mimetype='application/octet-stream',
+            as_attachment=True,
+            download_name=filename
         )
 
     except Exception as e:
@@ -504,6 +507,7 @@ SERVER_ACTION_3D_PRINTING = 1131
 
 
 @ear_impressions_bp.route('/ear-impressions-api/mark-done', methods=['POST'])
+@no_request_budget
 @token_required
 def mark_mo_done(current_user):
     """
@@ -574,6 +578,7 @@ def mark_mo_done(current_user):
 
 
 @ear_impressions_bp.route('/ear-impressions-api/mark-done/<int:mo_id>', methods=['POST'])
+@no_request_budget
 @token_required
 def mark_single_mo_done(current_user, mo_id):
     """
@@ -0,0 +1,48 @@
+"""
+Gunicorn settings and server hooks (picked up from the working directory).
+Command line flags in startup.txt still apply on top of these.
+
+With preloading (DECILO_PRELOAD_APP, on by default) the saved caches are
+restored and the catalog snapshot and warm-up (decilo.run_catalog_warm_up)
+built once in the master before the workers are forked, then frozen out of the
+garbage collector's reach, so every worker shares those pages copy-on-write.
+The sharing lasts until the next snapshot generation (the first catalog change
+picked up by the sync, or the periodic rebuild): each worker then loads its own
+copy of it. The master warm-up is capped at DECILO_BOOT_WARMUP_MASTER_TIMEOUT
+seconds and the Odoo thread pools it used are shut down before forking. With
+DECILO_PRELOAD_APP=off, each worker warms up in the background after it starts
+(the first one on the host builds the snapshot, the others load it) and reports
+not ready on /healthz/ready until it is done.
+Workers save their caches when they exit (see decilo.save_cache_snapshot).
+"""
+
+import gc
+import os
+
+preload_app = os.getenv('DECILO_PRELOAD_APP', 'on').strip().lower() != 'off'
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        import decilo
+        import odoo_rpc
+        server.log.info("Warming up the catalog before forking workers")
+        decilo.run_catalog_warm_up(max_duration=decilo.BOOT_WARMUP_MASTER_TIMEOUT)
+        # No pool threads may be running when the workers are forked; each worker starts its own pools
+        odoo_rpc.shutdown_fan_out_executors()
+        # Collections in the children would otherwise touch (and copy) every page of the preloaded objects
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    import decilo
+    decilo.start_catalog_snapshot_refresh()
+    decilo.start_cache_snapshot_saver()
+    if not worker.cfg.preload_app:
+        decilo.start_catalog_warm_up()
+
+
+def worker_exit(server, worker):
+    # Graceful shutdown (restart, deploy, scale-in): keep this worker's caches for the next boot
+    import decilo
+    decilo.save_cache_snapshot()
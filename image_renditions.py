@@ -0,0 +1,228 @@
+"""
+Responsive renditions of catalog images, derived locally with Pillow.
+Odoo only stores fixed PNG/JPEG sizes (image_256 ... image_1920). The smallest
+stored size that covers the wanted width is fetched once, and each width/format
+served to browsers is resized and transcoded from it: WebP or AVIF when the
+Accept header allows, at the width asked for by the `w` query parameter or the
+client hints (DPR, Width, Save-Data).
+
+Widths are snapped to RENDITION_WIDTHS so each image has a bounded number of
+renditions to cache.
+"""
+
+import collections
+import io
+import logging
+import os
+
+from PIL import Image
+
+try:
+    # AVIF encoding needs the pillow-avif-plugin on this Pillow version; WebP is used without it
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+# Sizes Odoo stores for each image: (bounding box in px, field), smallest first
+ODOO_IMAGE_FIELDS = (
+    (256, 'image_256'),
+    (512, 'image_512'),
+    (1024, 'image_1024'),
+    (1920, 'image_1920'),
+)
+ODOO_FIELD_WIDTHS = {field: width for width, field in ODOO_IMAGE_FIELDS}
+# Widths renditions are rounded up to (the last one is the largest Odoo size)
+RENDITION_WIDTHS = (64, 128, 192, 256, 320, 384, 480, 640, 768, 1024, 1280, 1600, 1920)
+MAX_DPR = 3.0
+
+IMAGE_TRANSCODE_ENABLED = os.getenv('DECILO_IMAGE_TRANSCODE', 'on').strip().lower() != 'off'
+WEBP_QUALITY = int(os.getenv('DECILO_IMAGE_WEBP_QUALITY', '80'))
+AVIF_QUALITY = int(os.getenv('DECILO_IMAGE_AVIF_QUALITY', '60'))
+JPEG_QUALITY = int(os.getenv('DECILO_IMAGE_JPEG_QUALITY', '82'))
+# Quality reduction when the client sends Save-Data: on
+SAVE_DATA_QUALITY_DROP = 20
+# Low-quality image placeholders (LQIP): bounding box in px and WebP quality
+PLACEHOLDER_SIZE = 20
+PLACEHOLDER_QUALITY = 40
+
+# Request headers a rendition depends on (Vary), and the client hints the browser should send (Accept-CH)
+VARY_HEADERS = ('Accept', 'DPR', 'Width', 'Save-Data', 'Sec-CH-DPR', 'Sec-CH-Width')
+ACCEPT_CH = 'DPR, Width, Save-Data, Sec-CH-DPR, Sec-CH-Width'
+
+# Pillow format name and MIME type of each output format
+OUTPUT_FORMATS = {
+    'avif': ('AVIF', 'image/avif'),
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'png': ('PNG', 'image/png'),
+}
+SOURCE_FORMATS = {'image/png': 'png', 'image/jpeg': 'jpeg', 'image/webp': 'webp', 'image/avif': 'avif'}
+
+
+def _can_save(pil_format):
+    Image.init()
+    return pil_format in Image.SAVE
+
+
+AVIF_SUPPORTED = _can_save('AVIF')
+WEBP_SUPPORTED = _can_save('WEBP')
+
+
+class Rendition(collections.namedtuple('Rendition', ['width', 'format', 'quality'])):
+    """Target of a rendition: width in px, output format (None keeps the source format) and quality."""
+
+    __slots__ = ()
+
+    @property
+    def key(self):
+        """Stable name of the rendition, used in cache keys and the image index."""
+        return f"w{self.width}.{self.format or 'src'}.q{self.quality}"
+
+    @property
+    def source_field(self):
+        """Smallest Odoo image field that covers the width."""
+        for width, field in ODOO_IMAGE_FIELDS:
+            if width >= self.width:
+                return field
+        return ODOO_IMAGE_FIELDS[-1][1]
+
+
+def _header_float(headers, *names):
+    for name in names:
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value.strip().strip('"'))
+            except ValueError:
+                continue
+    return None
+
+
+def snap_width(width):
+    """Round a width up to the next rendition width."""
+    for candidate in RENDITION_WIDTHS:
+        if candidate >= width:
+            return candidate
+    return RENDITION_WIDTHS[-1]
+
+
+def negotiate(headers, args, size_field):
+    """Pick the rendition for a request, or None to serve the stored Odoo image unchanged.
+
+    The width is the `w` query parameter (CSS px, times DPR), else the Width hint
+    (device px), else the nominal width of size_field. Save-Data halves the
+    nominal width, ignores DPR and lowers the quality.
+    """
+    if not IMAGE_TRANSCODE_ENABLED:
+        return None
+
+    save_data = (headers.get('Save-Data') or '').strip().lower() == 'on'
+    dpr = _header_float(headers, 'Sec-CH-DPR', 'DPR') or args.get('dpr', type=float) or 1.0
+    dpr = 1.0 if save_data else min(max(dpr, 1.0), MAX_DPR)
+
+    css_width = args.get('w', type=int)
+    if css_width and css_width > 0:
+        width = css_width * dpr
+    else:
+        width = _header_float(headers, 'Sec-CH-Width', 'Width')
+        if not width or width <= 0:
+            width = ODOO_FIELD_WIDTHS.get(size_field, 512)
+            if save_data:
+                width = width / 2
+    width = snap_width(int(width))
+
+    accept = headers.get('Accept') or ''
+    if AVIF_SUPPORTED and 'image/avif' in accept:
+        output_format, quality = 'avif', AVIF_QUALITY
+    elif WEBP_SUPPORTED and 'image/webp' in accept:
+        output_format, quality = 'webp', WEBP_QUALITY
+    else:
+        output_format, quality = None, JPEG_QUALITY
+    if save_data:
+        quality = max(quality - SAVE_DATA_QUALITY_DROP, 30)
+
+    rendition = Rendition(width, output_format, quality)
+    if output_format is None and width >= ODOO_FIELD_WIDTHS.get(size_field, 0):
+        # Nothing to resize or transcode
+        return None
+    return rendition
+
+
+def render(data, mimetype, rendition):
+    """Resize/transcode image bytes; returns the new bytes, or None to keep the source image.
+
+    Images are never upscaled. SVG, animated and unreadable images are left alone,
+    as are results that would not be smaller than the source. JPEG sources keep
+    JPEG and PNG sources keep PNG (and their transparency) unless transcoded.
+    """
+    source_format = SOURCE_FORMATS.get(mimetype)
+    if source_format is None:
+        return None
+    try:
+        image = Image.open(io.BytesIO(data))
+        if getattr(image, 'n_frames', 1) > 1:
+            return None
+        image.load()
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning(f"[renditions] cannot decode {mimetype} image: {e}")
+        return None
+
+    output_format = rendition.format or source_format
+    resized = image.width > rendition.width
+    if not resized and output_format == source_format:
+        return None
+
+    # Palette/greyscale images are resampled (and encoded) in RGB(A)
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    if resized:
+        height = max(1, round(image.height * rendition.width / image.width))
+        image = image.resize((rendition.width, height), Image.LANCZOS)
+
+    pil_format, _ = OUTPUT_FORMATS[output_format]
+    if output_format == 'jpeg':
+        image = image.convert('RGB')
+        options = {'quality': rendition.quality, 'optimize': True, 'progressive': True}
+    elif output_format == 'png':
+        options = {'optimize': True}
+    else:
+        options = {'quality': rendition.quality}
+        if output_format == 'webp':
+            options['method'] = 4
+
+    out = io.BytesIO()
+    try:
+        image.save(out, pil_format, **options)
+    except (OSError, ValueError) as e:
+        logger.warning(f"[renditions] cannot encode {rendition.key}: {e}")
+        return None
+    rendered = out.getvalue()
+    if len(rendered) >= len(data):
+        # The source is cheaper to send (browsers scale it down themselves)
+        return None
+    return rendered
+
+
+def placeholder(data, mimetype):
+    """Tiny (PLACEHOLDER_SIZE px) WebP preview of an image, shown blurred while it loads; None if not possible."""
+    if SOURCE_FORMATS.get(mimetype) is None:
+        return None
+    try:
+        image = Image.open(io.BytesIO(data))
+        # JPEG sources are decoded at a reduced scale directly
+        image.draft('RGB', (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        image.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.BILINEAR)
+        out = io.BytesIO()
+        if WEBP_SUPPORTED:
+            image.save(out, 'WEBP', quality=PLACEHOLDER_QUALITY)
+        else:
+            image.save(out, 'PNG', optimize=True)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning(f"[renditions] cannot build placeholder of {mimetype} image: {e}")
+        return None
+    return out.getvalue()
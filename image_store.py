@@ -0,0 +1,204 @@
+"""
+Content-addressed on-disk store for catalog images.
+Image bytes are written once per SHA-256 (identical template and variant images
+share a file) under DECILO_IMAGE_STORE_DIR, and an SQLite index maps
+(model, record id, image field) to the hash, MIME type and write_date last seen
+in Odoo. Stored files can be served with send_file, so gunicorn hands them to the
+kernel (sendfile) instead of copying them through Python.
+"""
+
+import base64
+import collections
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from catalog_cache import sniff_image_mimetype
+
+logger = logging.getLogger(__name__)
+
+# Directory of the store; keep it on local disk (shared by the workers of one host)
+IMAGE_STORE_DIR = os.getenv('DECILO_IMAGE_STORE_DIR', os.path.join(tempfile.gettempdir(), 'decilo-images'))
+IMAGE_STORE_ENABLED = os.getenv('DECILO_IMAGE_STORE', 'disk').strip().lower() != 'off'
+# Blob files no longer referenced by the index are deleted once older than this
+IMAGE_STORE_GC_MIN_AGE = 60 * 60  # seconds
+IMAGE_STORE_GC_INTERVAL = 6 * 60 * 60  # seconds between sweeps per process
+SQLITE_BUSY_TIMEOUT = 2.0
+
+
+class StoredImage(collections.namedtuple('StoredImage', ['sha256', 'mimetype', 'path', 'size', 'write_date'])):
+    """Reference to an image file in the store."""
+
+    __slots__ = ()
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def data_url(self):
+        return f"data:{self.mimetype};base64,{base64.b64encode(self.read()).decode('ascii')}"
+
+
+class ImageStore:
+    """Content-addressed image files plus an index of which record uses which file."""
+
+    def __init__(self, root):
+        self.root = root
+        self._local = threading.local()
+        self._last_gc = time.monotonic()
+        os.makedirs(os.path.join(root, 'blobs'), exist_ok=True)
+        self._create_schema()
+
+    def blob_path(self, sha256):
+        return os.path.join(self.root, 'blobs', sha256[:2], sha256)
+
+    def put(self, data):
+        """Write image bytes (if not stored yet) and return (sha256, mimetype, path)."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(sha256)
+        if os.path.exists(path):
+            # Refresh mtime so garbage collection never races a new reference to an old file
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file in the same directory, then rename: readers never see partial files
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+        return sha256, sniff_image_mimetype(data), path
+
+    def store(self, model, record_id, field, data, write_date=None):
+        """Store a record's image and point the index at it; returns a StoredImage."""
+        sha256, mimetype, path = self.put(data)
+        try:
+            self._connection().execute(
+                'INSERT OR REPLACE INTO image_index (model, record_id, field, sha256, mimetype, size, write_date, checked_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (model, record_id, field, sha256, mimetype, len(data), write_date, time.time())
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"[image-store] index write failed: {e}")
+        if time.monotonic() - self._last_gc >= IMAGE_STORE_GC_INTERVAL:
+            self.collect_garbage()
+        return StoredImage(sha256, mimetype, path, len(data), write_date)
+
+    def lookup(self, model, record_id, field, max_age=None):
+        """Indexed image of a record, or None if unknown, checked longer than max_age ago, or missing on disk."""
+        try:
+            row = self._connection().execute(
+                'SELECT sha256, mimetype, size, write_date, checked_at FROM image_index '
+                'WHERE model = ? AND record_id = ? AND field = ?',
+                (model, record_id, field)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"[image-store] index read failed: {e}")
+            return None
+        if row is None:
+            return None
+        sha256, mimetype, size, write_date, checked_at = row
+        if max_age is not None and checked_at + max_age <= time.time():
+            return None
+        path = self.blob_path(sha256)
+        if not os.path.exists(path):
+            return None
+        return StoredImage(sha256, mimetype, path, size, write_date)
+
+    def expire(self, model, record_id, write_date=None):
+        """Mark a record's index entries for re-checking, unless they match its current write_date."""
+        try:
+            self._connection().execute(
+                'UPDATE image_index SET checked_at = 0 WHERE model = ? AND record_id = ? '
+                'AND (? IS NULL OR write_date IS NULL OR write_date != ?)',
+                (model, record_id, write_date, write_date)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"[image-store] index update failed: {e}")
+
+    def forget(self, model, record_id, field=None):
+        """Drop index entries of a record (all fields, or one)."""
+        if field is None:
+            self._connection().execute(
+                'DELETE FROM image_index WHERE model = ? AND record_id = ?', (model, record_id)
+            )
+        else:
+            self._connection().execute(
+                'DELETE FROM image_index WHERE model = ? AND record_id = ? AND field = ?', (model, record_id, field)
+            )
+
+    def collect_garbage(self):
+        """Delete blob files that no index entry references (and that are not brand new)."""
+        self._last_gc = time.monotonic()
+        try:
+            referenced = {row[0] for row in self._connection().execute('SELECT DISTINCT sha256 FROM image_index')}
+        except sqlite3.Error as e:
+            logger.warning(f"[image-store] garbage collection skipped: {e}")
+            return 0
+        cutoff = time.time() - IMAGE_STORE_GC_MIN_AGE
+        removed = 0
+        blobs_dir = os.path.join(self.root, 'blobs')
+        for dirpath, _, filenames in os.walk(blobs_dir):
+            for filename in filenames:
+                if filename in referenced:
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.unlink(path)
+                        removed += 1
+                except OSError:
+                    pass
+        if removed:
+            logger.info(f"[image-store] removed {removed} unreferenced image files")
+        return removed
+
+    def _connection(self):
+        # One connection per thread, reopened in forked workers
+        conn = getattr(self._local, 'connection', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(os.path.join(self.root, 'index.sqlite3'), timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _create_schema(self):
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS image_index ('
+            ' model TEXT NOT NULL,'
+            ' record_id INTEGER NOT NULL,'
+            ' field TEXT NOT NULL,'
+            ' sha256 TEXT NOT NULL,'
+            ' mimetype TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' write_date TEXT,'
+            ' checked_at REAL NOT NULL,'
+            ' PRIMARY KEY (model, record_id, field))'
+        )
+
+
+def create_image_store():
+    """The configured ImageStore, or None when the disk store is turned off or unusable."""
+    if not IMAGE_STORE_ENABLED:
+        return None
+    try:
+        return ImageStore(IMAGE_STORE_DIR)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"[image-store] disabled, cannot open {IMAGE_STORE_DIR}: {e}")
+        return None
@@ -0,0 +1,1122 @@
+"""
+Odoo RPC plumbing shared by the Decilo and Ear Impressions blueprints.
+Provides a thread-safe pooled XML-RPC transport so Odoo calls reuse keep-alive
+connections (and TLS sessions) instead of paying a new handshake per request,
+a JSON-RPC proxy with the same call shape, and a per-process cache of the
+service-account UID.
+
+Known binary fields (images, STL files) can be decoded while the response is
+parsed, so callers get bytes (or a spooled temp file) instead of base64 text.
+
+ReadBatcher coalesces request-scoped `read` calls on the same model into one
+round trip, and FanOutExecutor runs independent calls in parallel on a bounded,
+process-wide thread pool. SingleFlight lets concurrent callers share one
+in-flight computation per key. Read-only calls can optionally be hedged: when one is
+slower than the recent latency percentile, a duplicate is sent and the first
+answer wins.
+
+Every call gets a socket timeout: the time left in the current request deadline
+(see set_deadline()), or ODOO_RPC_TIMEOUT outside of one.
+"""
+
+import binascii
+import collections
+import concurrent.futures
+import contextvars
+import functools
+import http.client
+import io
+import itertools
+import json
+import logging
+import math
+import os
+import select
+import socket
+import ssl
+import tempfile
+import threading
+import time
+import urllib.parse
+import xmlrpc.client
+
+logger = logging.getLogger(__name__)
+
+# Connection pool configuration
+ODOO_RPC_POOL_MAXSIZE = int(os.getenv('ODOO_RPC_POOL_MAXSIZE', '8'))  # idle connections kept per host
+ODOO_RPC_IDLE_TIMEOUT = float(os.getenv('ODOO_RPC_IDLE_TIMEOUT', '50'))  # seconds, below Odoo's keep-alive timeout
+
+# Decoded binary fields larger than this spill from memory to a temp file (when spooling)
+ODOO_BINARY_SPOOL_MAX_SIZE = int(os.getenv('ODOO_BINARY_SPOOL_MAX_SIZE', str(1024 * 1024)))
+# Bytes read from the socket per parser feed
+ODOO_RPC_READ_CHUNK_SIZE = 64 * 1024
+
+# Socket timeout for Odoo calls made outside a request deadline
+ODOO_RPC_TIMEOUT = float(os.getenv('ODOO_RPC_TIMEOUT', '120'))  # seconds
+
+# Wire protocol used for Odoo calls: 'xmlrpc' (/xmlrpc/2) or 'jsonrpc' (/jsonrpc)
+ODOO_RPC_PROTOCOL = os.getenv('DECILO_ODOO_PROTOCOL', 'xmlrpc').strip().lower()
+
+# Fault codes Odoo's /xmlrpc/2 endpoints use for AccessDenied and AccessError
+ODOO_AUTH_FAULT_CODES = (3, 4)
+
+# Hedged reads: duplicate a read-only call that is slower than this percentile of
+# recent latencies for the same model/method (off unless ODOO_RPC_HEDGE_ENABLED)
+ODOO_RPC_HEDGE_ENABLED = os.getenv('ODOO_RPC_HEDGE_ENABLED', 'false').strip().lower() in ('1', 'true', 'yes')
+ODOO_RPC_HEDGE_PERCENTILE = float(os.getenv('ODOO_RPC_HEDGE_PERCENTILE', '95'))
+ODOO_RPC_HEDGE_MIN_DELAY = float(os.getenv('ODOO_RPC_HEDGE_MIN_DELAY', '0.05'))  # seconds
+ODOO_RPC_HEDGE_MIN_SAMPLES = int(os.getenv('ODOO_RPC_HEDGE_MIN_SAMPLES', '20'))
+ODOO_RPC_HEDGE_WORKERS = int(os.getenv('ODOO_RPC_HEDGE_WORKERS', '8'))
+# Only idempotent methods may be sent twice; writes (create, action_confirm, message_post...) never are
+HEDGEABLE_METHODS = frozenset({'read', 'search', 'search_read', 'search_count', 'fields_get'})
+
+# Odoo exception names in JSON-RPC errors, mapped to the equivalent XML-RPC fault codes
+JSONRPC_FAULT_CODES = {
+    'odoo.exceptions.AccessDenied': 3,
+    'odoo.exceptions.AccessError': 4,
+    'odoo.exceptions.UserError': 2,
+    'odoo.exceptions.ValidationError': 2,
+    'odoo.exceptions.MissingError': 2,
+}
+
+
+class DeadlineExceeded(TimeoutError):
+    """The current request's Odoo time budget is spent."""
+
+
+class Deadline:
+    """Time budget for the Odoo calls of one request.
+
+    Shared (by reference) with fan-out tasks; `partial` records that optional
+    work was dropped because the budget ran out.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.partial = False
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+_DEADLINE = contextvars.ContextVar('odoo_rpc_deadline', default=None)
+
+
+def set_deadline(seconds):
+    """Start a deadline for the Odoo calls made from the current context."""
+    deadline = Deadline(seconds)
+    _DEADLINE.set(deadline)
+    return deadline
+
+
+def clear_deadline():
+    _DEADLINE.set(None)
+
+
+def current_deadline():
+    return _DEADLINE.get()
+
+
+def call_timeout():
+    """Socket timeout for the next Odoo call; raises DeadlineExceeded when none is left."""
+    deadline = _DEADLINE.get()
+    if deadline is None:
+        return ODOO_RPC_TIMEOUT
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise DeadlineExceeded(f"Odoo request budget of {deadline.seconds:g}s exhausted")
+    return min(remaining, ODOO_RPC_TIMEOUT)
+
+
+def _raise_if_deadline_exceeded(error):
+    deadline = _DEADLINE.get()
+    if isinstance(error, socket.timeout) and not isinstance(error, DeadlineExceeded) \
+            and deadline is not None and deadline.expired():
+        raise DeadlineExceeded(f"Odoo request budget of {deadline.seconds:g}s exhausted") from error
+
+
+class _PooledHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPS connection that resumes the pool's cached TLS session when (re)connecting."""
+
+    def __init__(self, host, pool, **kwargs):
+        super().__init__(host, context=pool.ssl_context, **kwargs)
+        self._pool = pool
+
+    def connect(self):
+        # Same as HTTPSConnection.connect, but offers the last session seen for
+        # this host so the handshake can be abbreviated.
+        http.client.HTTPConnection.connect(self)
+        server_hostname = self._tunnel_host or self.host
+        self.sock = self._context.wrap_socket(
+            self.sock,
+            server_hostname=server_hostname,
+            session=self._pool.get_tls_session(server_hostname)
+        )
+
+
+class ConnectionPool:
+    """Thread-safe pool of keep-alive HTTP(S) connections, keyed by scheme and host.
+
+    Connections are checked out for the duration of a single RPC and returned
+    afterwards. Idle connections are health-checked before reuse and evicted
+    when they have been idle too long or the server has closed them.
+    """
+
+    def __init__(self, maxsize=ODOO_RPC_POOL_MAXSIZE, idle_timeout=ODOO_RPC_IDLE_TIMEOUT, ssl_context=None):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self._lock = threading.Lock()
+        self._idle = {}  # (scheme, host) -> [(connection, last_used)]
+        self._tls_sessions = {}  # server hostname -> ssl.SSLSession
+
+    def acquire(self, scheme, host):
+        """Return a healthy idle connection for host, or a new one, set to call_timeout()."""
+        timeout = call_timeout()
+        key = (scheme, host)
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                entry = idle.pop() if idle else None
+            if entry is None:
+                break
+            connection, last_used = entry
+            if self._is_healthy(connection, last_used):
+                connection.reused = True
+                connection.timeout = timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+                return connection
+            connection.close()
+        connection = self._new_connection(scheme, host)
+        connection.reused = False
+        connection.timeout = timeout
+        return connection
+
+    def release(self, scheme, host, connection):
+        """Return a connection whose response has been fully read to the pool."""
+        if connection.sock is None:
+            # Server asked to close (Connection: close); nothing worth keeping
+            return
+        session = getattr(connection.sock, 'session', None)
+        if session is not None:
+            self._remember_tls_session(connection.host, session)
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            idle = self._idle.setdefault((scheme, host), [])
+            # Opportunistically drop connections that went stale while idle
+            while idle and now - idle[0][1] >= self.idle_timeout:
+                expired.append(idle.pop(0)[0])
+            if len(idle) < self.maxsize:
+                idle.append((connection, now))
+            else:
+                expired.append(connection)
+        for stale in expired:
+            stale.close()
+
+    def clear(self, scheme=None, host=None):
+        """Close idle connections (all of them, or those for one host)."""
+        with self._lock:
+            if scheme is None:
+                entries = [e for idle in self._idle.values() for e in idle]
+                self._idle = {}
+            else:
+                entries = self._idle.pop((scheme, host), [])
+        for connection, _ in entries:
+            connection.close()
+
+    def get_tls_session(self, server_hostname):
+        with self._lock:
+            return self._tls_sessions.get(server_hostname)
+
+    def _remember_tls_session(self, server_hostname, session):
+        with self._lock:
+            self._tls_sessions[server_hostname] = session
+
+    def _reset_after_fork(self):
+        # Sockets inherited from the parent must never be shared with it
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._tls_sessions = {}
+
+    def _is_healthy(self, connection, last_used):
+        if time.monotonic() - last_used >= self.idle_timeout:
+            return False
+        sock = connection.sock
+        if sock is None:
+            # Closed cleanly; http.client reconnects on next use
+            return True
+        try:
+            # An idle keep-alive socket must not be readable: readable means the
+            # server sent EOF/close_notify (or garbage) and the socket is stale.
+            readable, _, _ = select.select([sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def _new_connection(self, scheme, host):
+        if scheme == 'https':
+            return _PooledHTTPSConnection(host, self)
+        return http.client.HTTPConnection(host)
+
+
+class PooledTransport(xmlrpc.client.SafeTransport):
+    """XML-RPC transport backed by a shared ConnectionPool.
+
+    Unlike the stock Transport, which caches a single connection per instance,
+    one PooledTransport can be shared by every thread in the process: each call
+    checks out its own connection for the duration of the request.
+    """
+
+    def __init__(self, pool, scheme='https', use_datetime=False, use_builtin_types=False):
+        super().__init__(use_datetime=use_datetime, use_builtin_types=use_builtin_types, context=pool.ssl_context)
+        self._pool = pool
+        self._scheme = scheme
+        self._local = threading.local()
+
+    def make_connection(self, host):
+        # send_request() asks for the connection checked out by single_request()
+        return self._local.connection
+
+    def close(self):
+        # Pooled connections outlive any single ServerProxy
+        pass
+
+    def single_request(self, host, handler, request_body, verbose=False):
+        chost, self._extra_headers, _ = self.get_host_info(host)
+        connection = self._pool.acquire(self._scheme, chost)
+        self._local.connection = connection
+        try:
+            self.send_request(host, handler, request_body, verbose)
+            resp = connection.getresponse()
+            if resp.status == 200:
+                self.verbose = verbose
+                result = self.parse_response(resp)
+                self._pool.release(self._scheme, chost, connection)
+                return result
+            # Discard the error body before raising
+            resp.read()
+        except xmlrpc.client.Fault:
+            # The fault body was read completely; the connection is still usable
+            self._pool.release(self._scheme, chost, connection)
+            raise
+        except Exception as e:
+            connection.close()
+            if connection.reused and not isinstance(e, socket.timeout):
+                # One stale keep-alive usually means its idle siblings are stale too
+                self._pool.clear(self._scheme, chost)
+            _raise_if_deadline_exceeded(e)
+            raise
+        finally:
+            self._local.connection = None
+
+        connection.close()
+        raise xmlrpc.client.ProtocolError(
+            host + handler,
+            resp.status, resp.reason,
+            dict(resp.getheaders())
+        )
+
+
+class _Base64Sink:
+    """Incrementally decodes base64 text into bytes or a spooled temp file."""
+
+    def __init__(self, spool_max_size=None):
+        if spool_max_size:
+            self._buffer = tempfile.SpooledTemporaryFile(max_size=spool_max_size)
+        else:
+            self._buffer = io.BytesIO()
+        self._spooled = bool(spool_max_size)
+        self._pending = ''
+
+    def feed(self, text):
+        text = self._pending + text
+        if '\n' in text or '\r' in text or ' ' in text or '\t' in text:
+            # Line breaks are legal inside base64 payloads
+            text = ''.join(text.split())
+        usable = len(text) - len(text) % 4
+        if usable:
+            self._buffer.write(binascii.a2b_base64(text[:usable]))
+        self._pending = text[usable:]
+
+    def result(self):
+        if self._pending:
+            self._buffer.write(binascii.a2b_base64(self._pending))
+            self._pending = ''
+        if self._spooled:
+            self._buffer.seek(0)
+            return self._buffer
+        return self._buffer.getvalue()
+
+
+class BinaryFieldUnmarshaller(xmlrpc.client.Unmarshaller):
+    """Unmarshaller that decodes the base64 text of known struct members while parsing.
+
+    Odoo sends binary fields as <string> values holding base64 text. For members
+    named in binary_fields the text is decoded chunk by chunk as expat delivers
+    it, so the full base64 string is never materialised. Values come back as
+    bytes, or as a rewound SpooledTemporaryFile when spool_max_size is set.
+    """
+
+    def __init__(self, binary_fields, spool_max_size=None, use_datetime=False, use_builtin_types=False):
+        super().__init__(use_datetime=use_datetime, use_builtin_types=use_builtin_types)
+        self._binary_fields = frozenset(binary_fields)
+        self._spool_max_size = spool_max_size
+        self._binary_member = False
+        self._sink = None
+
+    def start(self, tag, attrs):
+        super().start(tag, attrs)
+        if tag == 'string' and self._binary_member:
+            self._sink = _Base64Sink(self._spool_max_size)
+
+    def data(self, text):
+        if self._sink is not None:
+            self._sink.feed(text)
+        else:
+            self._data.append(text)
+
+    def end(self, tag):
+        if tag == 'string' and self._sink is not None:
+            sink, self._sink = self._sink, None
+            self.append(sink.result())
+            self._value = 0
+            return
+        if tag == 'name':
+            self._binary_member = ''.join(self._data) in self._binary_fields
+        elif tag == 'value':
+            self._binary_member = False
+        return super().end(tag)
+
+
+class BinaryFieldTransport(PooledTransport):
+    """Pooled transport whose responses decode the given binary fields while parsing."""
+
+    def __init__(self, pool, binary_fields, spool_max_size=None, scheme='https'):
+        super().__init__(pool, scheme=scheme)
+        self._binary_fields = binary_fields
+        self._spool_max_size = spool_max_size
+
+    def getparser(self):
+        unmarshaller = BinaryFieldUnmarshaller(
+            self._binary_fields,
+            spool_max_size=self._spool_max_size,
+            use_datetime=self._use_datetime,
+            use_builtin_types=self._use_builtin_types
+        )
+        parser = xmlrpc.client.ExpatParser(unmarshaller)
+        # Let expat hand over large runs of character data in one callback
+        parser._parser.buffer_text = True
+        parser._parser.buffer_size = ODOO_RPC_READ_CHUNK_SIZE
+        return parser, unmarshaller
+
+    def parse_response(self, response):
+        if response.getheader('Content-Encoding', '') == 'gzip':
+            stream = xmlrpc.client.GzipDecodedResponse(response)
+        else:
+            stream = response
+        parser, unmarshaller = self.getparser()
+        while True:
+            data = stream.read(ODOO_RPC_READ_CHUNK_SIZE)
+            if not data:
+                break
+            parser.feed(data)
+        if stream is not response:
+            stream.close()
+        parser.close()
+        return unmarshaller.close()
+
+
+def decode_binary_fields(result, binary_fields, spool_max_size=None):
+    """Decode base64 binary fields in already-parsed read results (JSON-RPC path)."""
+    if not isinstance(result, list):
+        return result
+    for record in result:
+        if not isinstance(record, dict):
+            continue
+        for field in binary_fields:
+            value = record.get(field)
+            if isinstance(value, str):
+                sink = _Base64Sink(spool_max_size)
+                sink.feed(value)
+                record[field] = sink.result()
+    return result
+
+
+# Process-wide pool and transports shared by all blueprints
+_POOL = ConnectionPool()
+_TRANSPORTS = {}
+_TRANSPORTS_LOCK = threading.Lock()
+
+
+def get_transport(scheme='https'):
+    """Return the shared pooled transport for the given URL scheme."""
+    transport = _TRANSPORTS.get(scheme)
+    if transport is None:
+        with _TRANSPORTS_LOCK:
+            transport = _TRANSPORTS.get(scheme)
+            if transport is None:
+                transport = PooledTransport(_POOL, scheme=scheme)
+                _TRANSPORTS[scheme] = transport
+    return transport
+
+
+class JsonRpcProxy:
+    """Proxy for an Odoo service over /jsonrpc, called like an XML-RPC ServerProxy.
+
+    Shares the connection pool with the XML-RPC transport. Odoo errors are
+    raised as xmlrpc.client.Fault so callers handle both protocols the same way.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, url, service, pool=None, binary_fields=None, spool_max_size=None):
+        parts = urllib.parse.urlsplit(url or '')
+        self._scheme = parts.scheme or 'https'
+        self._host = parts.netloc
+        self._path = parts.path.rstrip('/') + '/jsonrpc'
+        self._service = service
+        self._pool = pool or _POOL
+        self._binary_fields = binary_fields
+        self._spool_max_size = spool_max_size
+
+    def __getattr__(self, method):
+        if method.startswith('_'):
+            raise AttributeError(method)
+        return functools.partial(self._call, method)
+
+    def _call(self, method, *args):
+        payload = {
+            'jsonrpc': '2.0',
+            'method': 'call',
+            'params': {'service': self._service, 'method': method, 'args': list(args)},
+            'id': next(self._ids),
+        }
+        response = json.loads(self._post(json.dumps(payload).encode('utf-8')))
+        error = response.get('error')
+        if error:
+            data = error.get('data') or {}
+            code = JSONRPC_FAULT_CODES.get(data.get('name'), 1)
+            raise xmlrpc.client.Fault(code, data.get('message') or error.get('message') or 'Odoo Server Error')
+        if self._binary_fields:
+            return decode_binary_fields(response.get('result'), self._binary_fields, self._spool_max_size)
+        return response.get('result')
+
+    def _post(self, body):
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+        for attempt in (0, 1):
+            connection = self._pool.acquire(self._scheme, self._host)
+            try:
+                connection.request('POST', self._path, body, headers)
+                resp = connection.getresponse()
+                data = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionError):
+                connection.close()
+                # Retry once on a fresh connection when a keep-alive went stale
+                if attempt or not connection.reused:
+                    raise
+                self._pool.clear(self._scheme, self._host)
+                continue
+            except Exception as e:
+                connection.close()
+                _raise_if_deadline_exceeded(e)
+                raise
+            if resp.status != 200:
+                connection.close()
+                raise xmlrpc.client.ProtocolError(
+                    self._host + self._path, resp.status, resp.reason, dict(resp.getheaders())
+                )
+            self._pool.release(self._scheme, self._host, connection)
+            return data
+
+
+def server_proxy(url, endpoint, protocol=None, binary_fields=None, spool_max_size=None):
+    """Return a proxy for the Odoo <endpoint> service ('common' or 'object').
+
+    Uses /xmlrpc/2 or /jsonrpc depending on protocol (default: DECILO_ODOO_PROTOCOL).
+    With binary_fields, those fields come back decoded (bytes, or spooled temp
+    files when spool_max_size is set) instead of base64 text.
+    Proxies are cheap and thread-safe to share; connections live in the pool.
+    """
+    if (protocol or ODOO_RPC_PROTOCOL) == 'jsonrpc':
+        return JsonRpcProxy(url, endpoint, binary_fields=binary_fields, spool_max_size=spool_max_size)
+    scheme = urllib.parse.urlsplit(url or '').scheme or 'https'
+    if binary_fields:
+        transport = BinaryFieldTransport(_POOL, binary_fields, spool_max_size, scheme=scheme)
+    else:
+        transport = get_transport(scheme)
+    return xmlrpc.client.ServerProxy(
+        f'{url}/xmlrpc/2/{endpoint}',
+        transport=transport,
+        allow_none=True
+    )
+
+
+def is_auth_fault(error):
+    """Return True if an RPC error means the service credentials were refused."""
+    if not isinstance(error, xmlrpc.client.Fault):
+        return False
+    if error.faultCode in ODOO_AUTH_FAULT_CODES:
+        return True
+    text = str(error.faultString)
+    return 'AccessDenied' in text or 'Access Denied' in text or 'SessionExpired' in text
+
+
+class ServiceAccount:
+    """Per-process cache of the Odoo service-account UID.
+
+    The UID is resolved once per worker and only refreshed after Odoo rejects it.
+    """
+
+    def __init__(self, url, db, username, api_key):
+        self.url = url
+        self.db = db
+        self.username = username
+        self.api_key = api_key
+        self._uid = None
+        self._lock = threading.Lock()
+
+    def get_uid(self):
+        uid = self._uid
+        if uid:
+            return uid
+        with self._lock:
+            if not self._uid:
+                common = server_proxy(self.url, 'common')
+                uid = common.authenticate(self.db, self.username, self.api_key, {})
+                if not uid:
+                    raise Exception("Authentication failed")
+                self._uid = uid
+            return self._uid
+
+    def invalidate(self, stale_uid=None):
+        """Forget the cached UID (only if it is still the stale one, when given)."""
+        with self._lock:
+            if stale_uid is None or self._uid == stale_uid:
+                self._uid = None
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+
+
+class ServiceModelsProxy:
+    """Wraps an Odoo models proxy to re-authenticate the service account on auth faults.
+
+    Calls made with the service API key that fail with AccessDenied/AccessError
+    drop the cached UID, authenticate again and are retried once with the new
+    UID. If Odoo hands back the same UID, the fault was a genuine permission
+    error and is re-raised unchanged.
+    """
+
+    def __init__(self, models_proxy, account, hedger=None):
+        self._models = models_proxy
+        self._account = account
+        self._hedger = hedger
+
+    def _execute_kw(self, db, uid, pwd, model, method, *args):
+        if self._hedger is not None and method in HEDGEABLE_METHODS:
+            return self._hedger.call(
+                (model, method),
+                functools.partial(self._models.execute_kw, db, uid, pwd, model, method, *args)
+            )
+        return self._models.execute_kw(db, uid, pwd, model, method, *args)
+
+    def execute_kw(self, db, uid, pwd, model, method, *args):
+        try:
+            return self._execute_kw(db, uid, pwd, model, method, *args)
+        except xmlrpc.client.Fault as e:
+            if pwd != self._account.api_key or not is_auth_fault(e):
+                raise
+            self._account.invalidate(uid)
+            fresh_uid = self._account.get_uid()
+            if fresh_uid == uid:
+                raise
+            logger.warning(f"Odoo refused cached service UID {uid}; retrying {model}.{method} as UID {fresh_uid}")
+            return self._execute_kw(db, fresh_uid, pwd, model, method, *args)
+
+    def __getattr__(self, item):
+        return getattr(self._models, item)
+
+
+_SERVICE_ACCOUNTS = {}
+_SERVICE_ACCOUNTS_LOCK = threading.Lock()
+
+
+def get_service_account(url, db, username, api_key):
+    """Return the shared ServiceAccount for these credentials."""
+    key = (url, db, username)
+    with _SERVICE_ACCOUNTS_LOCK:
+        account = _SERVICE_ACCOUNTS.get(key)
+        if account is None or account.api_key != api_key:
+            account = ServiceAccount(url, db, username, api_key)
+            _SERVICE_ACCOUNTS[key] = account
+        return account
+
+
+def service_models_proxy(account, protocol=None, binary_fields=None, spool_max_size=None):
+    """Return a pooled models proxy that re-authenticates the given account."""
+    return ServiceModelsProxy(
+        server_proxy(account.url, 'object', protocol, binary_fields, spool_max_size),
+        account,
+        _HEDGER
+    )
+
+
+class DeferredRead:
+    """Handle for a read queued on a ReadBatcher."""
+
+    def __init__(self, batcher, model, ids, fields):
+        self._batcher = batcher
+        self.model = model
+        self.ids = ids
+        self.fields = fields
+        self._done = threading.Event()
+        self._records = None
+        self._error = None
+
+    def result(self):
+        """Flush the model's pending reads (if needed) and return this read's records."""
+        if not self._done.is_set():
+            self._batcher.flush(self.model)
+            self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._records
+
+
+class ReadBatcher:
+    """Request-scoped loader that coalesces `read` calls on the same model.
+
+    defer_read() queues a read and returns a DeferredRead. The first result()
+    on a model sends every read queued for it as one call over the union of
+    ids and fields, then hands each caller back only the fields it asked for.
+    Records read earlier in the batcher's life are memoized, so overlapping
+    reads only fetch ids (or fields) that are still missing.
+    """
+
+    def __init__(self, models, db, uid, pwd):
+        self._models = models
+        self._db = db
+        self._uid = uid
+        self._pwd = pwd
+        self._pending = {}
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def defer_read(self, model, ids, fields):
+        if isinstance(ids, int):
+            ids = [ids]
+        handle = DeferredRead(self, model, list(ids), list(fields))
+        with self._lock:
+            self._pending.setdefault(model, []).append(handle)
+        return handle
+
+    def read(self, model, ids, fields):
+        """Read immediately, merged with anything already queued for the model."""
+        return self.defer_read(model, ids, fields).result()
+
+    def flush(self, model):
+        with self._lock:
+            handles = self._pending.pop(model, [])
+            cached = self._records.setdefault(model, {})
+            fields = set()
+            for handle in handles:
+                fields.update(handle.fields)
+            missing = []
+            for handle in handles:
+                for record_id in handle.ids:
+                    record = cached.get(record_id)
+                    if (record is None or not fields.issubset(record)) and record_id not in missing:
+                        missing.append(record_id)
+        if not handles:
+            return
+
+        try:
+            if missing:
+                records = self._models.execute_kw(
+                    self._db, self._uid, self._pwd,
+                    model, 'read',
+                    [missing],
+                    {'fields': sorted(fields)}
+                ) or []
+                with self._lock:
+                    for record in records:
+                        cached.setdefault(record['id'], {}).update(record)
+        except Exception as e:
+            for handle in handles:
+                handle._error = e
+                handle._done.set()
+            return
+
+        with self._lock:
+            for handle in handles:
+                handle._records = [
+                    {'id': record_id, **{f: cached[record_id].get(f) for f in handle.fields}}
+                    for record_id in handle.ids
+                    if record_id in cached
+                ]
+                handle._done.set()
+
+
+class FanOutExecutor:
+    """Bounded, process-wide thread pool for independent Odoo calls.
+
+    Tasks run in a copy of the submitter's contextvars context, so per-request
+    state kept in ContextVars (locale, deadlines) follows them onto the pool.
+    Tasks submitted from a pool thread run inline, so nested fan-outs cannot
+    deadlock waiting on workers they already occupy. The pool is created on
+    first use; a preloading master that used it (the boot warm-up) must call
+    shutdown() before forking, so no pool threads are running at fork time.
+    """
+
+    def __init__(self, max_workers, thread_name_prefix='odoo-fanout'):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self._executor = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def submit(self, fn, *args, **kwargs):
+        context = contextvars.copy_context()
+        if getattr(self._local, 'is_worker', False):
+            future = concurrent.futures.Future()
+            try:
+                future.set_result(context.run(fn, *args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            return future
+        return self._get_executor().submit(context.run, fn, *args, **kwargs)
+
+    def run_all(self, *calls):
+        """Run zero-argument callables in parallel; return their results in order.
+
+        OptionalCall entries are dropped (their default is returned and the
+        deadline is flagged partial) when the request deadline runs out before
+        they start or finish.
+        """
+        deadline = _DEADLINE.get()
+        futures = []
+        for call in calls:
+            if isinstance(call, OptionalCall) and deadline is not None and deadline.expired():
+                futures.append(None)
+            else:
+                futures.append(self.submit(call))
+
+        results = []
+        for call, future in zip(calls, futures):
+            if not isinstance(call, OptionalCall):
+                results.append(future.result())
+                continue
+            try:
+                if future is None:
+                    raise DeadlineExceeded(f"Odoo request budget of {deadline.seconds:g}s exhausted")
+                timeout = max(deadline.remaining(), 0) if deadline is not None else None
+                results.append(future.result(timeout=timeout))
+            except (concurrent.futures.TimeoutError, DeadlineExceeded):
+                if deadline is None:
+                    raise
+                if future is not None:
+                    future.cancel()
+                deadline.partial = True
+                logger.warning(f"Dropped optional Odoo call {call.name} after the request budget ran out")
+                results.append(call.default)
+        return results
+
+    def _get_executor(self):
+        executor = self._executor
+        if executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=self.thread_name_prefix,
+                        initializer=self._mark_worker
+                    )
+                executor = self._executor
+        return executor
+
+    def _mark_worker(self):
+        self._local.is_worker = True
+
+    def shutdown(self):
+        """Wait for the submitted tasks and stop the pool threads; the next submit starts a new pool."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _reset_after_fork(self):
+        # Worker threads do not survive fork; start a fresh pool on next use
+        self._executor = None
+        self._lock = threading.Lock()
+
+
+class OptionalCall:
+    """Fan-out task whose result may be given up on when the request deadline runs out."""
+
+    def __init__(self, fn, default=None):
+        self.fn = fn
+        self.default = default
+        self.name = getattr(fn, '__name__', repr(fn))
+
+    def __call__(self):
+        return self.fn()
+
+
+_FAN_OUT_EXECUTORS = []
+
+
+def fan_out_executor(max_workers, thread_name_prefix='odoo-fanout'):
+    """Create a FanOutExecutor that is reset in forked children."""
+    executor = FanOutExecutor(max_workers, thread_name_prefix)
+    _FAN_OUT_EXECUTORS.append(executor)
+    return executor
+
+
+def shutdown_fan_out_executors():
+    """Stop the pool threads of every fan-out executor (in a preloading master, before fork)."""
+    for executor in _FAN_OUT_EXECUTORS:
+        executor.shutdown()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution.
+
+    The first caller for a key runs fn; callers arriving while it is in flight
+    wait (at most until the request deadline) and receive the same result or
+    exception. Results are shared, so callers must not mutate them.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            deadline = _DEADLINE.get()
+            timeout = max(deadline.remaining(), 0) if deadline is not None else None
+            if not flight.done.wait(timeout):
+                raise DeadlineExceeded(f"Odoo request budget of {deadline.seconds:g}s exhausted")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+        return flight.result
+
+    def start(self, key, fn, executor):
+        """Run fn for key on executor unless a call for key is in flight; returns whether it was started.
+
+        Used for background refreshes: the caller does not wait, and do() calls
+        for the same key join the running refresh instead of starting another.
+        fn runs in a copy of the caller's context without its deadline, so it is
+        not cut short by what is left of the request budget. Pass an executor
+        the caller's own tasks do not run on (see FanOutExecutor.submit): on its
+        pool threads, fn would otherwise run inline and hold up the caller.
+        """
+        with self._lock:
+            if key in self._flights:
+                return False
+            flight = self._flights[key] = _Flight()
+
+        def run():
+            try:
+                clear_deadline()
+                flight.result = fn()
+            except Exception as e:
+                flight.error = e
+                logger.warning(f"Background call {key!r} failed: {e}")
+            finally:
+                self._land(key, flight)
+
+        try:
+            executor.submit(run)
+        except BaseException as e:
+            flight.error = e
+            self._land(key, flight)
+            raise
+        return True
+
+    def _land(self, key, flight):
+        with self._lock:
+            self._flights.pop(key, None)
+        flight.done.set()
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+
+_SINGLE_FLIGHTS = []
+
+
+def single_flight():
+    """Create a SingleFlight that is reset in forked children."""
+    group = SingleFlight()
+    _SINGLE_FLIGHTS.append(group)
+    return group
+
+
+class LatencyTracker:
+    """Keeps the most recent call latencies per key and reports percentiles."""
+
+    def __init__(self, window=200):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, seconds):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = collections.deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, key, pct, min_samples=1):
+        """Nearest-rank percentile of recent samples, or None with too few samples."""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < max(min_samples, 1):
+            return None
+        rank = max(int(math.ceil(pct / 100.0 * len(samples))) - 1, 0)
+        return samples[min(rank, len(samples) - 1)]
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+
+
+class RequestHedger:
+    """Sends a duplicate of slow calls and returns whichever response arrives first.
+
+    The hedge delay is the configured percentile of recent latencies for the
+    same key (never below min_delay). Until enough samples exist, calls run
+    inline without hedging. Each attempt checks out its own pooled
+    connection; the losing attempt finishes in the background, and the
+    spooled temp files in its result are closed.
+    """
+
+    def __init__(self, executor, percentile=ODOO_RPC_HEDGE_PERCENTILE, min_delay=ODOO_RPC_HEDGE_MIN_DELAY,
+                 min_samples=ODOO_RPC_HEDGE_MIN_SAMPLES):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.tracker = LatencyTracker()
+        self._executor = executor
+        self._lock = threading.Lock()
+        self.fired = 0
+        self.won = 0
+
+    def hedge_delay(self, key):
+        delay = self.tracker.percentile(key, self.percentile, self.min_samples)
+        return None if delay is None else max(delay, self.min_delay)
+
+    def call(self, key, fn):
+        start = time.monotonic()
+        delay = self.hedge_delay(key)
+        if delay is None:
+            result = fn()
+            self.tracker.record(key, time.monotonic() - start)
+            return result
+
+        primary = self._executor.submit(fn)
+        done, _ = concurrent.futures.wait([primary], timeout=delay)
+        if done:
+            self.tracker.record(key, time.monotonic() - start)
+            return primary.result()
+
+        hedge = self._executor.submit(fn)
+        with self._lock:
+            self.fired += 1
+        logger.info(f"Hedging slow Odoo call {key[0]}.{key[1]} after {delay * 1000:.0f} ms")
+
+        pending = {primary, hedge}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self.won += 1
+                    loser = primary if future is hedge else hedge
+                    loser.add_done_callback(_discard_result)
+                    self.tracker.record(key, time.monotonic() - start)
+                    return future.result()
+        # Both attempts failed; surface the original call's error
+        return primary.result()
+
+    def stats(self):
+        with self._lock:
+            return {'hedges_fired': self.fired, 'hedges_won': self.won}
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self.tracker._reset_after_fork()
+
+
+def _close_spooled(value):
+    """Close the spooled temp files of decoded binary fields in a read result."""
+    if isinstance(value, tempfile.SpooledTemporaryFile):
+        value.close()
+    elif isinstance(value, dict):
+        for item in value.values():
+            _close_spooled(item)
+    elif isinstance(value, list):
+        for item in value:
+            _close_spooled(item)
+
+
+def _discard_result(future):
+    # Result of the attempt that lost a hedged race: nobody reads it
+    if not future.cancelled() and future.exception() is None:
+        _close_spooled(future.result())
+
+
+_HEDGER = RequestHedger(fan_out_executor(ODOO_RPC_HEDGE_WORKERS, 'odoo-hedge')) if ODOO_RPC_HEDGE_ENABLED else None
+
+
+def hedge_stats():
+    """Counters for hedged reads in this process (None when hedging is disabled)."""
+    return _HEDGER.stats() if _HEDGER is not None else None
+
+
+def _reset_after_fork():
+    global _TRANSPORTS_LOCK, _SERVICE_ACCOUNTS_LOCK
+    _POOL._reset_after_fork()
+    for executor in _FAN_OUT_EXECUTORS:
+        executor._reset_after_fork()
+    for group in _SINGLE_FLIGHTS:
+        group._reset_after_fork()
+    if _HEDGER is not None:
+        _HEDGER._reset_after_fork()
+    _TRANSPORTS_LOCK = threading.Lock()
+    _SERVICE_ACCOUNTS_LOCK = threading.Lock()
+    for account in _SERVICE_ACCOUNTS.values():
+        account._reset_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,176 @@
+"""
+Access popularity of catalog items, and a background warmer for the hottest ones.
+Counters decay exponentially (half-life given per counter), so the ranking
+follows what is being ordered now rather than all-time totals. Counters are per
+process; every worker sees a sample of the same traffic, so their top items agree.
+
+The warmer runs a refresh function every `interval` seconds in a daemon thread,
+started on first use in each process (threads do not survive gunicorn's fork).
+With a lock file, one worker per host refreshes per interval (for caches shared
+between the workers); without one, every worker keeps its own caches warm.
+"""
+
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows dev server: no host-wide coordination needed
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class DecayedCounter:
+    """Exponentially decaying access counts per key."""
+
+    def __init__(self, half_life, max_keys=2000):
+        self.half_life = half_life
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._scores = {}  # key -> (score, monotonic time the score was computed at)
+
+    def _decayed(self, score, at, now):
+        return score * 0.5 ** ((now - at) / self.half_life)
+
+    def record(self, key, weight=1.0):
+        now = time.monotonic()
+        with self._lock:
+            score, at = self._scores.get(key, (0.0, now))
+            self._scores[key] = (self._decayed(score, at, now) + weight, now)
+            if len(self._scores) > self.max_keys:
+                self._prune(now)
+
+    def score(self, key):
+        now = time.monotonic()
+        with self._lock:
+            score, at = self._scores.get(key, (0.0, now))
+        return self._decayed(score, at, now)
+
+    def top(self, n, min_score=0.0):
+        """The n keys with the highest current scores, as (key, score) pairs, best first."""
+        now = time.monotonic()
+        with self._lock:
+            scored = [(key, self._decayed(score, at, now)) for key, (score, at) in self._scores.items()]
+        scored = [item for item in scored if item[1] > min_score]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:n]
+
+    def _prune(self, now):
+        # Keep the better half once the key limit is hit (called with the lock held)
+        ranked = sorted(self._scores.items(), key=lambda item: self._decayed(item[1][0], item[1][1], now), reverse=True)
+        self._scores = dict(ranked[:self.max_keys // 2])
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+
+
+class BackgroundWarmer:
+    """Calls warm() every interval seconds from a daemon thread (one per process)."""
+
+    def __init__(self, name, interval, warm, lock_path=None):
+        self.name = name
+        self.interval = interval
+        self.warm = warm
+        self.lock_path = lock_path
+        self._lock = threading.Lock()
+        self._pid = None
+        self.runs = 0
+        self.last_run = None
+        self.last_duration = None
+
+    def ensure_started(self):
+        """Start the warmer thread in this process if it is not running yet."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            thread = threading.Thread(target=self._loop, name=f"{self.name}-warmer", daemon=True)
+            thread.start()
+            self._pid = os.getpid()
+            logger.info(f"[warmer] {self.name} warmer started (every {self.interval}s)")
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            self.run_once()
+
+    def run_once(self):
+        """Run one refresh now; returns False if skipped because another worker on the host just did it."""
+        if not self.lock_path or fcntl is None:
+            self._run()
+            return True
+        # A lock file created just now has a fresh mtime but records no run
+        lock_existed = os.path.exists(self.lock_path)
+        try:
+            lock_file = open(self.lock_path, 'a')
+        except OSError as e:
+            logger.warning(f"[warmer] {self.name}: lock file {self.lock_path} unusable: {e}")
+            self._run()
+            return True
+        with lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return False
+            # The lock file's mtime records the last host-wide run
+            if lock_existed and time.time() - os.path.getmtime(self.lock_path) < self.interval / 2:
+                return False
+            self._run()
+            os.utime(self.lock_path)
+        return True
+
+    def _run(self):
+        started = time.monotonic()
+        try:
+            self.warm()
+        except Exception as e:
+            logger.warning(f"[warmer] {self.name} warm-up failed: {e}", exc_info=True)
+        self.runs += 1
+        self.last_run = time.time()
+        self.last_duration = time.monotonic() - started
+
+    def stats(self):
+        return {
+            'running': self._pid == os.getpid(),
+            'interval': self.interval,
+            'runs': self.runs,
+            'last_run': self.last_run,
+            'last_duration': self.last_duration,
+        }
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+
+
+_COUNTERS = []
+_WARMERS = []
+
+
+def decayed_counter(half_life, max_keys=2000):
+    """Create a DecayedCounter that is reset in forked children."""
+    counter = DecayedCounter(half_life, max_keys)
+    _COUNTERS.append(counter)
+    return counter
+
+
+def background_warmer(name, interval, warm, lock_path=None):
+    """Create a BackgroundWarmer that restarts in forked children."""
+    warmer = BackgroundWarmer(name, interval, warm, lock_path)
+    _WARMERS.append(warmer)
+    return warmer
+
+
+def _reset_after_fork():
+    for counter in _COUNTERS:
+        counter._reset_after_fork()
+    for warmer in _WARMERS:
+        warmer._reset_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
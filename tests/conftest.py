@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+from flask import Flask
+
+# The modules live at the top level of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decilo  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(decilo.decilo_bp)
+    return app.test_client()
@@ -0,0 +1,103 @@
+import pytest
+
+import decilo
+
+SECRET = 'test-secret'
+HEADERS = {'X-Decilo-Invalidate-Token': SECRET}
+
+
+@pytest.fixture
+def invalidated(monkeypatch):
+    """Stub invalidate_catalog; returns the (model, ids) calls it received."""
+    calls = []
+
+    def invalidate_catalog(model, ids):
+        calls.append((model, ids))
+        if model != 'product.template':
+            raise ValueError(f"Unsupported model: {model}")
+        return set(ids), {id * 10 for id in ids}
+
+    monkeypatch.setattr(decilo, 'invalidate_catalog', invalidate_catalog)
+    monkeypatch.setattr(decilo, 'INVALIDATE_SECRET', SECRET)
+    return calls
+
+
+def test_not_found_without_secret(client, invalidated, monkeypatch):
+    monkeypatch.setattr(decilo, 'INVALIDATE_SECRET', '')
+    response = client.post('/internal/invalidate', json={'model': 'product.template', 'ids': [1]}, headers=HEADERS)
+    assert response.status_code == 404
+    assert invalidated == []
+
+
+def test_unauthorized_with_wrong_token(client, invalidated):
+    response = client.post(
+        '/internal/invalidate',
+        json={'model': 'product.template', 'ids': [1]},
+        headers={'X-Decilo-Invalidate-Token': 'wrong'}
+    )
+    assert response.status_code == 401
+    assert invalidated == []
+
+
+def test_unauthorized_without_token(client, invalidated):
+    response = client.post('/internal/invalidate', json={'model': 'product.template', 'ids': [1]})
+    assert response.status_code == 401
+    assert invalidated == []
+
+
+@pytest.mark.parametrize('body', [
+    {},
+    {'model': 'product.template'},
+    {'model': 'product.template', 'ids': '1,2'},
+    {'model': 'product.template', 'ids': [1, 'two']},
+    {'model': 7, 'ids': [1]},
+])
+def test_bad_request_for_malformed_body(client, invalidated, body):
+    response = client.post('/internal/invalidate', json=body, headers=HEADERS)
+    assert response.status_code == 400
+    assert response.get_json()['code'] == 'invalid_request'
+    assert invalidated == []
+
+
+def test_bad_request_for_unsupported_model(client, invalidated):
+    response = client.post('/internal/invalidate', json={'model': 'res.partner', 'ids': [1]}, headers=HEADERS)
+    assert response.status_code == 400
+    assert 'res.partner' in response.get_json()['error']
+
+
+def test_invalidates_with_token(client, invalidated):
+    response = client.post('/internal/invalidate', json={'model': 'product.template', 'ids': [3, 1]}, headers=HEADERS)
+    assert response.status_code == 200
+    assert response.get_json() == {'templates': [1, 3], 'variants': [10, 30]}
+    assert invalidated == [('product.template', [3, 1])]
+
+
+def test_evict_catalog_entries_clears_every_cache_of_the_templates(monkeypatch):
+    # Only one locale warmed up: entries of the others are evicted all the same
+    monkeypatch.setattr(decilo, 'BOOT_WARMUP_LOCALES', ['fr_BE'])
+    evicted = [
+        (decilo.VARIANT_TEMPLATE_CACHE, (1, 'nl_BE')),
+        (decilo.VARIANT_TEMPLATE_CACHE, (1, 'fr_BE')),
+        (decilo.EXCLUSIONS_CACHE, (1, 'en_US')),
+        (decilo.DEFAULT_VARIANTS_CACHE, ('nl_BE',)),
+        (decilo.VARIANT_IMAGE_CACHE, ('selection', 1, 'medium', '[["Color", "Red"]]')),
+        (decilo.VARIANT_IMAGE_CACHE, ('selection', 1, 'full', '[]')),
+        (decilo.VARIANT_IMAGE_CACHE, ('template', 1, 'image_512')),
+        (decilo.VARIANT_IMAGE_CACHE, ('variant', 10, 'image_512')),
+        (decilo.PLACEHOLDER_CACHE, ('placeholder', 1)),
+    ]
+    kept = [
+        (decilo.VARIANT_TEMPLATE_CACHE, (2, 'nl_BE')),
+        (decilo.VARIANT_IMAGE_CACHE, ('selection', 2, 'medium', '[]')),
+        (decilo.VARIANT_IMAGE_CACHE, ('selection', 11, 'medium', '[]')),
+        (decilo.VARIANT_IMAGE_CACHE, ('template', 2, 'image_512')),
+    ]
+    for cache, key in evicted + kept:
+        cache.set(key, {'cached': key})
+
+    decilo.evict_catalog_entries({1}, {10})
+
+    assert [key for cache, key in evicted if cache.get(key) is not None] == []
+    assert [key for cache, key in kept if cache.get(key) is None] == []
+    for cache, key in kept:
+        cache.pop(key)